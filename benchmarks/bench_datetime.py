@@ -0,0 +1,81 @@
+#! -*- coding: utf-8 -*-
+"""
+Datetime parsing benchmark: ShopwaveDatetime against the strptime based
+parsing it replaced, for unique and for repeated timestamps, and bulk
+parsing into numpy arrays against one value at a time.
+
+    python benchmarks/bench_datetime.py [n]
+"""
+
+import os
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from shopwave.settings import DATETIME_FORMAT
+from shopwave.utils import ShopwaveDatetime
+from shopwave.utils import datetime as sw_datetime
+
+
+def legacy(d):
+    """ ShopwaveDatetime(d) for strings, as it was before the fast path.
+    """
+    d = d.strip()
+    if len(d) == 10:
+        d += ' 00:00:00'
+    elif len(d) > 19:
+        d = d[:19]
+    try:
+        d = datetime.strptime(d, '%Y-%m-%dT%H:%M:%S')
+    except ValueError:
+        d = datetime.strptime(d, DATETIME_FORMAT)
+    return datetime.__new__(ShopwaveDatetime, d.year, d.month, d.day,
+                            d.hour, d.minute, d.second)
+
+
+def bench(label, func, values):
+    start = time.perf_counter()
+    for value in values:
+        func(value)
+    elapsed = time.perf_counter() - start
+    print('%-40s %8.2f us/value' % (label, elapsed / len(values) * 1e6))
+    return elapsed
+
+
+def main(n=200000):
+    unique = ['2017-%02d-%02dT%02d:%02d:%02d.000Z'
+              % (1 + i % 12, 1 + i % 28, i % 24, i % 60, (i // 60) % 60)
+              for i in range(n)]
+    # e.g. BasketReport.c: a few thousand distinct completion times.
+    repeated = [unique[i % 1000] for i in range(n)]
+
+    for label, values in (('unique', unique), ('repeated', repeated)):
+        sw_datetime._parse_cached.cache_clear()
+        old = bench('strptime, %s' % label, legacy, values)
+        new = bench('ShopwaveDatetime, %s' % label, ShopwaveDatetime, values)
+        print('%-40s %8.1fx' % ('speedup', old / new))
+
+    try:
+        from shopwave.columnar import parse_datetimes, np
+    except ImportError:
+        np = None
+    if np is None:
+        print('numpy not installed, skipping bulk parsing.')
+        return
+    start = time.perf_counter()
+    np.array([np.datetime64(ShopwaveDatetime(v), 's') for v in unique],
+             dtype='datetime64[s]')
+    old = time.perf_counter() - start
+    start = time.perf_counter()
+    parse_datetimes(unique)
+    new = time.perf_counter() - start
+    print('%-40s %8.2f us/value' % ('columnar, one at a time', old / n * 1e6))
+    print('%-40s %8.2f us/value' % ('columnar, parse_datetimes', new / n * 1e6))
+    print('%-40s %8.1fx' % ('speedup', old / new))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
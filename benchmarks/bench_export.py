@@ -0,0 +1,70 @@
+#! -*- coding: utf-8 -*-
+"""
+Streaming export of report baskets against a local fake server: time and
+peak memory of report_basket.export to CSV (and Arrow/Parquet if pyarrow
+is installed) for growing date ranges, next to all_windowed, which holds
+all models of the range in memory. Peak memory of export should not grow
+with the range.
+
+    python benchmarks/bench_export.py [baskets per hour]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from shopwave.fakeserver import FakeShopwave
+
+FROM = '2017-02-01 00:00:00'
+DAYS = (1, 3, 7)
+
+
+def measure(func):
+    """ Seconds (untraced run) and peak traced MB (second run) of func. """
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+
+def main(baskets_per_hour=120):
+    formats = ['csv']
+    try:
+        import pyarrow
+        formats += ['arrow', 'parquet']
+    except ImportError:
+        print('pyarrow not installed, exporting CSV only')
+    directory = tempfile.mkdtemp()
+    print('%-14s %5s %10s %10s' % ('', 'days', 'seconds', 'peak MB'))
+    try:
+        with FakeShopwave(baskets_per_hour=baskets_per_hour) as server:
+            sw = server.client()
+            for days in DAYS:
+                to_date = '2017-02-%02d 00:00:00' % (1 + days)
+                for format in formats:
+                    elapsed, peak = measure(
+                        lambda: sw.report_basket.export(
+                            FROM, to_date, directory, format=format,
+                            window='hourly'))
+                    print('%-14s %5d %10.2f %10.1f'
+                          % ('export ' + format, days, elapsed, peak))
+                elapsed, peak = measure(lambda: sw.report_basket.all_windowed(
+                    FROM, to_date, window='hourly'))
+                print('%-14s %5d %10.2f %10.1f'
+                      % ('all_windowed', days, elapsed, peak))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,126 @@
+#! -*- coding: utf-8 -*-
+"""
+Reference resolution with and without an identity map, for responses in
+which the same objects are referenced many times: products listing their
+categories, categories listing their products, and baskets with lines of
+the same products. Exits with status 1 if the identity map the managers
+use by default is slower than none.
+
+    python benchmarks/bench_identity.py [n_products] [n_categories]
+"""
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from shopwave import identity
+from shopwave.models import BasketReport, Category, Product
+
+
+def product_data(i, n_categories):
+    return {
+        'id': i, 'n': 'Product %d' % i, 'price': '2.50', 'unit': 'each',
+        'categories': {str(c): 'Category %d' % c
+                       for c in (i % n_categories, (i * 7) % n_categories)},
+    }
+
+
+def category_data(c, products):
+    return {'id': c, 'n': 'Category %d' % c, 'type': 1,
+            'p': {str(p['id']): dict(p, categories={}) for p in products}}
+
+
+def basket_data(bId, products, lines=3):
+    basket_lines = {}
+    for j in range(lines):
+        product = products[(bId * 7 + j * 13) % len(products)]
+        basket_lines[str(bId * lines + j)] = dict(
+            product, categories={}, bPIId=bId * lines + j, q=1 + j,
+            pIP=product['price'], pMP=product['price'], vP='20')
+    return {'bId': bId, 'bN': 'Basket %d' % bId, 'c': '2017-02-01 10:00:00',
+            'sId': 1, 't': '7.50', 'p': basket_lines, 'tr': {}}
+
+
+def build(cls, rows, identity_map):
+    with identity.use(identity_map):
+        return [cls(data=row) for row in rows]
+
+
+def timed(cls, rows, new_maps, repeat=7):
+    """
+    Best time of repeat builds for each of new_maps, each with a new map.
+    The maps take turns, so that the machine's load affects all of them.
+    """
+    best = [None] * len(new_maps)
+    maps = [None] * len(new_maps)
+    # Builds per sample, so that small sizes are not lost in timer noise.
+    number = -(-20000 // len(rows))
+    for _ in range(repeat):
+        for i, new_map in enumerate(new_maps):
+            # As timeit, without garbage collection during the build, whose
+            # pauses depend on what earlier runs left behind.
+            gc.collect()
+            gc.disable()
+            try:
+                start = time.perf_counter()
+                for _ in range(number):
+                    maps[i] = new_map()
+                    build(cls, rows, maps[i])
+                elapsed = (time.perf_counter() - start) / number
+            finally:
+                gc.enable()
+            best[i] = elapsed if best[i] is None else min(best[i], elapsed)
+    return best, maps
+
+
+def traced(cls, rows, new_map):
+    """ Memory held by the built models and the map. """
+    tracemalloc.start()
+    result = build(cls, rows, new_map())
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+MAPS = (
+    ('no identity map', lambda: None),
+    # As created by the managers for every response.
+    ('per response', lambda: identity.IdentityMap(line_items=False)),
+    ('line items', identity.IdentityMap),
+)
+
+
+def main(n_products=20000, n_categories=50):
+    products = [product_data(i, n_categories) for i in range(n_products)]
+    categories = [category_data(c, products[:n_products // 10])
+                  for c in range(n_categories)]
+    baskets = [basket_data(b, products[:n_products // 10])
+               for b in range(n_products)]
+    regressions = []
+    for cls, rows in ((Product, products), (Category, categories),
+                      (BasketReport, baskets)):
+        times, maps = timed(cls, rows, [new_map for _, new_map in MAPS])
+        sizes = [traced(cls, rows, new_map) for _, new_map in MAPS]
+        for (label, _), elapsed, size, identity_map in zip(MAPS, times, sizes,
+                                                            maps):
+            print('%-12s %-16s %8.1f ms %8.1f MB %6.2fx %6.2fx   %r'
+                  % (cls.__name__, label, elapsed * 1e3, size / 1e6,
+                     times[0] / elapsed, sizes[0] / size, identity_map))
+        # Identity mapping is on by default, it must not slow parsing down.
+        # 10% spare for timing noise.
+        if times[1] > times[0] * 1.1:
+            regressions.append(cls.__name__)
+    if regressions:
+        print('slower with the default identity map: %s'
+              % ', '.join(regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,58 @@
+#! -*- coding: utf-8 -*-
+"""
+Decoding speed of the installed JSON backends on report sized payloads.
+
+'json (text)' is the previous path: decode response.content to str as
+response.text does, then json.loads.
+
+    python benchmarks/bench_json.py [n_baskets ...]
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.dirname(os.path.abspath(__file__))]
+
+import json
+
+from bench_models import basket_data
+from shopwave import codec
+
+
+def payload(n_baskets):
+    baskets = {str(i): basket_data(i) for i in range(n_baskets)}
+    return json.dumps({'api': {'message': {}}, 'baskets': baskets}).encode()
+
+
+def timed(func, data, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(*sizes):
+    backends = []
+    for name in codec.AUTO_ORDER:
+        try:
+            backends.append(codec.load_backend(name))
+        except ImportError:
+            print('%s not installed' % name)
+    for n in sizes or (1000, 10000, 50000):
+        data = payload(n)
+        print('\n%d baskets, %.1f MB' % (n, len(data) / 2.**20))
+        base = timed(lambda d: json.loads(d.decode('utf-8')), data)
+        print('%-14s %9.1f ms' % ('json (text)', base * 1e3))
+        for backend in backends:
+            elapsed = timed(backend.loads, data)
+            print('%-14s %9.1f ms  %5.2fx' % (backend.name, elapsed * 1e3,
+                                              base / elapsed))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
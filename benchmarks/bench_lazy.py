@@ -0,0 +1,79 @@
+#! -*- coding: utf-8 -*-
+"""
+Eager against lazy models for a basket report job that reads a few fields
+of every basket and product line.
+
+    python benchmarks/bench_lazy.py [n_baskets] [repeat]
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.dirname(os.path.abspath(__file__))]
+
+from bench_models import basket_data
+from shopwave.models import BasketReport
+
+
+def hydrate(cls, rows):
+    return [cls(data=row) for row in rows]
+
+
+def line_report(baskets):
+    """ Reads 4 fields of every product line. """
+    total = 0.0
+    for basket in baskets:
+        basket.bId
+        for line in basket.p:
+            total += line.price * line.q
+            line.id, line.name
+    return total
+
+
+def store_report(baskets):
+    """ Reads 3 fields of every basket. """
+    totals = {}
+    for basket in baskets:
+        totals[basket.sId] = totals.get(basket.sId, 0) + 1
+        basket.bId, basket.c
+    return sorted(totals.items())
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main(n=20000, repeat=3):
+    rows = [basket_data(i) for i in range(n)]
+    for report in (line_report, store_report):
+        print(report.__name__ + ':' + report.__doc__)
+        times = {}
+        for label, cls in (('eager', BasketReport),
+                           ('lazy', BasketReport.lazy())):
+            # Best of repeat runs, every run on freshly hydrated models, as
+            # lazy models parse on the first read only.
+            hydrate_time = read_time = None
+            for _ in range(repeat):
+                baskets, elapsed = timed(lambda: hydrate(cls, rows))
+                hydrate_time = elapsed if hydrate_time is None else \
+                    min(hydrate_time, elapsed)
+                result, elapsed = timed(lambda: report(baskets))
+                read_time = elapsed if read_time is None else \
+                    min(read_time, elapsed)
+                del baskets
+            print('%-36s %8.1f ms' % ('%s, hydrate' % label,
+                                      hydrate_time * 1e3))
+            print('%-36s %8.1f ms' % ('%s, read' % label, read_time * 1e3))
+            times[label] = (hydrate_time, hydrate_time + read_time, result)
+        assert times['eager'][2] == times['lazy'][2]
+        print('%-36s %8.1fx' % ('hydrate speedup',
+                                 times['eager'][0] / times['lazy'][0]))
+        print('%-36s %8.1fx' % ('hydrate + read speedup',
+                                 times['eager'][1] / times['lazy'][1]))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
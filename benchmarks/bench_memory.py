@@ -0,0 +1,63 @@
+#! -*- coding: utf-8 -*-
+"""
+Peak memory of a basket report held as regular vs compact models.
+
+Every mode runs in its own process and reports its peak RSS after building
+the report. Lines are product lines, 3 per basket, from 50 distinct
+products. The report is built with an identity map with line items, as by
+a client with identity_map=True, so lines share their Product, and without
+one, so every line copies it.
+
+    python benchmarks/bench_memory.py [n_lines]
+"""
+
+import os
+import resource
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.dirname(os.path.abspath(__file__))]
+
+LINES_PER_BASKET = 3
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+
+def build(mode, shared, n_lines):
+    from bench_models import basket_data
+    from shopwave import identity
+    from shopwave.identity import IdentityMap
+    from shopwave.models import BasketReport
+    ModelClass = BasketReport.compact() if mode == 'compact' else BasketReport
+    identity_map = IdentityMap() if shared == 'shared' else None
+    baseline = peak_rss_mb()
+    with identity.use(identity_map):
+        report = [ModelClass(data=basket_data(i, LINES_PER_BASKET))
+                  for i in range(n_lines // LINES_PER_BASKET)]
+    print('%.1f' % (peak_rss_mb() - baseline))
+    return report
+
+
+def main(n_lines=1000000):
+    for shared in ('shared', 'copied'):
+        results = {}
+        for mode in ('regular', 'compact'):
+            out = subprocess.check_output(
+                [sys.executable, __file__, '--mode', mode, shared,
+                 str(n_lines)])
+            results[mode] = float(out)
+            print('%-8s %-7s %10.1f MB  %6.1f bytes/line'
+                  % (mode, shared, results[mode],
+                     results[mode] * 2**20 / n_lines))
+        print('reduction %15.2fx' % (results['regular'] / results['compact']))
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--mode']:
+        build(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+    else:
+        main(*[int(a) for a in sys.argv[1:]])
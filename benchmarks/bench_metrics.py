@@ -0,0 +1,57 @@
+#! -*- coding: utf-8 -*-
+"""
+Client side cost of metrics: time per Product.get against a local fake
+server without latency, without metrics and with each sink.
+
+    python benchmarks/bench_metrics.py [calls]
+"""
+
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from shopwave.fakeserver import FakeShopwave
+from shopwave.metrics import Metrics, MemorySink, LoggingSink, PrometheusSink
+
+CASES = (
+    ('no metrics', lambda: None),
+    ('MemorySink', lambda: Metrics(MemorySink())),
+    ('LoggingSink (off)', lambda: Metrics(LoggingSink())),
+    ('PrometheusSink', lambda: Metrics(PrometheusSink())),
+    ('all three', lambda: Metrics(MemorySink(), LoggingSink(),
+                                  PrometheusSink())),
+)
+
+
+def per_call(sw, calls):
+    ids = [str(1 + i % 100) for i in range(calls)]
+    for i in ids[:50]:
+        sw.product.get(i)
+    start = time.perf_counter()
+    for i in ids:
+        sw.product.get(i)
+    return (time.perf_counter() - start) / calls
+
+
+def main(calls=2000):
+    logging.getLogger('shopwave.metrics').setLevel(logging.INFO)
+    with FakeShopwave() as server:
+        base = None
+        print('%-18s %10s %10s' % ('', 'us/call', 'overhead'))
+        for name, make in CASES:
+            sw = server.client(metrics=make())
+            # Best of three, the server shares the interpreter.
+            t = min(per_call(sw, calls) for _ in range(3))
+            sw.close()
+            if base is None:
+                base = t
+            print('%-18s %10.1f %9.1f%%' % (name, t * 1e6,
+                                            (t / base - 1) * 100))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,140 @@
+#! -*- coding: utf-8 -*-
+"""
+Model construction benchmark for BasketReport and Product.
+
+Compares Model(data=...) of this tree with Model(data=...) of a baseline
+revision (by default the root commit, before compiled hydrators). The
+baseline models are checked out with git archive into a temporary
+directory and timed in a subprocess. The data are the payloads of the fake
+server: catalogue products and report baskets with their product lines and
+transactions, every basket with its own completion time.
+
+    python benchmarks/bench_models.py [n_baskets] [baseline_revision]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Speedup asked of the compiled hydrators.
+TARGET = 5.0
+
+
+# Synthetic rows shared with the other benchmarks: baskets of product lines
+# drawn from 50 distinct products.
+
+def product_data(i):
+    return {
+        'id': 1000 + i % 50, 'n': 'Product %d' % (i % 50), 'price': '2.50',
+        'activeDate': '2017-01-09T16:49:58.000Z', 'bPIId': i, 'q': 1 + i % 3,
+        'pIP': '250', 'pMP': '250', 'vP': '20', 'productInstanceId': i,
+    }
+
+
+def basket_data(i, lines=3):
+    return {
+        'bId': i, 'bN': 'Basket %d' % i, 'c': '2017-01-10 12:%02d:%02d'
+        % (i % 60, i % 60), 'cId': 7, 'cd': 0, 'ch': 0, 'sId': 1 + i % 4,
+        't': '0', 'p': {str(j): product_data(i + j) for j in range(lines)},
+        'tr': {str(i): {'tId': i, 'tA': 750, 'tT': 125, 'tTy': 'Card',
+                        'bId': i}},
+    }
+
+
+def payloads(n):
+    from shopwave.fakeserver import EPOCH, FakeShopwave
+    server = FakeShopwave(n_products=500, baskets_per_hour=60)
+    to_date = EPOCH + timedelta(hours=-(-n // 60))
+    baskets = list(server.baskets(EPOCH, to_date)['baskets'].values())[:n]
+    return {'Product': list(server.products.values()),
+            'BasketReport': baskets}
+
+
+def time_models(data, repeat=5):
+    """
+    Returns
+    -------
+    dict of model name to the best time per object in microseconds.
+    """
+    from shopwave import models
+    timings = {}
+    for name, rows in data.items():
+        cls = getattr(models, name)
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for row in rows:
+                cls(data=row)
+            elapsed = (time.perf_counter() - start) / len(rows) * 1e6
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+    return timings
+
+
+def run_baseline(tree, data_path):
+    """ Entry point of the subprocess timing the baseline tree.
+    """
+    import collections
+    import collections.abc
+    # The baseline predates Python 3.10, which removed these aliases.
+    collections.Mapping = collections.abc.Mapping
+    # Only the models are imported: the package __init__ and the baseline
+    # utils use Python 2 style imports (e.g. 'from settings import ...').
+    open(os.path.join(tree, 'shopwave', '__init__.py'), 'w').close()
+    sys.path[:0] = [tree, os.path.join(tree, 'shopwave')]
+    with open(data_path) as f:
+        data = json.load(f)
+    print(json.dumps(time_models(data)))
+
+
+def baseline_timings(data, revision):
+    with tempfile.TemporaryDirectory() as tree:
+        archive = subprocess.run(
+            ['git', '-C', ROOT, 'archive', revision, 'shopwave'],
+            check=True, stdout=subprocess.PIPE).stdout
+        subprocess.run(['tar', '-x', '-C', tree], input=archive, check=True)
+        data_path = os.path.join(tree, 'data.json')
+        with open(data_path, 'w') as f:
+            json.dump(data, f)
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--baseline', tree,
+             data_path], check=True, stdout=subprocess.PIPE, cwd=tree).stdout
+    return json.loads(out)
+
+
+def root_commit():
+    return subprocess.run(
+        ['git', '-C', ROOT, 'rev-list', '--max-parents=0', 'HEAD'],
+        check=True, stdout=subprocess.PIPE,
+        universal_newlines=True).stdout.split()[0]
+
+
+def main(n=5000, revision=None):
+    sys.path.insert(0, ROOT)
+    revision = revision or root_commit()
+    data = payloads(int(n))
+    old = baseline_timings(data, revision)
+    new = time_models(data)
+    print('%-14s %10s %10s %8s' % ('model', 'baseline', 'hydrator',
+                                   'speedup'))
+    for name in data:
+        speedup = old[name] / new[name]
+        print('%-14s %7.2f us %7.2f us %7.1fx%s'
+              % (name, old[name], new[name], speedup,
+                 '' if speedup >= TARGET else
+                 '  (below the %.0fx target)' % TARGET))
+    print('baseline: %s, %d products, %d baskets'
+          % (revision[:10], len(data['Product']), len(data['BasketReport'])))
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--baseline']:
+        run_baseline(*sys.argv[2:])
+    else:
+        main(*sys.argv[1:])
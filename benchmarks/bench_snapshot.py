@@ -0,0 +1,65 @@
+#! -*- coding: utf-8 -*-
+"""
+Repeat analyses from a local snapshot: one week of baskets requested from a
+fake server with 20ms latency (all_windowed) against the same baskets read
+from a SnapshotStore, plus the cost of the initial and an incremental
+sync_to.
+
+    python benchmarks/bench_snapshot.py [baskets per hour]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from shopwave.fakeserver import FakeShopwave
+from shopwave.snapshot import SnapshotStore
+
+FROM, TO = '2017-02-01 00:00:00', '2017-02-08 00:00:00'
+
+
+def timed(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(baskets_per_hour=60):
+    directory = tempfile.mkdtemp()
+    store = SnapshotStore(os.path.join(directory, 'snapshot.db'))
+    with FakeShopwave(latency=0.02,
+                      baskets_per_hour=baskets_per_hour) as server:
+        sw = server.client(pool_maxsize=8)
+        t, n = timed(lambda: sw.report_basket.sync_to(
+            store, from_date=FROM, to_date=TO), repeat=1)
+        print('%-28s %8.1f ms  (%d baskets)' % ('initial sync_to', t * 1e3, n))
+        t, n = timed(lambda: sw.report_basket.sync_to(store, to_date=TO),
+                     repeat=1)
+        print('%-28s %8.1f ms  (%d baskets)' % ('incremental sync_to', t * 1e3,
+                                               n))
+        t, _ = timed(lambda: sw.report_basket.all_windowed(
+            from_date=FROM, to_date=TO, workers=8))
+        print('%-28s %8.1f ms' % ('all_windowed (API)', t * 1e3))
+        calls = sum(server.stats.values())
+        sw = server.client(snapshot=store)
+        for name, kwargs in (('models', {}), ('lazy', {'lazy': True}),
+                             ('json', {'return_format': 'json'}),
+                             ('one store', {'sId': 2}),
+                             ('one product', {'productId': 8})):
+            t, _ = timed(lambda: sw.report_basket.all(
+                from_date=FROM, to_date=TO, source='local', **kwargs))
+            print('%-28s %8.1f ms' % ('local, ' + name, t * 1e3))
+        print('API requests by local reads: %d'
+              % (sum(server.stats.values()) - calls))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,105 @@
+#! -*- coding: utf-8 -*-
+"""
+Client startup benchmark: time to import shopwave, construct a Shopwave
+client and complete the first request against a local server, each
+measured in a fresh interpreter. Also shows the cost the client paid before
+managers and heavy dependencies were loaded on demand, by building every
+manager and importing requests, redis, numpy and asyncio up front.
+
+    python benchmarks/bench_startup.py [runs]
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('requests', 'redis', 'numpy', 'asyncio', 'aiohttp')
+
+CHILD = r"""
+import sys, time, json
+sys.path.insert(0, %(root)r)
+eager = %(eager)r
+t0 = time.perf_counter()
+if eager:
+    import requests, redis, numpy, asyncio
+import shopwave
+t1 = time.perf_counter()
+loaded = {'import': [m for m in %(heavy)r if m in sys.modules]}
+
+
+class StubCredentials(object):
+    def get_access_token(self):
+        return 'token'
+
+    def refresh(self, stale_token=None):
+        return 'token'
+
+
+sw = shopwave.Shopwave(StubCredentials())
+if eager:
+    for name in sw.OBJECT_LIST:
+        getattr(sw, name.lower())
+t2 = time.perf_counter()
+loaded['construct'] = [m for m in %(heavy)r if m in sys.modules]
+sw.product.base_url = %(base_url)r
+sw.product.get('1')
+t3 = time.perf_counter()
+loaded['first call'] = [m for m in %(heavy)r if m in sys.modules]
+print(json.dumps({'import': t1 - t0, 'construct': t2 - t1,
+                  'first call': t3 - t2, 'loaded': loaded}))
+"""
+
+STAGES = ('import', 'construct', 'first call')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    body = json.dumps({'api': {}, 'products': {
+        '1': {'id': 1, 'n': 'Coffee', 'price': '2.50'}}}).encode()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+
+def run(base_url, eager):
+    script = CHILD % {'root': ROOT, 'eager': eager, 'base_url': base_url,
+                      'heavy': HEAVY_MODULES}
+    out = subprocess.check_output([sys.executable, '-c', script])
+    return json.loads(out.decode().splitlines()[-1])
+
+
+def main(runs=10):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = 'http://127.0.0.1:%d/' % server.server_address[1]
+    try:
+        for label, eager in (('on demand', False), ('up front', True)):
+            results = [run(base_url, eager) for _ in range(runs)]
+            print('%s (median of %d runs):' % (label, runs))
+            total = 0.0
+            for stage in STAGES:
+                t = statistics.median(r[stage] for r in results)
+                total += t
+                print('  %-12s %8.1f ms   loaded: %s'
+                      % (stage, t * 1e3,
+                         ', '.join(results[-1]['loaded'][stage]) or '-'))
+            print('  %-12s %8.1f ms' % ('total', total * 1e3))
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
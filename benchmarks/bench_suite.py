@@ -0,0 +1,247 @@
+#! -*- coding: utf-8 -*-
+"""
+End to end benchmark suite: drives Shopwave against shopwave.fakeserver
+(started in a separate process) through a set of scenarios, and reports per
+scenario
+
+    req/s    requests handled by the server per second of wall time
+    p50/p99  latency of a client call
+    hydrate  time per call spent decoding responses and building models
+    peak     peak memory allocated by the client (tracemalloc, second pass)
+    errors   non-200 responses served (injected errors, 401s, 429s)
+
+Save a run with --save and compare later runs against it with --baseline:
+
+    python benchmarks/bench_suite.py [--scenario NAME ...] [--scale 0.5]
+                                     [--save FILE] [--baseline FILE]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from shopwave import Shopwave, AsyncShopwave
+from shopwave.fakeserver import credentials_for
+from shopwave.manager.base import GenericManager
+
+
+class HydrationTimer(object):
+    """
+    Times GenericManager._handle_response and _merge_many, where responses
+    are decoded and models built, over all threads.
+    """
+    METHODS = ('_handle_response', '_merge_many')
+
+    def __init__(self):
+        self.total = 0.0
+        self._lock = threading.Lock()
+        self._originals = {}
+
+    def _wrap(self, method):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.total += elapsed
+        return timed
+
+    def __enter__(self):
+        for name in self.METHODS:
+            self._originals[name] = getattr(GenericManager, name)
+            setattr(GenericManager, name, self._wrap(self._originals[name]))
+        return self
+
+    def __exit__(self, *args):
+        for name, method in self._originals.items():
+            setattr(GenericManager, name, method)
+
+
+class FakeServerProcess(object):
+    """ python -m shopwave.fakeserver in a subprocess. """
+    def __init__(self, **options):
+        args = [sys.executable, '-m', 'shopwave.fakeserver']
+        for k, v in options.items():
+            if v is True:
+                args.append('--' + k.replace('_', '-'))
+            elif v is not None and v is not False:
+                args += ['--' + k.replace('_', '-'), str(v)]
+        self.process = subprocess.Popen(args, cwd=ROOT,
+                                        stdout=subprocess.PIPE)
+        self.url = self.process.stdout.readline().decode().strip()
+
+    def control(self, name, method='GET'):
+        request = urllib.request.Request(self.url + '_fake/' + name,
+                                         data=b'' if method == 'POST' else None,
+                                         method=method)
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read().decode())
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+def timed_calls(func, args, workers=1):
+    """ Call func(arg) for every arg, returns the latency of each call. """
+    def call(arg):
+        start = time.perf_counter()
+        func(arg)
+        return time.perf_counter() - start
+
+    if workers == 1:
+        return [call(arg) for arg in args]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(call, args))
+
+
+def catalogue(sw, scale, server):
+    return timed_calls(lambda _: sw.product.all(), range(int(20 * scale)))
+
+
+def get_concurrent(sw, scale, server):
+    ids = [str(1 + i % 500) for i in range(int(400 * scale))]
+    return timed_calls(sw.product.get, ids, workers=8)
+
+
+def get_many(sw, scale, server):
+    ids = list(range(1, int(2000 * scale) + 1))
+    return timed_calls(lambda _: sw.product.get_many(ids), range(3))
+
+
+def report_windowed(sw, scale, server):
+    days = max(int(7 * scale), 1)
+    return timed_calls(lambda _: sw.report_basket.all_windowed(
+        from_date='2017-02-01 00:00:00', to_date='2017-02-%02d 00:00:00'
+        % (1 + days), window='daily'), range(2))
+
+
+def token_expiry(sw, scale, server):
+    def call(i):
+        if i % 25 == 0:
+            server.control('expire-tokens', method='POST')
+        sw.product.get(str(1 + i % 500))
+    return timed_calls(call, range(int(200 * scale)), workers=4)
+
+
+def async_gather(sw, scale, server):
+    import asyncio
+
+    async def run():
+        async def call(i):
+            start = time.perf_counter()
+            await sw.product.get(str(1 + i % 500))
+            return time.perf_counter() - start
+        try:
+            return await sw.gather(*[call(i) for i in range(int(400 * scale))],
+                                   limit=16)
+        finally:
+            await sw.close()
+    return asyncio.run(run())
+
+
+# name: (run function, fake server options, client class, client options)
+SCENARIOS = {
+    'catalogue': (catalogue, {'n_products': 2000}, Shopwave, {}),
+    'get_concurrent': (get_concurrent, {'latency': 0.02}, Shopwave,
+                       {'pool_maxsize': 8}),
+    'get_many': (get_many, {'latency': 0.02, 'n_products': 2000}, Shopwave,
+                 {}),
+    'report_windowed': (report_windowed, {'baskets_per_hour': 60,
+                                          'latency': 0.05}, Shopwave,
+                        {'pool_maxsize': 8}),
+    'flaky': (get_concurrent, {'latency': 0.005, 'error_rate': 0.05,
+                               'throttle': 200}, Shopwave,
+              {'pool_maxsize': 8}),
+    'token_expiry': (token_expiry, {'latency': 0.005}, Shopwave, {}),
+    'async_gather': (async_gather, {'latency': 0.02}, AsyncShopwave, {}),
+}
+
+
+def run_scenario(name, scale, trace=False):
+    func, server_options, Client, client_options = SCENARIOS[name]
+    server = FakeServerProcess(**server_options)
+    try:
+        sw = Client(credentials_for(server.url), base_url=server.url,
+                    **client_options)
+        if trace:
+            tracemalloc.start()
+        with HydrationTimer() as hydration:
+            start = time.perf_counter()
+            latencies = func(sw, scale, server)
+            wall = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace else None
+        if trace:
+            tracemalloc.stop()
+        served = server.control('stats')
+    finally:
+        server.stop()
+    latencies.sort()
+    requests = sum(served.values())
+    return {
+        'calls': len(latencies),
+        'req_s': requests / wall,
+        'p50': statistics.median(latencies),
+        'p99': latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)],
+        'hydrate': hydration.total / len(latencies),
+        'peak': peak,
+        'errors': requests - served.get('200', 0) - served.get('304', 0),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS)
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--save')
+    parser.add_argument('--baseline')
+    args = parser.parse_args(argv)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    results = {}
+    print('%-16s %6s %9s %9s %9s %10s %8s %6s'
+          % ('scenario', 'calls', 'req/s', 'p50 ms', 'p99 ms', 'hydrate ms',
+             'peak MB', 'errors'))
+    for name in args.scenario or SCENARIOS:
+        if SCENARIOS[name][2] is AsyncShopwave:
+            try:
+                import aiohttp
+            except ImportError:
+                print('%-16s skipped, aiohttp not installed' % name)
+                continue
+        result = run_scenario(name, args.scale)
+        result['peak'] = run_scenario(name, args.scale, trace=True)['peak']
+        results[name] = result
+        print('%-16s %6d %9.1f %9.2f %9.2f %10.3f %8.1f %6d'
+              % (name, result['calls'], result['req_s'], result['p50'] * 1e3,
+                 result['p99'] * 1e3, result['hydrate'] * 1e3,
+                 result['peak'] / 1e6, result['errors']))
+        base = baseline.get(name)
+        if base:
+            print('%-16s %6s %8.2fx %8.2fx %8.2fx %9.2fx %7.2fx'
+                  % ('  vs baseline', '', result['req_s'] / base['req_s'],
+                     base['p50'] / result['p50'], base['p99'] / result['p99'],
+                     base['hydrate'] / max(result['hydrate'], 1e-9),
+                     base['peak'] / result['peak']))
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
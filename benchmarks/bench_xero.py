@@ -0,0 +1,59 @@
+#! -*- coding: utf-8 -*-
+"""
+Throughput of the Xero conversion: one day of baskets converted to Xero
+Invoices and Items in batches (and encoded as JSON), from memory and
+streamed from a local fake server with report_basket.iter.
+
+    python benchmarks/bench_xero.py [baskets per hour]
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from shopwave.fakeserver import FakeShopwave
+from shopwave.utils import ShopwaveDatetime
+from shopwave.xero import XeroConverter
+
+FROM, TO = '2017-02-01 00:00:00', '2017-02-02 00:00:00'
+
+
+def report(name, elapsed, baskets, batches):
+    print('%-26s %8.1f ms %10.0f baskets/s %6d batches'
+          % (name, elapsed * 1e3, baskets / elapsed, batches))
+
+
+def convert(baskets, encode=False):
+    start = time.perf_counter()
+    batches = 0
+    for batch in XeroConverter().convert(baskets):
+        if encode:
+            batch.to_json()
+        batches += 1
+    return time.perf_counter() - start, batches
+
+
+def main(baskets_per_hour=2000):
+    server = FakeShopwave(baskets_per_hour=baskets_per_hour)
+    data = server.baskets(ShopwaveDatetime(FROM), ShopwaveDatetime(TO))
+    n = len(data['baskets'])
+    print('%d baskets, %d lines each' % (n, server.lines_per_basket))
+    elapsed, batches = convert(data)
+    report('convert', elapsed, n, batches)
+    elapsed, batches = convert(data, encode=True)
+    report('convert + JSON', elapsed, n, batches)
+    with server:
+        sw = server.client()
+        start = time.perf_counter()
+        baskets = sw.report_basket.iter(from_date=FROM, to_date=TO,
+                                        return_format='json')
+        batches = sum(1 for batch in XeroConverter().convert(baskets))
+        report('streamed from server', time.perf_counter() - start, n,
+               batches)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
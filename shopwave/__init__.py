@@ -1,3 +1,3 @@
 
 from shopwave.auth import Credentials, Scope
-from shopwave.connect import Shopwave
+from shopwave.connect import Shopwave, AsyncShopwave
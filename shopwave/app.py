@@ -5,9 +5,9 @@ import falcon
 import json
 from shopwave import Credentials, Scope
 
-from settings import (OAUTH_BASE_URL, TOKEN_URI, API_BASE_URL, CLIENT_ID,
-                      CLIENT_SECRET, AUTH_URI, ACCESS_TYPE, REDIRECT_URI,
-                      RESPONSE_TYPE)
+from shopwave.settings import (OAUTH_BASE_URL, TOKEN_URI, API_BASE_URL,
+                               CLIENT_ID, CLIENT_SECRET, AUTH_URI, ACCESS_TYPE,
+                               REDIRECT_URI, RESPONSE_TYPE)
 
 
 class AuthAPI:
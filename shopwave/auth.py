@@ -1,16 +1,18 @@
 #! -*- coding: utf-8 -*-
 
-import requests
-import redis
 import logging
-
-from requests.exceptions import HTTPError
+import threading
+import time
 
 # shopwave
 
-from settings import (OAUTH_BASE_URL, TOKEN_URI, API_BASE_URL, CLIENT_ID,
-                      CLIENT_SECRET, AUTH_URI, REDIRECT_URI, AVAILABLE_SCOPES, 
-                      ACCESS_TYPE, RESPONSE_TYPE, REDIS_STORE)
+from shopwave.settings import (OAUTH_BASE_URL, TOKEN_URI, API_BASE_URL,
+                               CLIENT_ID, CLIENT_SECRET, AUTH_URI,
+                               REDIRECT_URI, AVAILABLE_SCOPES, ACCESS_TYPE,
+                               RESPONSE_TYPE, TOKEN_REFRESH_MARGIN,
+                               TOKEN_LOCK_TIMEOUT, TOKEN_REQUEST_TIMEOUT)
+
+logger = logging.getLogger(__name__)
 
 class Scope(object):
     def __init__(self, active_scopes=None):
@@ -41,86 +43,156 @@ class Scope(object):
 class Credentials(object):
     # TODO: Can I rely on that client_id will not change??
     """
-
+    The token store and the access token are set up on first use, so
+    constructing Credentials costs neither an import of redis nor a round
+    trip.
     """
-    def __init__(self, scope=None, authorization_code=None):
+    def __init__(self, scope=None, authorization_code=None, store=None,
+                 token_uri=TOKEN_URI, metrics=None):
         """
         Parameters
         ----------
         scope : Scope
         authorization_code : string
             Authorization code for obtaining access token.
+        store : shopwave.tokenstore.TokenStore, optional
+            Where tokens are kept. Defaults to the TOKEN_STORE setting, i.e.
+            Redis at REDIS_STORE through a connection pool shared by the
+            process.
+        token_uri : string, optional
+            OAuth token endpoint.
+        metrics : shopwave.metrics.Metrics, optional
+            Receives token_refreshes and token_request_seconds. Set by
+            Shopwave(metrics=...) if not given.
         """
-        self.db = redis.StrictRedis(host=REDIS_STORE['host'], 
-                                    port=REDIS_STORE['port'])
+        self._store = store
+        self.token_uri = token_uri
+        self.metrics = metrics
 
-        db_keys_raw = ['access_token', 'refresh_token', 'token_type', 'auth_code']
-        self._db_keys = {key: CLIENT_ID + ":" + key for key in db_keys_raw}
+        # Loaded from the store (or requested) by the first get_access_token.
+        self.access_token = None
+        self.token_type = None
+        self.refresh_token = None
+        # Unix time the access token expires, None if unknown.
+        self.expires_at = None
+        self._lock = threading.RLock()
 
         if scope:       self.scope = scope
         else:           self.scope = Scope()
 
         if authorization_code:  
             self.verify(authorization_code)
-            #self.db.set(self._db_keys['auth_code'], authorization_code)
-        self._get_token()
+
+    @property
+    def store(self):
+        if self._store is None:
+            from shopwave import tokenstore
+            self._store = tokenstore.get_default_store()
+        return self._store
+
+    @property
+    def db(self):
+        """
+        redis.StrictRedis of the token store, None if tokens are not kept in
+        Redis. Setting it switches to a RedisTokenStore on that connection.
+        """
+        return getattr(self.store, 'db', None)
+
+    @db.setter
+    def db(self, db):
+        from shopwave.tokenstore import RedisTokenStore
+        self._store = RedisTokenStore(db)
 
     def verify(self, authorization_code):
-        self.db.set(self._db_keys['auth_code'], authorization_code)
+        self.store.set_auth_code(authorization_code)
 
     def delete(self):
-        self.db.delete(self._db_keys['access_token'])
-        self.db.delete(self._db_keys['refresh_token'])
-        self.db.delete(self._db_keys['token_type'])
+        self.store.delete()
 
-    def _db_get(self, key):
+    def _load_token(self):
         """
-        Fetch value from redis DB and convert value from bytes to string.
+        Read access token, token type, refresh token and remaining lifetime
+        of the access token from the store, in one round trip.
         """
-        value = self.db.get(self._db_keys[key])
-        if value:   return value.decode()
-        else:       return None
+        tokens = self.store.load()
+        self.access_token = tokens['access_token']
+        self.token_type = tokens['token_type']
+        self.refresh_token = tokens['refresh_token']
+        self.expires_at = None
+        if tokens['expires_in']:
+            self.expires_at = time.time() + tokens['expires_in']
+        return self.access_token
 
-    def _get_token(self):
+    def _token_is_fresh(self):
         """
-        Tries multiple approaches to get a valid access token:
-            1. Checks DB for token
-            2. Checks DB for refresh token to request new access token
-            3. Checks DB for authorization code to request new access and
-               refresh token.
+        True if the cached access token is valid for at least another
+        TOKEN_REFRESH_MARGIN seconds.
         """
-        self.access_token = self._db_get('access_token')
-        self.refresh_token = self._db_get('refresh_token')
-        if not self.access_token:    
-            print("NO DB ACCESS_TOKEN, TRYING TO USE REFRESH-TOKEN.")
-            self._refresh_token_call()
-        else:
-            print("RETRIEVED ACCESS-TOKEN FROM DB.")
+        if not self.access_token:
+            return False
+        if self.expires_at is None:
+            return True
+        return time.time() < self.expires_at - TOKEN_REFRESH_MARGIN
 
-        self.token_type = self._db_get('token_type')
+    def get_access_token(self):
+        """
+        Current access token. Served from memory while it is fresh, and
+        refreshed shortly before it expires.
+        """
+        if self._token_is_fresh():
+            return self.access_token
+        return self.refresh(self.access_token)
+
+    def refresh(self, stale_token=None):
+        """
+        Replace stale_token by a new access token. Concurrent calls are
+        coalesced into a single token request: within the process by a lock,
+        across processes by the lock of the token store. Callers that get
+        there after the token was already replaced use the new token without
+        a request.
+
+        Parameters
+        ----------
+        stale_token : string, optional
+            Token that is expired or was rejected by the API. Defaults to the
+            current access token.
+
+        Returns
+        -------
+        New access token.
+        """
+        if stale_token is None:
+            stale_token = self.access_token
+        with self._lock:
+            if self.access_token != stale_token and self._token_is_fresh():
+                # Refreshed by another thread in the meantime.
+                return self.access_token
+            # Refreshed by another process?
+            self._load_token()
+            if self.access_token != stale_token and self._token_is_fresh():
+                return self.access_token
 
+            with self.store.lock(TOKEN_LOCK_TIMEOUT):
+                self._load_token()
+                if self.access_token == stale_token or \
+                        not self._token_is_fresh():
+                    self._refresh_token_call()
         return self.access_token
 
     def __save(self):
         access_token = getattr(self, 'access_token', None)
         expires_in = getattr(self, 'expires_in', None)
         token_type = getattr(self, 'token_type', None)
-        if access_token and expires_in and token_type:
-            self.db.setex(self._db_keys['access_token'], 
-                          expires_in,
-                          access_token)
-            self.db.setex(self._db_keys['token_type'], 
-                          expires_in,
-                          token_type)
         refresh_token = getattr(self, 'refresh_token', None)
-        if refresh_token:
-            self.db.set(self._db_keys['refresh_token'], refresh_token)
+        self.store.save(access_token=access_token, token_type=token_type,
+                        expires_in=expires_in, refresh_token=refresh_token)
 
     def _refresh_token_call(self):
         """
-        Request new access token and using refresh token.
+        Request new access token and using refresh token. Expects the
+        refresh token to be loaded from the store (see _load_token).
         """
-        refresh_token = self.db.get(self._db_keys['refresh_token'])
+        refresh_token = self.refresh_token
         if not refresh_token:
             self._make_token_call()
         else:
@@ -135,8 +207,9 @@ class Credentials(object):
         """
         Request new access token and refresh token using auth. code.
         """
+        from requests.exceptions import HTTPError
         if not authorization_code:
-            authorization_code = self.db.get(self._db_keys['auth_code'])
+            authorization_code = self.store.get_auth_code()
         post_data = {
             'code': authorization_code,
             'grant_type': 'authorization_code'
@@ -157,6 +230,8 @@ class Credentials(object):
         post_data : dict
             Data to submit in POST request.
         """
+        import requests
+        from requests.exceptions import HTTPError
         post_data.update({
             'access_type': ACCESS_TYPE,
             'client_id': CLIENT_ID, 
@@ -164,12 +239,24 @@ class Credentials(object):
             'scope': str(self.scope),
             'client_secret': CLIENT_SECRET,
         })
-        resp = requests.post(TOKEN_URI, post_data)
-        print(resp.content)
+        start = time.perf_counter()
+        resp = requests.post(self.token_uri, post_data,
+                             timeout=TOKEN_REQUEST_TIMEOUT)
+        elapsed = time.perf_counter() - start
+        # Never log the body, it holds the tokens.
+        logger.debug("Token request (%s): HTTP %d in %.3fs",
+                     post_data.get('grant_type'), resp.status_code, elapsed)
+        if self.metrics is not None:
+            self.metrics.observe('token_request_seconds', 'token', elapsed)
+            self.metrics.increment('token_refreshes', 'token',
+                                   grant_type=post_data.get('grant_type'),
+                                   status=resp.status_code)
         data = resp.json()
 
         if resp.status_code == 200:
             for k in keys: setattr(self, k, data[k])
+            if 'expires_in' in keys:
+                self.expires_at = time.time() + int(self.expires_in)
 
         #elif all(map(lambda k: k in data.keys())):
         #    # Unexpected status code, but all requested keys in response body.
@@ -177,7 +264,7 @@ class Credentials(object):
         #    print("[HTTP{0}] TOKEN CALL".format(resp.status_code))
         elif resp.status_code == 401:
             # Invalid refresh token. Make completely new token call.
-            auth_code = self.db.get(self._db_keys['auth_code'])
+            auth_code = self.store.get_auth_code()
             if auth_code:   
                 # TODO loop-danger!!!
                 self._make_token_call(auth_code)
@@ -0,0 +1,269 @@
+#! -*- coding: utf-8 -*-
+"""
+Opt-in cache of GET responses, for reference data such as categories,
+products, stores and employees.
+
+Responses are kept in a size bounded LRU in memory and, optionally, in Redis
+to be shared between processes. Entries are keyed by endpoint, URI, query
+parameters and request headers except Authorization, so one cache must only
+be used with the credentials of one merchant.
+
+Once an entry is older than the TTL of its endpoint it is revalidated with a
+conditional request (If-None-Match / If-Modified-Since) if the response had
+an ETag or Last-Modified header; a 304 answer renews the entry without
+transferring the body again.
+"""
+
+import collections
+import hashlib
+import json
+import threading
+import time
+
+from shopwave.settings import (CLIENT_ID, CACHE_TTLS, CACHE_DEFAULT_TTL,
+                               CACHE_MAX_ENTRIES, CACHE_MAX_BYTES,
+                               CACHE_STALE_TTL, CACHE_INVALIDATES)
+
+from shopwave.transport import BufferedResponse
+
+# Response headers kept with cached responses.
+CACHED_HEADERS = ('content-type', 'etag', 'last-modified')
+
+
+class CachedResponse(BufferedResponse):
+    """
+    BufferedResponse served from the cache.
+
+    Attributes
+    ----------
+    expires : float
+        time.time() after which the response has to be revalidated.
+    """
+    from_cache = True
+
+    def __init__(self, status_code, headers, content, encoding=None,
+                 expires=0.0):
+        from requests.structures import CaseInsensitiveDict
+        super(CachedResponse, self).__init__(status_code,
+                                             CaseInsensitiveDict(headers),
+                                             content, encoding=encoding)
+        self.expires = expires
+
+    @classmethod
+    def from_response(cls, response, expires):
+        headers = {}
+        for name in CACHED_HEADERS:
+            value = response.headers.get(name)
+            if value is not None:
+                headers[name] = value
+        return cls(response.status_code, headers, response.content,
+                   encoding=response.encoding, expires=expires)
+
+    @property
+    def fresh(self):
+        return time.time() < self.expires
+
+    @property
+    def validators(self):
+        """ Headers for a conditional request revalidating this response.
+        """
+        headers = {}
+        if 'etag' in self.headers:
+            headers['If-None-Match'] = self.headers['etag']
+        if 'last-modified' in self.headers:
+            headers['If-Modified-Since'] = self.headers['last-modified']
+        return headers
+
+    def dumps(self):
+        meta = {
+            'status_code':  self.status_code,
+            'headers':      dict(self.headers),
+            'encoding':     self.encoding,
+            'expires':      self.expires,
+        }
+        return json.dumps(meta).encode('utf-8') + b'\n' + self.content
+
+    @classmethod
+    def loads(cls, value):
+        meta, content = value.split(b'\n', 1)
+        meta = json.loads(meta.decode('utf-8'))
+        return cls(meta['status_code'], meta['headers'], content,
+                   encoding=meta['encoding'], expires=meta['expires'])
+
+
+class ResponseCache(object):
+    """
+    Parameters
+    ----------
+    ttls : dict, optional
+        OBJECT_LIST name -> seconds responses are used without revalidation.
+        Defaults to CACHE_TTLS.
+    default_ttl : float or None, optional
+        TTL of endpoints not in ttls; None to not cache them.
+    max_entries, max_bytes : int, optional
+        Bounds of the in memory LRU.
+    stale_ttl : float, optional
+        Seconds an expired response with an ETag or Last-Modified header is
+        kept for revalidation.
+    db : redis.StrictRedis, optional
+        Shared second tier, e.g. credentials.db.
+    prefix : string, optional
+        Redis key prefix, defaults to '<CLIENT_ID>:cache:'.
+    """
+    def __init__(self, ttls=None, default_ttl=CACHE_DEFAULT_TTL,
+                 max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES,
+                 stale_ttl=CACHE_STALE_TTL, db=None, prefix=None):
+        if ttls is None:
+            ttls = CACHE_TTLS
+        self.ttls = dict(ttls)
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        self.db = db
+        if prefix is None:
+            prefix = CLIENT_ID + ':cache:'
+        self.prefix = prefix
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._invalidate_hooks = []
+
+    def ttl(self, name):
+        """ TTL of endpoint name, None if its responses are not cached.
+        """
+        return self.ttls.get(name, self.default_ttl)
+
+    def key(self, name, request):
+        """
+        Parameters
+        ----------
+        name : string
+            OBJECT_LIST name of the endpoint.
+        request : dict
+            As built by GenericManager._build_request.
+        """
+        headers = sorted((k.lower(), str(v))
+                         for k, v in request['headers'].items()
+                         if k.lower() != 'authorization')
+        params = sorted((str(k), str(v))
+                        for k, v in (request['params'] or {}).items())
+        digest = hashlib.sha1(json.dumps(
+            [request['method'].upper(), request['uri'], params, headers]
+        ).encode('utf-8')).hexdigest()
+        return '%s:%s' % (name, digest)
+
+    def get(self, key):
+        """
+        Returns
+        -------
+        CachedResponse, possibly expired, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if time.time() < self._retained_until(entry):
+                    self._entries.move_to_end(key)
+                    return entry
+                self._forget(key)
+        if self.db is not None:
+            value = self.db.get(self.prefix + key)
+            if value is not None:
+                entry = CachedResponse.loads(value)
+                self._remember(key, entry)
+                return entry
+        return None
+
+    def set(self, key, response, ttl):
+        """
+        Cache response for ttl seconds.
+
+        Returns
+        -------
+        CachedResponse
+        """
+        entry = CachedResponse.from_response(response, time.time() + ttl)
+        self._remember(key, entry)
+        if self.db is not None:
+            self.db.set(self.prefix + key, entry.dumps(),
+                        ex=int(self._retention(entry, ttl)) + 1)
+        return entry
+
+    def renew(self, key, entry, ttl):
+        """ Mark entry fresh again after a 304 Not Modified response.
+        """
+        entry.expires = time.time() + ttl
+        if self.db is not None:
+            self.db.set(self.prefix + key, entry.dumps(),
+                        ex=int(self._retention(entry, ttl)) + 1)
+        return entry
+
+    def invalidate(self, *names):
+        """
+        Drop the cached responses of the endpoints names, and of the
+        endpoints depending on them (CACHE_INVALIDATES), then call the hooks
+        added with add_invalidate_hook.
+        """
+        names = set(names)
+        for name in list(names):
+            names.update(CACHE_INVALIDATES.get(name, ()))
+        with self._lock:
+            for key in list(self._entries):
+                if key.split(':', 1)[0] in names:
+                    self._forget(key)
+        if self.db is not None:
+            for name in names:
+                keys = list(self.db.scan_iter(match=self.prefix + name + ':*'))
+                if keys:
+                    self.db.delete(*keys)
+        for hook in self._invalidate_hooks:
+            hook(names)
+
+    def add_invalidate_hook(self, hook):
+        """
+        Parameters
+        ----------
+        hook : callable
+            Called with the set of invalidated endpoint names.
+        """
+        self._invalidate_hooks.append(hook)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+        if self.db is not None:
+            keys = list(self.db.scan_iter(match=self.prefix + '*'))
+            if keys:
+                self.db.delete(*keys)
+
+    def _retention(self, entry, ttl):
+        if entry.validators:
+            return ttl + self.stale_ttl
+        return ttl
+
+    def _retained_until(self, entry):
+        if entry.validators:
+            return entry.expires + self.stale_ttl
+        return entry.expires
+
+    def _remember(self, key, entry):
+        with self._lock:
+            if key in self._entries:
+                self._forget(key)
+            self._entries[key] = entry
+            self._size += len(entry.content)
+            while self._entries and (len(self._entries) > self.max_entries or
+                                     self._size > self.max_bytes):
+                self._forget(next(iter(self._entries)))
+
+    def _forget(self, key):
+        entry = self._entries.pop(key)
+        self._size -= len(entry.content)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return str('<ResponseCache: %d entries, %d bytes>'
+                   % (len(self._entries), self._size))
@@ -0,0 +1,113 @@
+#! -*- coding: utf-8 -*-
+
+import json
+import os
+import threading
+
+from shopwave.settings import CLIENT_ID, CHECKPOINT_FILE
+
+
+class CheckpointStore(object):
+    """
+    Persists sync checkpoints (JSON serialisable dicts) under a name.
+    Subclasses implement load and save.
+    """
+    def load(self, name):
+        """ Return checkpoint saved under name, or None.
+        """
+        raise NotImplementedError
+
+    def save(self, name, checkpoint):
+        raise NotImplementedError
+
+    def delete(self, name):
+        raise NotImplementedError
+
+
+class RedisCheckpointStore(CheckpointStore):
+    def __init__(self, db, prefix=None):
+        """
+        Parameters
+        ----------
+        db : redis.StrictRedis
+        prefix : string, optional
+            Key prefix, defaults to '<CLIENT_ID>:checkpoint:'.
+        """
+        self.db = db
+        if prefix is None:
+            prefix = CLIENT_ID + ':checkpoint:'
+        self.prefix = prefix
+
+    def load(self, name):
+        value = self.db.get(self.prefix + name)
+        if value:   return json.loads(value.decode())
+        else:       return None
+
+    def save(self, name, checkpoint):
+        self.db.set(self.prefix + name, json.dumps(checkpoint))
+
+    def delete(self, name):
+        self.db.delete(self.prefix + name)
+
+
+class FileCheckpointStore(CheckpointStore):
+    def __init__(self, path=CHECKPOINT_FILE):
+        """
+        Parameters
+        ----------
+        path : string, optional
+            JSON file holding all checkpoints. Written atomically.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, data):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self, name):
+        with self._lock:
+            return self._read().get(name)
+
+    def save(self, name, checkpoint):
+        with self._lock:
+            data = self._read()
+            data[name] = checkpoint
+            self._write(data)
+
+    def delete(self, name):
+        with self._lock:
+            data = self._read()
+            if data.pop(name, None) is not None:
+                self._write(data)
+
+
+def get_default_store(credentials):
+    """
+    Checkpoint store in the Redis instance used by *credentials*, or a local
+    file if that Redis instance can not be reached.
+    """
+    try:
+        # Sets up the default token store, Redis, on first use.
+        db = getattr(credentials, 'db', None)
+    except ImportError:
+        # redis is not installed.
+        db = None
+    if db is not None:
+        from redis import exceptions as redis_exceptions
+        try:
+            db.ping()
+            return RedisCheckpointStore(db)
+        except (redis_exceptions.ConnectionError,
+                redis_exceptions.TimeoutError):
+            pass
+    return FileCheckpointStore()
@@ -0,0 +1,88 @@
+#! -*- coding: utf-8 -*-
+"""
+JSON encoding and decoding through the fastest available backend.
+
+The backend is chosen by JSON_BACKEND in settings: 'auto' picks the first
+installed of orjson, ujson and simdjson (pysimdjson) and falls back to the
+standard library json module. All backends decode from bytes, so response
+bodies are decoded from response.content without creating response.text.
+"""
+
+import importlib
+import json
+
+from shopwave.settings import JSON_BACKEND
+
+AUTO_ORDER = ('orjson', 'ujson', 'simdjson', 'json')
+
+
+def _dumps_to_str(dumps):
+    def wrapper(obj):
+        value = dumps(obj)
+        if isinstance(value, bytes):
+            value = value.decode('utf-8')
+        return value
+    return wrapper
+
+
+class Backend(object):
+    def __init__(self, name, loads, dumps):
+        self.name = name
+        self.loads = loads
+        self.dumps = _dumps_to_str(dumps)
+
+    def __repr__(self):
+        return str('<Backend: %s>' % self.name)
+
+
+def load_backend(name):
+    """
+    Parameters
+    ----------
+    name : string
+        One of AUTO_ORDER, or 'auto'.
+
+    Raises
+    ------
+    ImportError if the backend is not installed.
+    """
+    if name == 'auto':
+        for candidate in AUTO_ORDER:
+            try:
+                return load_backend(candidate)
+            except ImportError:
+                pass
+    if name == 'json':
+        return Backend('json', json.loads, json.dumps)
+    if name not in AUTO_ORDER:
+        raise ValueError("Unknown JSON backend '%s', use one of %s or 'auto'."
+                         % (name, ', '.join(AUTO_ORDER)))
+    module = importlib.import_module(name)
+    return Backend(name, module.loads, module.dumps)
+
+
+_backend = load_backend(JSON_BACKEND)
+
+
+def get_backend():
+    return _backend
+
+
+def set_backend(name):
+    """ Select the backend used by loads and dumps, see load_backend.
+    """
+    global _backend
+    _backend = load_backend(name)
+    return _backend
+
+
+def loads(data):
+    """ Decode JSON from bytes or str.
+    """
+    return _backend.loads(data)
+
+
+def dumps(obj):
+    """ Encode obj as JSON str.
+    """
+    return _backend.dumps(obj)
@@ -0,0 +1,240 @@
+#! -*- coding: utf-8 -*-
+"""
+Column oriented result sets, built directly from API response data without
+creating model instances. Requires numpy.
+
+Every model becomes a Table of typed arrays:
+
+    IntField        numpy.ma.MaskedArray of int64, missing values masked
+    FloatField      float64, missing values NaN
+    DateTimeField   datetime64[s], missing values NaT
+    CharField       object array of interned strings, missing values None
+
+Reference fields become child tables named '<parent table>.<attrname>',
+e.g. 'baskets.p' for the product lines of BasketReport. Child tables have
+two extra columns: parent_id, the primary key of the parent row, and
+parent_row, its row index in the parent table. Nested child tables, such
+as 'baskets.p.categories', are only included if they hold any rows.
+
+The id of a child row is its key in the parent data, as for models. Where
+the referenced data carries an id of its own (e.g. the product id of a
+basket line, keyed by the line id), it is kept in an extra column named
+after the model, e.g. productId.
+"""
+
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from shopwave import fields
+from shopwave import models
+from shopwave.utils import ShopwaveDatetime
+from shopwave.utils.datetime import FIXED_LAYOUT, normalize_datetime_string
+
+# Key of the id inside referenced data in the rows of _reference_rows.
+_REF_ID = object()
+
+
+class Table(object):
+    """
+    Parameters
+    ----------
+    name : string
+    model : class derived from shopwave.models.Model
+    columns : dict of column name -> array
+    """
+    def __init__(self, name, model, columns):
+        self.name = name
+        self.model = model
+        self.columns = columns
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def __len__(self):
+        for column in self.columns.values():
+            return len(column)
+        return 0
+
+    def __repr__(self):
+        return str('<Table: %s (%s), %d rows>'
+                   % (self.name, self.model.__name__, len(self)))
+
+
+class ColumnStore(dict):
+    """
+    dict of table name -> Table, e.g. 'baskets', 'baskets.p', 'baskets.tr'.
+    """
+    def __repr__(self):
+        return str('<ColumnStore: %s>' % ', '.join(sorted(self)))
+
+
+def _to_array(field, values):
+    if isinstance(field, fields.IntField):
+        mask = [v is None for v in values]
+        data = [0 if v is None else int(v) for v in values]
+        return np.ma.array(np.array(data, dtype=np.int64), mask=mask)
+    elif isinstance(field, fields.FloatField):
+        return np.array([np.nan if v is None else float(v) for v in values],
+                        dtype=np.float64)
+    elif isinstance(field, fields.DateTimeField):
+        return parse_datetimes(values)
+    else:
+        return np.array([None if v is None else sys.intern(str(v))
+                         for v in values], dtype=object)
+
+
+def parse_datetimes(values):
+    """
+    Parse datetime values as DateTimeField does, into a datetime64[s] array.
+    Strings in the fixed ISO layout are converted by numpy in a single call,
+    other values one by one through ShopwaveDatetime.
+
+    Parameters
+    ----------
+    values : sequence of strings, datetimes or None
+        None becomes NaT.
+    """
+    result = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[s]')
+    rows = []
+    strings = []
+    for row, value in enumerate(values):
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = normalize_datetime_string(value)
+            # numpy accepts year 0, datetime does not.
+            if FIXED_LAYOUT.match(value) and not value.startswith('0000'):
+                rows.append(row)
+                strings.append(value)
+                continue
+        result[row] = np.datetime64(ShopwaveDatetime(value), 's')
+    if rows:
+        try:
+            result[rows] = np.array(strings, dtype='datetime64[s]')
+        except ValueError:
+            # Raise the same error as the model path for invalid values.
+            for value in strings:
+                ShopwaveDatetime(value)
+            raise
+    return result
+
+
+def _reference_rows(field, data):
+    """ Raw rows for the three data forms handled by Reference._parse_value.
+    """
+    if field.ref_attrname:
+        return [{'id': idNr, field.ref_attrname: data[idNr]} for idNr in data]
+    elif isinstance(data, dict):
+        rows = []
+        for idNr in data:
+            row = dict(data[idNr])
+            if 'id' in row:
+                row[_REF_ID] = row['id']
+            row['id'] = idNr
+            rows.append(row)
+        return rows
+    else:
+        return [{'id': idNr} for idNr in data]
+
+
+def _build_tables(name, ModelClass, rows, store, parents=None):
+    meta = ModelClass._meta
+    lookup = {}
+    for key in meta.get_field_names():
+        field = meta.get_field(key)
+        if field is not None:
+            lookup[key] = field.attrname
+    scalar_fields = []
+    reference_fields = []
+    for field in meta.get_fields():
+        if isinstance(field, fields.Reference):
+            reference_fields.append(field)
+        else:
+            scalar_fields.append(field)
+    primary_field = meta.get_primary_field()
+
+    values = {f.attrname: [] for f in scalar_fields}
+    children = {f.attrname: ([], [], []) for f in reference_fields}
+    ref_ids = []
+    # Ids inside the referenced data, e.g. the product ids of basket lines.
+    has_ref_ids = False
+    for row_nr, raw in enumerate(rows):
+        record = {}
+        if _REF_ID in raw:
+            has_ref_ids = True
+        ref_ids.append(raw.pop(_REF_ID, None))
+        for key, value in raw.items():
+            try:
+                record[lookup[key]] = value
+            except KeyError:
+                raise TypeError('%s is an invalid key for %s.'
+                                % (key, ModelClass.__name__))
+        for attrname, column in values.items():
+            column.append(record.get(attrname))
+        for field in reference_fields:
+            data = record.get(field.attrname)
+            if not data:
+                continue
+            child_rows, parent_ids, parent_rows = children[field.attrname]
+            if primary_field is not None:
+                parent_id = record.get(primary_field.attrname)
+            else:
+                parent_id = row_nr
+            for child in _reference_rows(field, data):
+                child_rows.append(child)
+                parent_ids.append(parent_id)
+                parent_rows.append(row_nr)
+
+    columns = {}
+    if parents is not None:
+        parent_field, parent_ids, parent_rows = parents
+        if parent_field is not None:
+            columns['parent_id'] = _to_array(parent_field, parent_ids)
+        else:
+            columns['parent_id'] = np.array(parent_ids, dtype=np.int64)
+        columns['parent_row'] = np.array(parent_rows, dtype=np.int64)
+    for field in scalar_fields:
+        columns[field.attrname] = _to_array(field, values[field.attrname])
+    if has_ref_ids and primary_field is not None:
+        model_name = ModelClass.__name__
+        columns[model_name[0].lower() + model_name[1:] + 'Id'] = _to_array(
+            primary_field, ref_ids)
+    store[name] = Table(name, ModelClass, columns)
+
+    for field in reference_fields:
+        child_rows, parent_ids, parent_rows = children[field.attrname]
+        if not child_rows and parents is not None:
+            # Models reference each other (Category.p, Product.categories),
+            # so empty tables are only created for top level models.
+            continue
+        _build_tables('%s.%s' % (name, field.attrname), field.get_ref_model(),
+                      child_rows, store,
+                      parents=(primary_field, parent_ids, parent_rows))
+
+
+def build_column_store(json_data):
+    """
+    Parameters
+    ----------
+    json_data : dict
+        Response data without the 'api' part, as passed to
+        GenericManager._parse_json.
+
+    Returns
+    -------
+    ColumnStore
+    """
+    if np is None:
+        raise ImportError("numpy is required for return_format='columnar'.")
+    store = ColumnStore()
+    for obj_name, data in json_data.items():
+        ModelClass = models.get_model_class(obj_name)
+        _build_tables(obj_name, ModelClass, list(data.values()), store)
+    return store
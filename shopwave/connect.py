@@ -1,24 +1,215 @@
 #! -*- coding: utf-8 -*-
 
-import requests
-
-from settings import (API_BASE_URL)
+from shopwave.settings import (API_BASE_URL, HTTP_POOL_CONNECTIONS,
+                               HTTP_POOL_MAXSIZE, HTTP_POOL_BLOCK,
+                               ASYNC_CONCURRENCY)
 from urllib.parse import urlencode
 import json
+import threading
 
 from shopwave import manager
 from shopwave.settings import OBJECT_LIST
+from shopwave.transport import Transport, AsyncTransport
+from shopwave.retry import RetryPolicy
+from shopwave.identity import IdentityMap
+from shopwave.utils import aio
+
+
+def _default_limiter():
+    from shopwave.ratelimit import get_default_limiter
+    return get_default_limiter()
+
+
+def _new_cache():
+    from shopwave.cache import ResponseCache
+    return ResponseCache()
+
+
+class _ManagerAccess(object):
+    """
+    Creates the manager of an endpoint (sw.product, sw.report_basket, ...)
+    on first access, so a client only pays for the managers it uses.
+    Subclasses call _init_managers from __init__.
+    """
+    _manager_class = staticmethod(manager.get_manager_class)
+    _manager_names = {name.lower(): name for name in OBJECT_LIST}
+
+    def __getattr__(self, attr):
+        # Only reached for attributes not set yet, i.e. managers not built.
+        name = self._manager_names.get(attr)
+        if name is None or '_manager_kwargs' not in self.__dict__:
+            raise AttributeError("'%s' object has no attribute '%s'"
+                                 % (type(self).__name__, attr))
+        with self._manager_lock:
+            if attr not in self.__dict__:
+                ManagerClass = self._manager_class(name)
+                setattr(self, attr,
+                        ManagerClass(name, self.credentials,
+                                     **self._manager_kwargs))
+        return self.__dict__[attr]
+
+    def __dir__(self):
+        return sorted(set(super(_ManagerAccess, self).__dir__())
+                      | set(self._manager_names))
+
+    def _init_managers(self, credentials, **kwargs):
+        self.credentials = credentials
+        metrics = kwargs.get('metrics')
+        if metrics is not None and getattr(credentials, 'metrics',
+                                           None) is None:
+            credentials.metrics = metrics
+        self.OBJECT_LIST = tuple(self._manager_names.values())
+        self._manager_lock = threading.Lock()
+        self._manager_kwargs = kwargs
+
+
+class Shopwave(_ManagerAccess):
+
+    def __init__(self, credentials, transport=None,
+                 pool_connections=HTTP_POOL_CONNECTIONS,
+                 pool_maxsize=HTTP_POOL_MAXSIZE, pool_block=HTTP_POOL_BLOCK,
+                 retry_policy=None, rate_limiter=None, cache=None,
+                 identity_map=None, base_url=API_BASE_URL, metrics=None,
+                 snapshot=None):
+        """
+        Parameters
+        ----------
+        credentials : shopwave.Credentials
+        transport : shopwave.transport.Transport, optional
+            HTTP transport shared by all managers. If not provided, a pooled
+            keep-alive transport is created from the pool_* arguments.
+        pool_connections, pool_maxsize, pool_block : optional
+            See shopwave.transport.Transport.
+        retry_policy : shopwave.retry.RetryPolicy, optional
+            Retry and backoff behaviour of all managers.
+        rate_limiter : shopwave.ratelimit.RateLimiter, optional
+            Request limits shared by all managers. Defaults to a RateLimiter
+            for the RATE_LIMITS settings, if any are set.
+        cache : shopwave.cache.ResponseCache or True, optional
+            Cache GET responses of the endpoints in CACHE_TTLS. True creates
+            an in memory ResponseCache.
+        identity_map : shopwave.identity.IdentityMap, True or False, optional
+            By default referenced objects are shared within a response. An
+            IdentityMap (or True for a new one) shares them across all
+            responses of this client, and basket lines share their Product
+            (see shopwave.identity), False disables sharing.
+        base_url : string, optional
+            API root, defaults to API_BASE_URL.
+        metrics : shopwave.metrics.Metrics, optional
+            Per endpoint timings, sizes, retries, cache results and token
+            refreshes, see shopwave.metrics. Also used by credentials, unless
+            they have metrics of their own.
+        snapshot : shopwave.snapshot.SnapshotStore, optional
+            Local store for calls with source='local' and sync_to. Objects
+            received from the API are written through to it.
+        """
+        if transport is None:
+            transport = Transport(pool_connections=pool_connections,
+                                  pool_maxsize=pool_maxsize,
+                                  pool_block=pool_block)
+        self.transport = transport
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+        self.retry_policy = retry_policy
+        if rate_limiter is None:
+            rate_limiter = _default_limiter()
+        self.rate_limiter = rate_limiter
+        if cache is True:
+            cache = _new_cache()
+        self.cache = cache
+        if identity_map is True:
+            identity_map = IdentityMap()
+        self.identity_map = identity_map
+        self._init_managers(credentials, transport=transport,
+                            retry_policy=retry_policy,
+                            rate_limiter=rate_limiter, cache=cache,
+                            identity_map=identity_map, base_url=base_url,
+                            metrics=metrics, snapshot=snapshot)
+
+    def stats(self):
+        """
+        Request count, timings and bytes received over the shared transport.
+        mean_overhead is the mean time per request not spent waiting for the
+        server, i.e. connection setup, body download and client side work.
+        """
+        return self.transport.stats.as_dict()
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncShopwave(_ManagerAccess):
+    """
+    asyncio version of Shopwave. Manager methods are coroutine functions:
+
+    >>> sw = AsyncShopwave(cred)
+    >>> products = await sw.product.all()
+    >>> results = await sw.gather(*[sw.product.get(i) for i in ids], limit=50)
+    """
+    _manager_class = staticmethod(manager.get_async_manager_class)
 
+    def __init__(self, credentials, transport=None,
+                 pool_connections=HTTP_POOL_CONNECTIONS,
+                 pool_maxsize=HTTP_POOL_MAXSIZE, retry_policy=None,
+                 rate_limiter=None, cache=None, identity_map=None,
+                 base_url=API_BASE_URL, metrics=None,
+                 snapshot=None):
+        """
+        Parameters
+        ----------
+        credentials : shopwave.Credentials
+        transport : shopwave.transport.AsyncTransport, optional
+            HTTP transport shared by all managers. If not provided, one is
+            created from the pool_* arguments.
+        pool_connections, pool_maxsize : optional
+            See shopwave.transport.AsyncTransport.
+        retry_policy : shopwave.retry.RetryPolicy, optional
+        rate_limiter : shopwave.ratelimit.RateLimiter, optional
+        cache : shopwave.cache.ResponseCache or True, optional
+        identity_map : shopwave.identity.IdentityMap, True or False, optional
+        base_url : string, optional
+        metrics : shopwave.metrics.Metrics, optional
+        snapshot : shopwave.snapshot.SnapshotStore, optional
+        """
+        if transport is None:
+            transport = AsyncTransport(pool_connections=pool_connections,
+                                       pool_maxsize=pool_maxsize)
+        self.transport = transport
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+        self.retry_policy = retry_policy
+        if rate_limiter is None:
+            rate_limiter = _default_limiter()
+        self.rate_limiter = rate_limiter
+        if cache is True:
+            cache = _new_cache()
+        self.cache = cache
+        if identity_map is True:
+            identity_map = IdentityMap()
+        self.identity_map = identity_map
+        self._init_managers(credentials, transport=transport,
+                            retry_policy=retry_policy,
+                            rate_limiter=rate_limiter, cache=cache,
+                            identity_map=identity_map, base_url=base_url,
+                            metrics=metrics, snapshot=snapshot)
 
-class Shopwave(object):
+    async def gather(self, *aws, limit=ASYNC_CONCURRENCY,
+                     return_exceptions=False):
+        """
+        Await *aws* with at most *limit* running at once. See
+        shopwave.utils.aio.gather.
+        """
+        return await aio.gather(*aws, limit=limit,
+                                return_exceptions=return_exceptions)
 
-    def __init__(self, credentials):
-        self.OBJECT_LIST = OBJECT_LIST
-        for name in self.OBJECT_LIST:
-            ManagerClass = manager.get_manager_class(name)
-            setattr(self, name.lower(), ManagerClass(name, credentials))
+    def stats(self):
+        return self.transport.stats.as_dict()
 
+    async def close(self):
+        await self.transport.close()
 
+    async def __aenter__(self):
+        return self
 
-class BasketTransaction(object):
-    pass
+    async def __aexit__(self, *args):
+        await self.close()
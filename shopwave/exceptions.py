@@ -1,6 +1,6 @@
 #! -*- coding: utf-8 -*-
 
-import json
+from shopwave import codec
 
 
 class ShopwaveException(Exception):
@@ -8,7 +8,7 @@ class ShopwaveException(Exception):
         self.response = response
         if not msg:
             if response.headers['content-type'].startswith('application/json'):
-                data = response.json()
+                data = codec.loads(response.content)
                 try:
                     errs = data['api']['message']['errors']
                     msg = ''
@@ -57,3 +57,23 @@ class ShopwaveInternalError(ShopwaveException):
 class ShopwaveExceptionUnknown(ShopwaveException):
     def __init__(self, response):
         super(ShopwaveExceptionUnknown, self).__init__(response)
+
+class ShopwaveWindowsFailed(Exception):
+    """
+    Raised by Report_BasketManager.all_windowed if windows still failed
+    after the retries of the client's retry_policy. The other windows are
+    not lost.
+
+    Attributes
+    ----------
+    result : dict
+        bId -> basket of the windows that were fetched.
+    failed : list
+        (from_date, to_date, exception) of every failed window.
+    """
+    def __init__(self, result, failed):
+        self.result = result
+        self.failed = failed
+        super(ShopwaveWindowsFailed, self).__init__(
+            "{0} window(s) failed, the first from {1} to {2}: {3!r}".format(
+                len(failed), failed[0][0], failed[0][1], failed[0][2]))
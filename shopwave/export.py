@@ -0,0 +1,238 @@
+#! -*- coding: utf-8 -*-
+"""
+Streaming export of API data to CSV, Arrow IPC or Parquet files.
+
+Data is written one chunk (e.g. one report window) at a time, as the column
+tables of shopwave.columnar: every model becomes its own file, with
+Reference fields flattened into related tables, e.g. for report baskets
+
+    baskets.<ext>       one row per basket
+    baskets.p.<ext>     product lines, parent_id is the bId of the basket
+    baskets.tr.<ext>    transactions, parent_id is the bId of the basket
+
+Column headers are the alt_name of the fields where they have one (e.g.
+'Store ID', 'Quantity'), otherwise their attribute name. Only one chunk is
+held in memory at a time. CSV needs numpy, Arrow and Parquet also pyarrow.
+
+>>> sw.report_basket.export('2017-01-01', '2017-02-01', 'out/', format='parquet')
+"""
+
+import csv
+import os
+
+from shopwave.settings import EXPORT_PARQUET_COMPRESSION
+from shopwave import columnar
+
+FORMATS = ('csv', 'arrow', 'parquet')
+
+
+def _headers(table):
+    """ Column name -> header of table. """
+    fields = {f.attrname: f for f in table.model._meta.get_fields()}
+    headers = {}
+    for column in table.columns:
+        field = fields.get(column)
+        headers[column] = (field.alt_name or column) if field else column
+    return headers
+
+
+def _columns(table):
+    # Row numbers refer to a single chunk, parent_id relates the tables.
+    return [c for c in table.columns if c != 'parent_row']
+
+
+class TableWriter(object):
+    """
+    Writes ColumnStores chunk by chunk, one file per table in *directory*.
+    Subclasses implement _open, _write and _close for a file format.
+
+    Attributes
+    ----------
+    paths : dict
+        Table name -> path of the files written.
+    rows : dict
+        Table name -> number of rows written.
+    """
+    extension = None
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.paths = {}
+        self.rows = {}
+        self._files = {}
+
+    def write(self, store):
+        """
+        Append the tables of store (a shopwave.columnar.ColumnStore). A file
+        is created by the first chunk with rows for its table.
+        """
+        for name, table in store.items():
+            if not len(table):
+                continue
+            if name not in self._files:
+                path = os.path.join(self.directory,
+                                    '%s.%s' % (name, self.extension))
+                self._files[name] = self._open(path, table)
+                self.paths[name] = path
+                self.rows[name] = 0
+            self._write(self._files[name], table)
+            self.rows[name] += len(table)
+
+    def write_data(self, json_data):
+        """ Append response data (as returned with return_format='json'). """
+        self.write(columnar.build_column_store(json_data))
+
+    def close(self):
+        for handle in self._files.values():
+            self._close(handle)
+        self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _open(self, path, table):
+        raise NotImplementedError
+
+    def _write(self, handle, table):
+        raise NotImplementedError
+
+    def _close(self, handle):
+        raise NotImplementedError
+
+
+class CSVWriter(TableWriter):
+    """
+    CSV with a header row. Missing values are empty, datetimes in ISO 8601.
+    """
+    extension = 'csv'
+
+    def _open(self, path, table):
+        f = open(path, 'w', newline='', encoding='utf-8')
+        columns = _columns(table)
+        headers = _headers(table)
+        writer = csv.writer(f)
+        writer.writerow([headers[c] for c in columns])
+        return f, writer, columns
+
+    def _write(self, handle, table):
+        f, writer, columns = handle
+        writer.writerows(zip(*[_csv_values(table[c]) for c in columns]))
+
+    def _close(self, handle):
+        handle[0].close()
+
+
+def _csv_values(array):
+    np = columnar.np
+    if array.dtype.kind == 'M':
+        values = np.datetime_as_string(array, unit='s').tolist()
+        return ['' if v == 'NaT' else v for v in values]
+    if array.dtype.kind == 'f':
+        return ['' if v != v else v for v in array.tolist()]
+    # Masked values of int columns become None.
+    return ['' if v is None else v for v in array.tolist()]
+
+
+class ArrowWriter(TableWriter):
+    """
+    Arrow IPC files, one record batch per chunk. Requires pyarrow.
+    """
+    extension = 'arrow'
+
+    def __init__(self, directory):
+        import pyarrow
+        self.pa = pyarrow
+        super(ArrowWriter, self).__init__(directory)
+
+    def _open(self, path, table):
+        schema = _schema(self.pa, table)
+        return self.pa.ipc.new_file(path, schema), schema
+
+    def _write(self, handle, table):
+        writer, schema = handle
+        writer.write_table(_arrow_table(self.pa, table, schema))
+
+    def _close(self, handle):
+        handle[0].close()
+
+
+class ParquetWriter(TableWriter):
+    """
+    Parquet files, one row group per chunk. Requires pyarrow.
+    """
+    extension = 'parquet'
+
+    def __init__(self, directory, compression=EXPORT_PARQUET_COMPRESSION):
+        import pyarrow
+        import pyarrow.parquet
+        self.pa = pyarrow
+        self.compression = compression
+        super(ParquetWriter, self).__init__(directory)
+
+    def _open(self, path, table):
+        schema = _schema(self.pa, table)
+        writer = self.pa.parquet.ParquetWriter(path, schema,
+                                               compression=self.compression)
+        return writer, schema
+
+    def _write(self, handle, table):
+        writer, schema = handle
+        writer.write_table(_arrow_table(self.pa, table, schema))
+
+    def _close(self, handle):
+        handle[0].close()
+
+
+def _schema(pa, table):
+    """
+    Arrow schema of table, from the column dtypes. Types are fixed by the
+    fields, so every chunk of a table has the same schema.
+    """
+    headers = _headers(table)
+    fields = []
+    for column in _columns(table):
+        kind = table[column].dtype.kind
+        if kind == 'i':     arrow_type = pa.int64()
+        elif kind == 'f':   arrow_type = pa.float64()
+        elif kind == 'M':   arrow_type = pa.timestamp('s')
+        else:               arrow_type = pa.string()
+        fields.append(pa.field(headers[column], arrow_type))
+    return pa.schema(fields)
+
+
+def _arrow_table(pa, table, schema):
+    np = columnar.np
+    arrays = []
+    for column, field in zip(_columns(table), schema):
+        array = table[column]
+        if isinstance(array, np.ma.MaskedArray):
+            arrays.append(pa.array(array.data, type=field.type,
+                                   mask=np.ma.getmaskarray(array)))
+        elif array.dtype.kind == 'O':
+            arrays.append(pa.array(array.tolist(), type=field.type))
+        else:
+            # NaN and NaT become nulls.
+            arrays.append(pa.array(array, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def get_writer(format, directory, **kwargs):
+    """
+    Parameters
+    ----------
+    format : {'csv', 'arrow', 'parquet'}
+    directory : string
+        Created if it does not exist.
+    """
+    if format == 'csv':
+        return CSVWriter(directory, **kwargs)
+    elif format == 'arrow':
+        return ArrowWriter(directory, **kwargs)
+    elif format == 'parquet':
+        return ParquetWriter(directory, **kwargs)
+    raise ValueError("Unknown export format %r, use one of %s."
+                     % (format, ', '.join(FORMATS)))
@@ -0,0 +1,385 @@
+#! -*- coding: utf-8 -*-
+"""
+Local stand-in for the Shopwave API, for benchmarks and tests that can not
+(or should not) talk to API_BASE_URL.
+
+Serves the token endpoint, category, product and report/basket with payloads
+shaped like the real responses (see shopwave.models), with configurable
+latency, error rate, throttling, access token lifetime and payload sizes:
+
+>>> from shopwave.fakeserver import FakeShopwave
+>>> with FakeShopwave(latency=0.02, error_rate=0.01) as server:
+...     sw = server.client()
+...     sw.product.all()
+
+or from the command line, printing the base URL once it is listening:
+
+    python -m shopwave.fakeserver --port 8080 --latency 0.02
+
+Besides the API, the server answers GET /_fake/stats (request counts by
+status) and POST /_fake/expire-tokens (invalidates all issued access tokens,
+so the next request of every client gets a 401).
+"""
+
+import argparse
+import gzip
+import hashlib
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from datetime import timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+from shopwave.utils import ShopwaveDatetime
+
+EPOCH = ShopwaveDatetime('2017-01-01 00:00:00')
+
+
+class FakeShopwave(object):
+    """
+    Parameters
+    ----------
+    host : string, optional
+    port : int, optional
+        0 picks a free port.
+    latency : float, optional
+        Seconds every API response is delayed by.
+    jitter : float, optional
+        Up to this many seconds are added to latency, uniformly distributed.
+    error_rate : float, optional
+        Fraction of API requests answered with HTTP 500.
+    throttle : float or None, optional
+        API requests per second served; further requests in the same second
+        get HTTP 429 with a Retry-After header.
+    token_ttl : int, optional
+        Lifetime of issued access tokens in seconds. Requests with an
+        unknown or expired token get HTTP 401.
+    n_products, n_categories : int, optional
+        Size of the catalogue.
+    baskets_per_hour : int, optional
+        Baskets in report/basket responses, per hour of the requested range.
+    lines_per_basket : int, optional
+        Product lines per basket.
+    gzip : bool, optional
+        Compress responses for clients accepting gzip.
+    seed : int, optional
+        Seed for the catalogue and the injected errors.
+    """
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+                 error_rate=0.0, throttle=None, token_ttl=3600,
+                 n_products=500, n_categories=20, baskets_per_hour=60,
+                 lines_per_basket=3, gzip=False, seed=0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle = throttle
+        self.token_ttl = token_ttl
+        self.n_products = n_products
+        self.n_categories = n_categories
+        self.baskets_per_hour = baskets_per_hour
+        self.lines_per_basket = lines_per_basket
+        self.gzip = gzip
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = {}
+        self._token_ids = itertools.count(1)
+        self._second = None
+        self._served = 0
+        self.stats = {}
+        self._server = None
+        self.categories, self.products = self._catalogue()
+
+    # Payloads
+
+    def _catalogue(self):
+        categories = {}
+        for c in range(1, self.n_categories + 1):
+            categories[c] = {
+                'id': c, 'n': 'Category %d' % c, 'parentId': 0, 'type': 1,
+                'activeDate': '2017-01-01T00:00:00.000Z', 'p': {},
+            }
+        products = {}
+        for i in range(1, self.n_products + 1):
+            cats = sorted({1 + i % self.n_categories,
+                           1 + (i * 7) % self.n_categories})
+            products[i] = {
+                'id': i, 'n': 'Product %d' % i,
+                'categories': {str(c): 'Category %d' % c for c in cats},
+                'activeDate': '2017-01-09T16:49:58.000Z',
+                'bC': 5000000000000 + i,
+                'details': 'Details of product %d' % i,
+                'price': '%.2f' % (0.5 + (i % 40) * 0.25),
+                'productInstanceId': 100000 + i,
+                'productInstanceTimestamp': '2017-01-09T16:49:58.000Z',
+                'productTimestamp': '2017-01-09T16:49:58.000Z',
+                'size': 1, 'unit': 'each', 'vatPercentage': 20,
+            }
+            for c in cats:
+                categories[c]['p'][str(i)] = {
+                    'id': i, 'n': products[i]['n'],
+                    'price': products[i]['price']}
+        return categories, products
+
+    def _basket(self, bId, completed):
+        lines = {}
+        for j in range(self.lines_per_basket):
+            product = self.products[1 + (bId * 7 + j * 13) % self.n_products]
+            pIId = bId * self.lines_per_basket + j
+            lines[str(pIId)] = {
+                'id': product['id'], 'n': product['n'],
+                'price': product['price'],
+                'activeDate': product['activeDate'], 'bPIId': pIId,
+                'q': 1 + (bId + j) % 3, 'pIP': product['price'],
+                'pMP': product['price'], 'vP': '20',
+                'productInstanceId': product['productInstanceId'],
+            }
+        total = sum(float(l['price']) * l['q'] for l in lines.values())
+        return {
+            'bId': bId, 'bN': 'Basket %d' % bId, 'c': completed.to_str(),
+            'cId': 7, 'cd': 0, 'ch': 0, 'sId': 1 + bId % 4,
+            't': '%.2f' % total, 'p': lines,
+            'tr': {str(bId): {'tId': bId, 'tA': int(total * 100),
+                              'tT': int(total * 100 / 6), 'tTy': 'Card',
+                              'bId': bId}},
+        }
+
+    def baskets(self, from_date, to_date):
+        """ report/basket payload for baskets completed in [from, to).
+        """
+        per_hour = self.baskets_per_hour
+        start = int((from_date - EPOCH).total_seconds() * per_hour // 3600)
+        end = int(-(-(to_date - EPOCH).total_seconds() * per_hour // 3600))
+        result = {}
+        for bId in range(max(start, 0), end):
+            completed = EPOCH + timedelta(seconds=bId * 3600 // per_hour)
+            if from_date <= completed < to_date:
+                result[str(bId)] = self._basket(bId, completed)
+        return {'baskets': result}
+
+    def _select(self, items, key, ids):
+        if ids:
+            wanted = [int(i) for i in ids.split(',') if i.strip().isdigit()]
+            items = {i: items[i] for i in wanted if i in items}
+        return {key: {str(i): item for i, item in items.items()}}
+
+    # Request handling
+
+    def _count(self, status):
+        with self._lock:
+            self.stats[status] = self.stats.get(status, 0) + 1
+
+    def issue_token(self):
+        with self._lock:
+            token = 'fake-token-%d' % next(self._token_ids)
+            self._tokens[token] = time.time() + self.token_ttl
+        return {'access_token': token, 'refresh_token': 'fake-refresh-token',
+                'token_type': 'Bearer', 'expires_in': self.token_ttl}
+
+    def expire_tokens(self):
+        with self._lock:
+            self._tokens.clear()
+
+    def _authorized(self, header):
+        token = (header or '').partition(' ')[2]
+        with self._lock:
+            expires = self._tokens.get(token)
+        return expires is not None and expires > time.time()
+
+    def _throttled(self):
+        if self.throttle is None:
+            return False
+        second = int(time.time())
+        with self._lock:
+            if second != self._second:
+                self._second, self._served = second, 0
+            self._served += 1
+            return self._served > self.throttle
+
+    def handle(self, method, path, headers, body):
+        """
+        Returns
+        -------
+        status, payload (JSON serialisable or None), extra headers
+        """
+        if path == '_fake/stats':
+            with self._lock:
+                return 200, {str(k): v for k, v in self.stats.items()}, {}
+        if path == '_fake/expire-tokens' and method == 'POST':
+            self.expire_tokens()
+            return 200, {}, {}
+        if path == 'oauth/token' and method == 'POST':
+            form = parse_qs(body.decode())
+            if not form.get('grant_type'):
+                return 400, {'error': 'invalid_request'}, {}
+            return 200, self.issue_token(), {}
+
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        if path not in ('category', 'product', 'report/basket'):
+            return 404, {'api': {'message': {'error': 'Not found'}}}, {}
+        if not self._authorized(headers.get('Authorization')):
+            return 401, {'api': {'message': {'error': 'Invalid token'}}}, {}
+        if self._throttled():
+            return 429, {'api': {'message': {'error': 'Too many requests'}}},\
+                {'Retry-After': '1'}
+        if self.error_rate and self._random.random() < self.error_rate:
+            return 500, {'api': {'message': {'error': 'Injected error'}}}, {}
+
+        if path == 'category':
+            data = self._select(self.categories, 'categories',
+                                headers.get('categoryIds'))
+        elif path == 'product':
+            data = self._select(self.products, 'products',
+                                headers.get('productIds'))
+        else:
+            try:
+                from_date = ShopwaveDatetime(headers['from'])
+                to_date = ShopwaveDatetime(headers['to'])
+            except (KeyError, ValueError):
+                return 400, {'api': {'message': {'error': 'from/to'}}}, {}
+            data = self.baskets(from_date, to_date)
+        data['api'] = {'message': {}}
+        return 200, data, {}
+
+    # Server
+
+    @property
+    def url(self):
+        """ Base URL of the API, for Shopwave(base_url=...). """
+        return 'http://%s:%d/' % (self.host, self.port)
+
+    @property
+    def token_uri(self):
+        """ For Credentials(token_uri=...). """
+        return self.url + 'oauth/token'
+
+    def _bind(self):
+        self._server = _HTTPServer((self.host, self.port), _Handler, self)
+        self.port = self._server.server_address[1]
+
+    def start(self):
+        """ Serve in a daemon thread. """
+        self._bind()
+        thread = threading.Thread(target=self._server.serve_forever,
+                                  daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def credentials(self):
+        """ Credentials for this server, with tokens kept in memory. """
+        return credentials_for(self.url)
+
+    def client(self, **kwargs):
+        """ Shopwave client for this server. """
+        from shopwave import Shopwave
+        return Shopwave(self.credentials(), base_url=self.url, **kwargs)
+
+
+def credentials_for(url):
+    """
+    Credentials for a fake server at url, e.g. one started with
+    python -m shopwave.fakeserver in another process.
+    """
+    from shopwave import Credentials
+    from shopwave.tokenstore import MemoryTokenStore
+    return Credentials(store=MemoryTokenStore(), token_uri=url + 'oauth/token')
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, handler, fake):
+        self.fake = fake
+        super(_HTTPServer, self).__init__(address, handler)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without TCP_NODELAY the body
+    # waits for the client's delayed ACK.
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self):
+        fake = self.server.fake
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        path = self.path.split('?')[0].strip('/')
+        status, payload, extra = fake.handle(self.command, path, self.headers,
+                                             body)
+        content = json.dumps(payload).encode() if payload is not None else b''
+        headers = dict(extra)
+        if status == 200 and self.command == 'GET':
+            etag = '"%s"' % hashlib.md5(content).hexdigest()
+            headers['ETag'] = etag
+            if self.headers.get('If-None-Match') == etag:
+                status, content = 304, b''
+        if content and fake.gzip and \
+                'gzip' in self.headers.get('Accept-Encoding', ''):
+            content = gzip.compress(content, compresslevel=1)
+            headers['Content-Encoding'] = 'gzip'
+        if not path.startswith('_fake/'):
+            fake._count(status)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = _respond
+    do_POST = _respond
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Local stand-in for the Shopwave API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle', type=float, default=None)
+    parser.add_argument('--token-ttl', type=int, default=3600)
+    parser.add_argument('--n-products', type=int, default=500)
+    parser.add_argument('--n-categories', type=int, default=20)
+    parser.add_argument('--baskets-per-hour', type=int, default=60)
+    parser.add_argument('--lines-per-basket', type=int, default=3)
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    fake = FakeShopwave(**vars(args))
+    fake._bind()
+    print(fake.url)
+    sys.stdout.flush()
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,9 @@
 #! -*- coding: utf-8 -*-
 
 import sys
-import six
-import collections
-from shopwave.utils import ShopwaveDatetime
+import collections.abc
+from shopwave.utils import ShopwaveDatetime, parse_datetime
+from shopwave import identity
 
 # TODO: 
 # - override __getattr__ for BaseField
@@ -37,7 +37,7 @@ class BaseField(object):
         if not u: u = getattr(self, 'attrname', '')
         if not u: u = getattr(self, 'alias', '')
         if hasattr(self, 'model'):
-            m = "%s." % self.get_model().__class__.__name__ 
+            m = "%s." % self.get_model().__name__
         else:
             m = ''
         return str('<%s: %s%s>' % (self.__class__.__name__, m, u))
@@ -56,7 +56,17 @@ class BaseField(object):
             new_val = self.default()
         return new_val
 
+    def get_parser(self):
+        """
+        Callable turning a raw value that is neither None nor default() into
+        the attribute value. Used by the compiled model hydrators, which do
+        the None check themselves.
+        """
+        return self._parse_value
+
     def set_model(self, model):
+        """ Set model class the field is declared on.
+        """
         self.model = model
 
     def get_model(self):
@@ -66,18 +76,38 @@ class IntField(BaseField):
     def _parse_value(self, value):
         return int(value)
 
+    def get_parser(self):
+        return int
+
 class FloatField(BaseField):
     def _parse_value(self, value):
         return float(value)
 
+    def get_parser(self):
+        return float
+
 class CharField(BaseField):
+    # Set on the fields of compact models, so repeated values (product names,
+    # VAT codes, ...) share one string object.
+    intern = False
+
     def _parse_value(self, value):
+        if self.intern:
+            return sys.intern(str(value))
         return str(value)
 
+    def get_parser(self):
+        if self.intern:
+            return lambda value: sys.intern(str(value))
+        return str
+
 class DateTimeField(BaseField):
     def _parse_value(self, value):
         return ShopwaveDatetime(value)
 
+    def get_parser(self):
+        return parse_datetime
+
 class Reference(BaseField):
     def __init__(self, *args, **kwargs):
         """
@@ -91,6 +121,10 @@ class Reference(BaseField):
         """
         self._RefModel = kwargs.pop('references')
         self.ref_attrname = kwargs.pop('attrname', None)
+        # Set on the fields of compact and lazy models, see ModelBase.compact
+        # and ModelBase.lazy.
+        self.compact = False
+        self.lazy = False
         super().__init__(*args, **kwargs)
 
     def default(self):
@@ -98,10 +132,17 @@ class Reference(BaseField):
 
     def get_ref_model(self):
         RefModel = self._RefModel
-        models = sys.modules[self.get_model().__module__]
-        if isinstance(RefModel, six.string_types):
-            RefModelName = RefModel
-            RefModel = getattr(models, RefModelName)
+        if isinstance(RefModel, str):
+            models = sys.modules[self.get_model().__module__]
+            RefModel = getattr(models, RefModel)
+            # Resolve the model name only once.
+            self._RefModel = RefModel
+        if self.compact:
+            RefModel = RefModel.compact()
+            self._RefModel = RefModel
+        elif self.lazy:
+            RefModel = RefModel.lazy()
+            self._RefModel = RefModel
         return RefModel
 
     def _parse_value(self, data):
@@ -112,34 +153,144 @@ class Reference(BaseField):
             2. dict of id as key and value some other dict of key:value pairs for
                 that model instance.
             3. list of ids, e.g. ['123124', '214221', '241233']
+
+        Instances are resolved through the active identity map, if any (see
+        shopwave.identity). For models with LINE_FIELDS, such as the product
+        lines of baskets, the map holds the object under its own id (the id
+        inside the data). If the map has line_items set, every occurrence
+        with line fields is a line item around it (see
+        ModelBase.line_item), otherwise it is built on its own.
         """
         result = list()
         RefModel = self.get_ref_model()
+        identity_map = identity.current()
         if self.ref_attrname:
             # Datatype 1.) dict of id as key -> other attr. value as value.
-            for idNr in data:
-                model = RefModel
-                model.id = idNr
-                setattr(model, self.ref_attrname, data[idNr])
-                result.append(model)
-
-        elif isinstance(data, collections.Mapping):
+            build = self._build_from_attr
+            items = data.items()
+        elif isinstance(data, collections.abc.Mapping):
             # Datatype 2.) dict of id as key -> dict of attr.key->attr.val.
-            for idNr in data:
-                model = RefModel(data=data[idNr])
-                model.id = idNr
-                result.append(model)
+            build = self._build_from_data
+            items = data.items()
         else:
             # Datatype 3.) list of ids.
-            for idNr in data:
-                model = RefModel(id=idNr)
+            build = self._build_from_id
+            items = [(idNr, None) for idNr in data]
 
+        if build == self._build_from_data and identity_map is not None and \
+                RefModel.LINE_FIELDS and not self.lazy:
+            if identity_map.line_items:
+                return [self._resolve_line(RefModel, identity_map, idNr,
+                                           value) for idNr, value in items]
+            # Lines have ids of their own, there is nothing to share: only
+            # occurrences without line fields (e.g. the products of a
+            # category) are resolved.
+            line_fields = RefModel.LINE_FIELDS
+            for idNr, value in items:
+                if line_fields.isdisjoint(value):
+                    model = identity_map.resolve(
+                        RefModel, idNr, value,
+                        lambda: build(RefModel, idNr, value))
+                else:
+                    model = build(RefModel, idNr, value)
+                result.append(model)
+            return result
+
+        for idNr, value in items:
+            if identity_map is None:
+                model = build(RefModel, idNr, value)
+            else:
+                model = identity_map.resolve(
+                    RefModel, idNr, value,
+                    lambda: build(RefModel, idNr, value))
+            result.append(model)
         return result
 
+    def _build_from_attr(self, RefModel, idNr, value):
+        return RefModel(**{self.ref_attrname: value, 'id': idNr})
+
+    @staticmethod
+    def _build_from_data(RefModel, idNr, value):
+        # The id key of data takes precedence over ids inside value.
+        data = dict(value)
+        data.pop('id', None)
+        data['id'] = idNr
+        return RefModel(data=data)
 
+    def _resolve_line(self, RefModel, identity_map, idNr, value):
+        item_id = value.get('id')
+        if item_id is None:
+            return identity_map.resolve(
+                RefModel, idNr, value,
+                lambda: self._build_from_data(RefModel, idNr, value))
+        line_keys = RefModel.LINE_FIELDS.intersection(value)
+        if not line_keys and str(item_id) == str(idNr):
+            # E.g. the products of a category, no line item needed.
+            return identity_map.resolve(RefModel, item_id, value,
+                                        lambda: RefModel(data=value))
+        core = dict(value)
+        line = {key: core.pop(key) for key in line_keys}
+        line['id'] = idNr
+        item = identity_map.resolve(RefModel, item_id, core,
+                                    lambda: RefModel(data=core))
+        # As LineModel(data=line), without the keyword handling of
+        # Model.__init__.
+        LineModel = RefModel.line_item()
+        model = LineModel.__new__(LineModel)
+        LineModel._meta.hydrate(model, line)
+        # Not a field, so not through Model.__setattr__.
+        object.__setattr__(model, 'item', item)
+        return model
 
+    @staticmethod
+    def _build_from_id(RefModel, idNr, value):
+        return RefModel(id=idNr)
 
-        
 
+class LazyAttribute(object):
+    """
+    Non-data descriptor standing in for a field on lazy models (see
+    ModelBase.lazy). On first access the raw value is looked up in the
+    instance's _raw dict by attribute name and aliases, parsed, and stored in
+    the instance __dict__, which takes precedence on later accesses. Unset
+    blank fields raise AttributeError, as on regular models.
+    """
+    def __init__(self, field):
+        self.field = field
+        self.attrname = field.attrname
+        keys = [field.attrname]
+        keys.extend(a for a in field.alias if a != field.attrname)
+        if field._primary_key:
+            # Reference sets the id key, which takes precedence.
+            keys.remove('id')
+            keys.insert(0, 'id')
+        self.keys = tuple(keys)
+        self.is_reference = isinstance(field, Reference)
+        self.parse = field.get_parser()
 
-        
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        values = instance.__dict__
+        raw = values['_raw']
+        for key in self.keys:
+            value = raw.get(key)
+            if value is not None:
+                break
+        if value is None:
+            if self.field.blank:
+                raise AttributeError("'%s' object has no attribute '%s'"
+                                     % (owner.__name__, self.attrname))
+            value = self.field.default()
+        else:
+            try:
+                if self.is_reference:
+                    with identity.use(values.get('_identity_map')):
+                        value = self.parse(value)
+                else:
+                    value = self.parse(value)
+            except ValueError as e:
+                raise ValueError('Error in parsing value for %r. %s'
+                                 % (self.field, e))
+        values[self.attrname] = value
+        return value
@@ -0,0 +1,120 @@
+#! -*- coding: utf-8 -*-
+"""
+Identity map for objects referenced from other objects.
+
+While an IdentityMap is active (see use), Reference fields resolve an id
+they have already seen with the same raw data to the instance built the
+first time, so e.g. a Category listed under thousands of products is built
+and held once. Other occurrences with different data are separate
+instances. Product lines of baskets are the exception: with line_items
+set, the Product is resolved by its own id without the line fields
+(quantity, prices, see Model.LINE_FIELDS), and every line is a small line
+item around the shared Product (see ModelBase.line_item). Splitting the
+lines costs about as much time as building every line on its own, so the
+per-response maps of the managers leave it off and lines are not mapped.
+
+Instances are shared: changing an attribute of one changes it wherever the
+object is referenced.
+
+A map shared by all responses of a client (Shopwave(identity_map=True))
+keeps at most IDENTITY_MAP_MAX_OBJECTS objects, dropping the least recently
+used ones first.
+"""
+
+import collections
+import contextlib
+import contextvars
+import threading
+
+from shopwave.settings import IDENTITY_MAP_VARIANTS, IDENTITY_MAP_MAX_OBJECTS
+
+_current = contextvars.ContextVar('shopwave_identity_map', default=None)
+
+
+class IdentityMap(object):
+    """
+    Parameters
+    ----------
+    max_variants : int, optional
+        Number of instances with differing data kept per (model class, id).
+        Further variants are built but not remembered.
+    max_objects : int or None, optional
+        Number of (model class, id) kept; the least recently used are
+        forgotten first. None for no bound.
+    line_items : bool, optional
+        Share the objects of lines, such as the Product of basket lines,
+        through line items. If False, every line is built on its own.
+    """
+    def __init__(self, max_variants=IDENTITY_MAP_VARIANTS,
+                 max_objects=IDENTITY_MAP_MAX_OBJECTS, line_items=True):
+        self.max_variants = max_variants
+        self.max_objects = max_objects
+        self.line_items = line_items
+        self._instances = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, cls, idNr, data, build):
+        """
+        Parameters
+        ----------
+        cls : class derived from shopwave.models.Model
+        idNr : id of the referenced object
+        data : raw data the instance is built from, compared for equality
+        build : callable
+            Builds the instance if none with equal data is known.
+        """
+        key = (cls, str(idNr))
+        with self._lock:
+            variants = self._instances.get(key)
+            if variants is not None:
+                if self.max_objects is not None:
+                    self._instances.move_to_end(key)
+                for known_data, instance in variants:
+                    if known_data == data:
+                        self.hits += 1
+                        return instance
+        # Built outside the lock, building resolves nested references.
+        instance = build()
+        with self._lock:
+            self.misses += 1
+            variants = self._instances.get(key)
+            if variants is None:
+                self._instances[key] = [(data, instance)]
+                if self.max_objects is not None and \
+                        len(self._instances) > self.max_objects:
+                    self._instances.popitem(last=False)
+            elif len(variants) < self.max_variants:
+                variants.append((data, instance))
+        return instance
+
+    def clear(self):
+        with self._lock:
+            self._instances.clear()
+
+    def __len__(self):
+        return len(self._instances)
+
+    def __repr__(self):
+        return str('<IdentityMap: %d objects, %d hits, %d misses>'
+                   % (len(self), self.hits, self.misses))
+
+
+def current():
+    """ The active IdentityMap, or None.
+    """
+    return _current.get()
+
+
+@contextlib.contextmanager
+def use(identity_map):
+    """
+    Make identity_map the active IdentityMap of the current thread (or
+    asyncio task) inside a with block. None disables identity mapping.
+    """
+    token = _current.set(identity_map)
+    try:
+        yield identity_map
+    finally:
+        _current.reset(token)
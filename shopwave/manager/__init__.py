@@ -7,6 +7,9 @@ from shopwave.manager.base import (
 from shopwave.manager import base as base_manager
 
 
+_async_manager_classes = {}
+
+
 def get_manager_class(name):
     if hasattr(base_manager, "{0}Manager".format(name)):
         ManagerClass = getattr(base_manager, "{0}Manager".format(name))
@@ -14,3 +17,17 @@ def get_manager_class(name):
         ManagerClass = GenericManager
     return ManagerClass
 
+
+
+def get_async_manager_class(name):
+    # Imported here to keep asyncio out of synchronous clients' startup.
+    from shopwave.manager.aio import (AsyncManagerMixin, SYNC_ONLY_METHODS,
+                                      sync_only)
+    ManagerClass = get_manager_class(name)
+    if ManagerClass not in _async_manager_classes:
+        attrs = {method: sync_only(method) for method in SYNC_ONLY_METHODS
+                 if hasattr(ManagerClass, method)}
+        _async_manager_classes[ManagerClass] = type(
+            'Async%s' % ManagerClass.__name__,
+            (AsyncManagerMixin, ManagerClass), attrs)
+    return _async_manager_classes[ManagerClass]
@@ -0,0 +1,129 @@
+#! -*- coding: utf-8 -*-
+
+import asyncio
+
+from shopwave.settings import (API_BASE_URL, GET_MANY_BATCH_SIZE,
+                               GET_MANY_WORKERS)
+
+from shopwave.transport import AsyncTransport
+from shopwave.utils import aio
+from shopwave.retry import RetryState, retry_exceptions, REFRESH
+
+
+# Methods of the synchronous managers without an asyncio version.
+SYNC_ONLY_METHODS = ('iter', 'all_windowed', 'sync', 'sync_to', 'export')
+
+
+def sync_only(name):
+    """ Stand-in for method name on async managers, raising TypeError. """
+    def method(self, *args, **kwargs):
+        raise TypeError('%s is not supported on AsyncShopwave, use a '
+                        'Shopwave client.' % name)
+    method.__name__ = name
+    return method
+
+
+class AsyncManagerMixin(object):
+    """
+    Turns the DECORATED_METHODS of a manager into coroutine functions. Request
+    building (_all, _get, ...), response parsing and exception mapping are
+    inherited unchanged from the synchronous manager class. The
+    SYNC_ONLY_METHODS raise TypeError, see get_async_manager_class.
+    """
+    def __init__(self, name, credentials, transport=None, retry_policy=None,
+                 rate_limiter=None, cache=None, identity_map=None,
+                 base_url=API_BASE_URL, metrics=None, snapshot=None):
+        if transport is None:
+            transport = AsyncTransport()
+        super(AsyncManagerMixin, self).__init__(name, credentials,
+                                                transport=transport,
+                                                retry_policy=retry_policy,
+                                                rate_limiter=rate_limiter,
+                                                cache=cache,
+                                                identity_map=identity_map,
+                                                base_url=base_url,
+                                                metrics=metrics,
+                                                snapshot=snapshot)
+
+    def _get_data(self, func):
+        async def wrapper(*args, **kwargs):
+            if self._local_source(kwargs):
+                return self._local_data(func, *args, **kwargs)
+            await self._resolve_token()
+            request, options = self._build_request(func, *args, **kwargs)
+            key, cached = self._cache_lookup(request)
+            if cached is not None and cached.fresh:
+                return self._handle_response(cached, **options)
+            response = await self._send(request)
+            fetched = response.status_code == 200
+            response = self._cache_store(request, key, cached, response)
+            return self._handle_response(response, fetched=fetched,
+                                         **options)
+
+        return wrapper
+
+    async def _resolve_token(self):
+        """
+        Request a missing or expiring access token in an executor, so that
+        _build_request reads it from memory. Credentials block on the token
+        store and the token endpoint.
+        """
+        credentials = self.credentials
+        if not credentials._token_is_fresh():
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, credentials.get_access_token)
+
+    async def get_many(self, ids, batch_size=GET_MANY_BATCH_SIZE,
+                       workers=GET_MANY_WORKERS, return_format=None,
+                       compact=False, lazy=False, **kwargs):
+        """ asyncio version of GenericManager.get_many.
+        """
+        ids, chunks = self._prepare_many(ids, batch_size, return_format)
+        results = await aio.gather(
+            *[self.get(chunk, return_format='json', **kwargs)
+              for chunk in chunks], limit=workers)
+        return self._merge_many(ids, results, return_format, compact, lazy)
+
+    async def _send(self, request):
+        """ asyncio version of GenericManager._send.
+        """
+        state = RetryState(self.retry_policy)
+        timeout = request['timeout']
+        limiter = self.rate_limiter
+        metrics = self.metrics
+        loop = asyncio.get_running_loop()
+        while True:
+            if limiter is not None:
+                started = await limiter.acquire_async(self.name)
+            request['timeout'] = state.timeout(timeout)
+            status = None
+            try:
+                response = await self.transport.request(**request)
+                status = response.status_code
+            except retry_exceptions() as e:
+                delay = state.after_error(e)
+                if delay is None:
+                    raise
+                if metrics is not None:
+                    metrics.increment('retries', self.name,
+                                      reason=type(e).__name__)
+                await asyncio.sleep(delay)
+                continue
+            finally:
+                if limiter is not None:
+                    limiter.release(self.name, started, status)
+
+            if metrics is not None:
+                metrics.record_response(self.name, response)
+            action = state.after_response(response)
+            if action is None:
+                return response
+            if metrics is not None:
+                metrics.increment('retries', self.name, reason='unauthorized'
+                                  if action == REFRESH else status)
+            if action == REFRESH:
+                # Credentials block on the token endpoint and Redis.
+                await loop.run_in_executor(None, self._refresh_authorization,
+                                           request)
+            else:
+                await asyncio.sleep(action)
@@ -1,16 +1,95 @@
 #! -*- coding: utf-8 -*-
 
-import requests
-import json
-from settings import __dict__ as settings
-from settings import OBJECT_LIST, API_BASE_URL, X_ACCEPT_VERSION, USER_AGENT
+import collections
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
-from shopwave.utils import ShopwaveDatetime, ONE_DAY
+from shopwave.settings import (OBJECT_LIST, API_BASE_URL, X_ACCEPT_VERSION,
+                               USER_AGENT)
+from shopwave.settings import (REPORT_WINDOW_WORKERS, REPORT_SYNC_OVERLAP,
+                               REPORT_SYNC_UNDATED_MAX,
+                               STREAM_CHUNK_SIZE, GET_MANY_BATCH_SIZE,
+                               GET_MANY_MAX_HEADER_LENGTH, GET_MANY_WORKERS)
+
+from shopwave.utils import (ShopwaveDatetime, ONE_DAY, ONE_HOUR,
+                            date_windows)
+from shopwave.utils.jsonstream import iter_objects
+from shopwave import codec
 from shopwave import models
-from shopwave.models import MODEL_LIST
+from shopwave import checkpoint
+from shopwave import identity
+from shopwave.transport import Transport
+from shopwave.retry import (RetryPolicy, RetryState, retry_exceptions,
+                            REFRESH)
 from shopwave.exceptions import (
     ShopwaveBadRequest, ShopwaveUnauthorized, ShopwaveForbidden,
-    ShopwaveNotFound, ShopwaveExceptionUnknown)
+    ShopwaveNotFound, ShopwaveInternalError, ShopwaveExceptionUnknown,
+    ShopwaveWindowsFailed)
+
+
+class IdMapping(dict):
+    """
+    Result of get_many: requested id -> model instance (or dict), in the order
+    the ids were requested.
+
+    Attributes
+    ----------
+    missing : list
+        Requested ids not returned by the API.
+    """
+    def __init__(self, *args, **kwargs):
+        super(IdMapping, self).__init__(*args, **kwargs)
+        self.missing = []
+
+    def __repr__(self):
+        return str('<IdMapping: %d found, %d missing>'
+                   % (len(self), len(self.missing)))
+
+
+def chunk_ids(ids, batch_size=GET_MANY_BATCH_SIZE,
+              max_length=GET_MANY_MAX_HEADER_LENGTH):
+    """
+    Split ids into comma separated strings of at most batch_size ids and
+    max_length characters each.
+
+    Parameters
+    ----------
+    ids : iterable of ids (str or int), without duplicates
+    """
+    chunk = []
+    length = -1
+    for idNr in ids:
+        idNr = str(idNr)
+        if chunk and (len(chunk) == batch_size or
+                      length + 1 + len(idNr) > max_length):
+            yield ','.join(chunk)
+            chunk = []
+            length = -1
+        chunk.append(idNr)
+        length += 1 + len(idNr)
+    if chunk:
+        yield ','.join(chunk)
+
+
+def _release_on_close(response, limiter, name, started):
+    """
+    Release the rate_limiter slot of a streamed response once it is closed,
+    i.e. after its body was read (or abandoned), not when the headers
+    arrived.
+    """
+    close = response.close
+    released = []
+
+    def release_and_close():
+        try:
+            close()
+        finally:
+            if not released:
+                released.append(True)
+                limiter.release(name, started, response.status_code)
+
+    response.close = release_and_close
 
 
 class GenericManager(object):
@@ -19,12 +98,54 @@ class GenericManager(object):
         'get'
     )
 
-    def __init__(self, name, credentials):
+    def __init__(self, name, credentials, transport=None, retry_policy=None,
+                 rate_limiter=None, cache=None, identity_map=None,
+                 base_url=API_BASE_URL, metrics=None, snapshot=None):
+        """
+        Parameters
+        ----------
+        name : string
+            Object name as listed in OBJECT_LIST.
+        credentials : shopwave.Credentials
+        transport : shopwave.transport.Transport, optional
+            Pooled HTTP transport, usually shared by all managers of a
+            Shopwave instance. A private one is created if not provided.
+        retry_policy : shopwave.retry.RetryPolicy, optional
+            Retries for server and connection errors. Defaults to the RETRY_*
+            settings.
+        rate_limiter : shopwave.ratelimit.RateLimiter, optional
+            Limits the request rate and concurrency of this endpoint. No
+            limits apply if not provided.
+        cache : shopwave.cache.ResponseCache, optional
+            Cache for GET responses. Nothing is cached if not provided.
+        identity_map : shopwave.identity.IdentityMap or False, optional
+            Identity map shared by all responses. By default every response
+            gets its own, without line items; False disables identity
+            mapping.
+        base_url : string, optional
+            API root, e.g. of shopwave.fakeserver for benchmarks.
+        metrics : shopwave.metrics.Metrics, optional
+            Receives timings, sizes, retries and cache results of every
+            call. Nothing is measured if not provided.
+        snapshot : shopwave.snapshot.SnapshotStore, optional
+            Local store read by calls with source='local'. Objects received
+            from the API are written through to it.
+        """
         self.credentials = credentials
         self.name = name
-        self.base_url = API_BASE_URL 
-        self.headers = {
-            'Authorization': 'Bearer {token}'.format(token=credentials.access_token),
+        if transport is None:
+            transport = Transport()
+        self.transport = transport
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.identity_map = identity_map
+        self.base_url = base_url
+        self.metrics = metrics
+        self.snapshot = snapshot
+        self._static_headers = {
             'x-accept-version': X_ACCEPT_VERSION,
             'accept': 'application/json'
         }
@@ -33,6 +154,16 @@ class GenericManager(object):
             method = getattr(self, '_%s' % method_name)
             setattr(self, method_name, self._get_data(method))
 
+    @property
+    def headers(self):
+        """
+        Request headers, with the current access token of the credentials.
+        """
+        headers = dict(self._static_headers)
+        headers['Authorization'] = 'Bearer {token}'.format(
+            token=self.credentials.get_access_token())
+        return headers
+
     def _post_data(self):
         raise NotImplementedError
         if method.upper() == 'POST':
@@ -44,105 +175,539 @@ class GenericManager(object):
         uri, params, method, body, headers.
         """
         def wrapper(*args, **kwargs):
-            timeout = kwargs.pop('timeout', None)
-            return_format = kwargs.pop('return_format', None)
-            uri, params, method, body, headers = func(*args, **kwargs)
-            if headers is None:     headers = {}
-            headers.update(self.headers)
+            if self._local_source(kwargs):
+                return self._local_data(func, *args, **kwargs)
+            request, options = self._build_request(func, *args, **kwargs)
+            key, cached = self._cache_lookup(request)
+            if cached is not None and cached.fresh:
+                return self._handle_response(cached, **options)
+            response = self._send(request)
+            fetched = response.status_code == 200
+            response = self._cache_store(request, key, cached, response)
+            return self._handle_response(response, fetched=fetched,
+                                         **options)
+
+        return wrapper
+
+    @staticmethod
+    def _local_source(kwargs):
+        """ Pop the source argument of a decorated method, True if 'local'.
+        """
+        source = kwargs.pop('source', 'api')
+        if source not in ('api', 'local'):
+            raise ValueError("source must be 'api' or 'local', not %r."
+                             % (source,))
+        return source == 'local'
+
+    def _local_data(self, func, *args, **kwargs):
+        """
+        Answer a call of one of the DECORATED_METHODS from the snapshot, by
+        the matching _local_<method> (e.g. _local_all for _all).
+        """
+        data, options = self._load_local(func, *args, **kwargs)
+        return self._parse_data(data, **options)
+
+    def _load_local(self, func, *args, **kwargs):
+        """
+        Returns
+        -------
+        response data of the snapshot for func, parsing options.
+        """
+        if self.snapshot is None:
+            raise ValueError("source='local' requires a snapshot, e.g. "
+                             "Shopwave(credentials, snapshot=SnapshotStore()).")
+        kwargs.pop('timeout', None)
+        options = self._pop_options(kwargs)
+        return getattr(self, '_local' + func.__name__)(*args, **kwargs), \
+            options
+
+    def _local_all(self, **kwargs):
+        return self.snapshot.load(self.name)
+
+    def _local_get(self, ids, **kwargs):
+        return self.snapshot.load(self.name, str(ids).split(','))
+
+    def _fetch_data(self, func, *args, **kwargs):
+        """
+        Response data of one of the DECORATED_METHODS, always requested from
+        the API and neither cached nor written to the snapshot.
+        """
+        request, options = self._build_request(func, *args, **kwargs)
+        response = self._send(request)
+        if response.status_code != 200:
+            self._raise_for_status(response)
+        data = codec.loads(response.content)
+        data.pop('api', None)
+        return data
+
+    def _snapshot_store(self, store):
+        if store is None:
+            store = self.snapshot
+        if store is None:
+            raise ValueError('No snapshot store given, and the client has '
+                             'none.')
+        return store
+
+    def sync_to(self, store=None, **kwargs):
+        """
+        Make the snapshot of this endpoint a copy of all(): objects are
+        inserted or updated, and objects no longer returned removed.
+
+        Parameters
+        ----------
+        store : shopwave.snapshot.SnapshotStore, optional
+            Defaults to the snapshot of the client.
+        kwargs :
+            As for all().
+
+        Returns
+        -------
+        Number of objects in the snapshot.
+        """
+        store = self._snapshot_store(store)
+        return store.replace(self.name, self._fetch_data(self._all, **kwargs))
+
+    def export(self, path, format='csv', **kwargs):
+        """
+        Write all() to files in directory path, one per table (see
+        shopwave.export).
+
+        Parameters
+        ----------
+        path : string
+            Directory, created if it does not exist.
+        format : {'csv', 'arrow', 'parquet'}, optional
+        kwargs :
+            As for all().
 
-            # Set a user-agent so Xero knows the traffic is coming from pyxero
-            # or individual user/partner
-            headers['User-Agent'] = USER_AGENT
+        Returns
+        -------
+        dict of table name -> file path.
+        """
+        from shopwave import export
+        with export.get_writer(format, path) as writer:
+            writer.write_data(self._fetch_data(self._all, **kwargs))
+        return writer.paths
 
-            response = getattr(requests, method)(
-                    uri, data=body, headers=headers,
-                    params=params, timeout=timeout)
+    def _cache_lookup(self, request):
+        """
+        Look up a GET request in the cache. If a stale response is found, the
+        request is made conditional.
 
+        Returns
+        -------
+        cache key (None if the request is not cacheable), CachedResponse or
+        None.
+        """
+        if self.cache is None or request['method'].upper() != 'GET' or \
+                self.cache.ttl(self.name) is None:
+            return None, None
+        key = self.cache.key(self.name, request)
+        cached = self.cache.get(key)
+        if cached is not None and not cached.fresh:
+            request['headers'].update(cached.validators)
+        elif cached is not None and self.metrics is not None:
+            self.metrics.increment('cache', self.name, result='hit')
+        return key, cached
 
-            if response.status_code == 200:
-                # If we haven't got XML or JSON, assume we're being returned a binary file
-                if not response.headers['content-type'].startswith('application/json'):
-                    return response.content
+    def _cache_store(self, request, key, cached, response):
+        """
+        Returns
+        -------
+        The response to use for request: the cached one if the server
+        answered 304 Not Modified, otherwise response.
+        """
+        if self.cache is None:
+            return response
+        if key is None:
+            if request['method'].upper() != 'GET' and \
+                    200 <= response.status_code < 300:
+                self.invalidate_cache()
+            return response
+        ttl = self.cache.ttl(self.name)
+        revalidated = response.status_code == 304 and cached is not None
+        if self.metrics is not None:
+            self.metrics.increment('cache', self.name, result='revalidated'
+                                   if revalidated else 'miss')
+        if revalidated:
+            return self.cache.renew(key, cached, ttl)
+        if response.status_code == 200:
+            return self.cache.set(key, response, ttl)
+        return response
 
-                return self._parse_api_response(response, self.name,
-                                                return_format=return_format)
+    def invalidate_cache(self):
+        """
+        Drop the cached responses of this endpoint and the endpoints
+        embedding its objects. Called when objects are saved.
+        """
+        if self.cache is not None:
+            self.cache.invalidate(self.name)
 
-            elif response.status_code == 400:
-                raise ShopwaveBadRequest(response)
+    def iter(self, *args, **kwargs):
+        """
+        Like all(), but decodes the response body while it is received and
+        yields one model instance at a time, so neither the complete body nor
+        all models have to be held in memory.
 
-            elif response.status_code == 401:
-                #return response
-                raise ShopwaveUnauthorized(response)
+        Parameters
+        ----------
+        args, kwargs :
+            As for all(). return_format='json' yields raw dicts, compact=True
+            compact models, lazy=True lazy models.
+        chunk_size : int, optional
+            Number of bytes read from the connection at a time.
+        source : 'api' or 'local', optional
+            'local' iterates over the snapshot instead, see all().
+        """
+        chunk_size = kwargs.pop('chunk_size', STREAM_CHUNK_SIZE)
+        if self._local_source(kwargs):
+            data, options = self._load_local(self._all, *args, **kwargs)
+            return self._iter_items(
+                ((obj_name, item_id, item)
+                 for obj_name, items in data.items()
+                 for item_id, item in items.items()), options)
+        return self._iter_response(chunk_size, *args, **kwargs)
 
-            elif response.status_code == 403:
-                raise ShopwaveForbidden(response)
+    def _iter_response(self, chunk_size, *args, **kwargs):
+        request, options = self._build_request(self._all, *args, **kwargs)
+        response = self._send(request, stream=True)
+        try:
+            if response.status_code != 200:
+                self._raise_for_status(response)
+            chunks = response.iter_content(chunk_size)
+            for item in self._iter_items(iter_objects(chunks), options):
+                yield item
+        finally:
+            response.close()
 
-            elif response.status_code == 404:
-                raise ShopwaveNotFound(response)
+    def _iter_items(self, items, options):
+        """
+        Model instances (or dicts, for return_format='json') of the
+        (response key, id, data) tuples items, one at a time.
+        """
+        raw = options['return_format'] is not None and \
+              options['return_format'].upper() == 'JSON'
+        identity_map = self._new_identity_map()
+        for obj_name, item_id, data in items:
+            if raw:
+                yield data
+                continue
+            ModelClass = self._model_class(obj_name, options['compact'],
+                                           options['lazy'])
+            # Not held across the yield, the caller's context is not ours.
+            with identity.use(identity_map):
+                model = ModelClass(data=data)
+            yield model
 
-            elif response.status_code == 500:
-                raise ShopwaveInternalError(response)
+    def _new_identity_map(self):
+        """ Identity map for parsing one response, see identity_map.
+        """
+        if self.identity_map is None:
+            return identity.IdentityMap(line_items=False)
+        elif self.identity_map is False:
+            return None
+        return self.identity_map
 
+    def _send(self, request, **kwargs):
+        """
+        Send request through the transport. A 401 response triggers one
+        (coalesced) access token refresh and a replay of the request. Server
+        errors in retry_policy.statuses and connection errors are retried with
+        exponential backoff and jitter, within the policy deadline. Every
+        attempt waits for the rate_limiter, if any. With stream=True the
+        request holds its rate_limiter slot until the response is closed.
+        """
+        state = RetryState(self.retry_policy)
+        timeout = request['timeout']
+        limiter = self.rate_limiter
+        metrics = self.metrics
+        stream = kwargs.get('stream', False)
+        while True:
+            if limiter is not None:
+                started = limiter.acquire(self.name)
+            request['timeout'] = state.timeout(timeout)
+            status = None
+            try:
+                response = self.transport.request(**dict(request, **kwargs))
+                status = response.status_code
+            except retry_exceptions() as e:
+                delay = state.after_error(e)
+                if delay is None:
+                    raise
+                if metrics is not None:
+                    metrics.increment('retries', self.name,
+                                      reason=type(e).__name__)
+                time.sleep(delay)
+                continue
+            finally:
+                if limiter is not None and (status is None or not stream):
+                    limiter.release(self.name, started, status)
+
+            if metrics is not None:
+                metrics.record_response(self.name, response)
+            action = state.after_response(response)
+            if action is None:
+                if limiter is not None and stream:
+                    _release_on_close(response, limiter, self.name, started)
+                return response
+            response.close()
+            if limiter is not None and stream:
+                limiter.release(self.name, started, status)
+            if metrics is not None:
+                metrics.increment('retries', self.name, reason='unauthorized'
+                                  if action == REFRESH else status)
+            if action == REFRESH:
+                self._refresh_authorization(request)
             else:
-                raise ShopwaveExceptionUnknown(response)
+                time.sleep(action)
 
-        return wrapper
+    def _refresh_authorization(self, request):
+        """
+        Replace the access token rejected by the API in request's headers.
+        Concurrent refreshes for the same token result in one token request,
+        see Credentials.refresh.
+        """
+        stale_token = request['headers']['Authorization'].split(' ', 1)[-1]
+        token = self.credentials.refresh(stale_token)
+        request['headers']['Authorization'] = 'Bearer {token}'.format(
+            token=token)
 
+    def _build_request(self, func, *args, **kwargs):
+        """
+        Calls one of the DECORATED_METHODS and turns its result into keyword
+        arguments for Transport.request.
 
-    def _parse_api_response(self, response, resource_name, return_format=None):
-        data = json.loads(response.text)
+        Returns
+        -------
+        request : dict
+        options : dict
+            Parsing options (return_format, compact, lazy) for
+            _handle_response.
+        """
+        timeout = kwargs.pop('timeout', None)
+        options = self._pop_options(kwargs)
+        uri, params, method, body, headers = func(*args, **kwargs)
+        if headers is None:     headers = {}
+        headers.update(self.headers)
+
+        # Set a user-agent so Xero knows the traffic is coming from pyxero
+        # or individual user/partner
+        headers['User-Agent'] = USER_AGENT
+
+        request = {
+            'method':   method,
+            'uri':      uri,
+            'data':     body,
+            'headers':  headers,
+            'params':   params,
+            'timeout':  timeout,
+        }
+        return request, options
+
+    @staticmethod
+    def _pop_options(kwargs):
+        """ Parsing options (return_format, compact, lazy) from kwargs.
+        """
+        return {
+            'return_format':    kwargs.pop('return_format', None),
+            'compact':          kwargs.pop('compact', False),
+            'lazy':             kwargs.pop('lazy', False),
+        }
+
+    def _handle_response(self, response, return_format=None, compact=False,
+                         lazy=False, fetched=False):
+        """
+        Parse a successful response or raise the matching ShopwaveException.
+        fetched marks a response just received from the API (not from the
+        cache), whose objects are written through to the snapshot.
+        """
+        if response.status_code == 200:
+            # If we haven't got XML or JSON, assume we're being returned a binary file
+            if not response.headers['content-type'].startswith('application/json'):
+                return response.content
+
+            return self._parse_api_response(response, self.name,
+                                            return_format=return_format,
+                                            compact=compact, lazy=lazy,
+                                            fetched=fetched)
+        self._raise_for_status(response)
+
+    def _raise_for_status(self, response):
+        if response.status_code == 400:
+            raise ShopwaveBadRequest(response)
+
+        elif response.status_code == 401:
+            raise ShopwaveUnauthorized(response)
+
+        elif response.status_code == 403:
+            raise ShopwaveForbidden(response)
+
+        elif response.status_code == 404:
+            raise ShopwaveNotFound(response)
+
+        elif response.status_code == 500:
+            raise ShopwaveInternalError(response)
+
+        else:
+            raise ShopwaveExceptionUnknown(response)
+
+
+    def _parse_api_response(self, response, resource_name, return_format=None,
+                            compact=False, lazy=False, fetched=False):
+        """
+        Parameters
+        ----------
+        return_format : string, optional
+            'json' to return the response data as dict instead of models,
+            'columnar' for a shopwave.columnar.ColumnStore.
+        compact : bool, optional
+            Build compact (slotted) models, see ModelBase.compact.
+        lazy : bool, optional
+            Build lazy models, parsing fields on first access, see
+            ModelBase.lazy.
+        fetched : bool, optional
+            Write the objects through to the snapshot, if any.
+        """
+        metrics = self.metrics
+        if metrics is not None:
+            start = time.perf_counter()
+        # Decode from bytes, skipping the text decoding of response.text.
+        data = codec.loads(response.content)
         assert response.status_code == 200, "Expected the API to return HTTP200\
             code, but received {0}".format(response.status_code)
 
         # Don't need api part of response here
         data.pop('api', None)
 
+        if fetched and self.snapshot is not None:
+            self.snapshot.upsert(self.name, data)
+        if metrics is not None:
+            decoded = time.perf_counter()
+            metrics.observe('decode_seconds', self.name, decoded - start)
+        result = self._parse_data(data, return_format, compact, lazy)
+        if metrics is not None and result is not data:
+            metrics.observe('hydrate_seconds', self.name,
+                            time.perf_counter() - decoded)
+        return result
+
+    def _parse_data(self, data, return_format=None, compact=False,
+                    lazy=False):
+        """ Response data in return_format, see _parse_api_response.
+        """
         if return_format is not None and return_format.upper() == 'JSON':
             return data
-        else:
-            return self._parse_json(data)
+        elif return_format is not None and return_format.upper() == 'COLUMNAR':
+            # Imported on first use, numpy is slow to import.
+            from shopwave import columnar
+            return columnar.build_column_store(data)
+        return self._parse_json(data, compact=compact, lazy=lazy)
 
-    def _parse_json(self, json_data):
+    def _parse_json(self, json_data, compact=False, lazy=False):
         """
         NOT NAMED CORRECTLY - INCONVENIENT TO PASS JSON INSTEAD OF DICT!!
+
+        Returns
+        -------
+        dict of response key (e.g. 'products') -> list of model instances.
         """
         result = dict()
-        for obj_name in list(json_data):
-            data = json_data[obj_name]
-            matching = None
-            
-            # Finding matching model class
-            obj1 = obj_name[:-1]
-            while len(obj1) > 1:
-                n = len(obj1)
-                check = lambda x: (x[:n].lower()==obj1.lower())
-                matching = [obj2 for obj2 in MODEL_LIST if check(obj2)]
-                if matching: break
-                obj1 = obj1[:-1]
-
-            # Parsing data
-            obj_list = list()
-            while matching: 
+        with identity.use(self._new_identity_map()):
+            for obj_name, data in json_data.items():
+                ModelClass = self._model_class(obj_name, compact, lazy)
+                result[obj_name] = [ModelClass(data=data[item_id])
+                                    for item_id in data]
+        return result
+
+    def get_many(self, ids, batch_size=GET_MANY_BATCH_SIZE,
+                 workers=GET_MANY_WORKERS, return_format=None, compact=False,
+                 lazy=False, **kwargs):
+        """
+        Get any number of objects by id. The ids are requested in chunks that
+        fit the ids header (see chunk_ids), up to *workers* chunks at a time.
+
+        Parameters
+        ----------
+        ids : iterable of ids
+        batch_size : int, optional
+            Maximum number of ids per request.
+        workers : int, optional
+            Maximum number of requests at the same time.
+        return_format : 'json', optional
+            Return dicts instead of model instances.
+        compact : bool, optional
+            Build compact models, see ModelBase.compact.
+        lazy : bool, optional
+            Build lazy models, see ModelBase.lazy.
+
+        Returns
+        -------
+        IdMapping of id -> model instance, in the order of ids. Ids not
+        returned by the API are listed in its missing attribute.
+        """
+        ids, chunks = self._prepare_many(ids, batch_size, return_format)
+
+        def fetch(chunk):
+            return self.get(chunk, return_format='json', **kwargs)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(fetch, chunks))
+        return self._merge_many(ids, results, return_format, compact, lazy)
+
+    @staticmethod
+    def _prepare_many(ids, batch_size, return_format=None):
+        """
+        Check the arguments of get_many before any request is sent.
+
+        Returns
+        -------
+        ids without duplicates, list of comma separated id chunks.
+        """
+        if return_format is not None and return_format.upper() != 'JSON':
+            raise ValueError("get_many supports return_format='json' only.")
+        ids = list(dict.fromkeys(ids))
+        return ids, list(chunk_ids(ids, batch_size=batch_size))
+
+    def _merge_many(self, ids, results, return_format=None, compact=False,
+                    lazy=False):
+        """ Merge the json results of get_many's requests into an IdMapping.
+        """
+        if self.metrics is not None:
+            start = time.perf_counter()
+        found = {}
+        for data in results:
+            for obj_name, items in data.items():
+                for item_id, item in items.items():
+                    found[str(item_id)] = (obj_name, item_id, item)
+
+        mapping = IdMapping()
+        with identity.use(self._new_identity_map()):
+            for idNr in ids:
                 try:
-                    ModelClass = getattr(models, matching.pop())
-                    for item_id in list(data):
-                        obj_list.append(ModelClass(data=data[item_id]))
-                    break
-                except TypeError as e:
-                    raise e
-                    # Continue to next class in list 'matching'. If no match,
-                    # ValueError will be raised at end.
-                    pass
-
-            if obj_list: 
-                result[obj_name] = obj_list
-            else:
-                raise ValueError("Failed to parse the provided JSON data. "+\
-                                 "No matching object found.")
-        if len(obj_list) == 1:
-            return list(result.values())
-        else:
-            return result
+                    obj_name, item_id, item = found[str(idNr)]
+                except KeyError:
+                    mapping.missing.append(idNr)
+                    continue
+                if return_format is None:
+                    ModelClass = self._model_class(obj_name, compact, lazy)
+                    item = ModelClass(data=item)
+                mapping[idNr] = item
+        if self.metrics is not None and return_format is None:
+            self.metrics.observe('hydrate_seconds', self.name,
+                                 time.perf_counter() - start)
+        return mapping
+
+    @staticmethod
+    def _model_class(obj_name, compact=False, lazy=False):
+        """ Model class for response key obj_name, see _parse_api_response.
+        """
+        ModelClass = models.get_model_class(obj_name)
+        if compact and lazy:
+            raise ValueError('compact and lazy can not be combined.')
+        if compact:
+            ModelClass = ModelClass.compact()
+        elif lazy:
+            ModelClass = ModelClass.lazy()
+        return ModelClass
 
     def _all(self, **kwargs):
         """
@@ -164,22 +729,29 @@ class GenericManager(object):
         uri, params, method, body, headers for http request.
         """
         uri = self.base_url + self.name.lower().replace('_', '/')
-        headers = kwargs.get('headers', {})
+        headers = dict(kwargs.get('headers') or {})
         headers['%sIds' % self.name.lower()] = ids
         return uri, {}, 'get', None, headers
 
 
 class Report_BasketManager(GenericManager):
+    WINDOWS = {
+        'hourly':   ONE_HOUR,
+        'daily':    ONE_DAY,
+    }
+
     def __init__(self, *args, **kwargs):
         super(Report_BasketManager, self).__init__(*args, **kwargs)
+        self._checkpoint_store = None
 
-    def _all(self, from_date=None, to_date=None):
+    def _date_range(self, from_date=None, to_date=None):
         """
         If *from* date not specified, will default to 1 day timeframe. If *to* date
         not specified will set to now.
 
-        Parameters
-        ---------
+        Returns
+        -------
+        from_date, to_date : ShopwaveDatetime
         """
         if from_date is None and to_date is None:
             to_date = ShopwaveDatetime.now()
@@ -190,15 +762,299 @@ class Report_BasketManager(GenericManager):
         elif from_date is None:
             to_date = ShopwaveDatetime(to_date)
             from_date = to_date - ONE_DAY
+        return ShopwaveDatetime(from_date), ShopwaveDatetime(to_date)
 
-        # Make sure date/time is in required format
-        from_date = ShopwaveDatetime(from_date).to_str()
-        to_date = ShopwaveDatetime(to_date).to_str()
+    def _all(self, from_date=None, to_date=None):
+        """
+        If *from* date not specified, will default to 1 day timeframe. If *to* date
+        not specified will set to now.
 
+        Parameters
+        ---------
+        """
+        from_date, to_date = self._date_range(from_date, to_date)
+
+        # Make sure date/time is in required format
         headers = {
-            'to':       to_date,
-            'from':     from_date 
+            'to':       to_date.to_str(),
+            'from':     from_date.to_str()
         }
 
         return super(Report_BasketManager, self)._all(headers=headers)
 
+    def _local_all(self, from_date=None, to_date=None, sId=None,
+                   productId=None):
+        """
+        Baskets of the snapshot completed in the date range of all(),
+        optionally only of store sId or with a line of product productId.
+        """
+        from_date, to_date = self._date_range(from_date, to_date)
+        return self.snapshot.baskets(from_date=from_date, to_date=to_date,
+                                     sId=sId, productId=productId)
+
+    def _fetch_windows(self, fetch, from_date, to_date, window, workers,
+                       failed=None):
+        """
+        Call fetch(from, to) for the windows of the date range, up to
+        *workers* at a time. Yields the results in window order. At most
+        *workers* results are requested ahead of the one being consumed, so
+        memory is bounded for any date range.
+
+        If failed is a list, windows that raise are appended to it as
+        (from, to, exception) and skipped; otherwise the error is raised.
+        """
+        if not isinstance(window, timedelta):
+            window = self.WINDOWS[window]
+        from_date, to_date = self._date_range(from_date, to_date)
+        windows = date_windows(from_date, to_date, window)
+
+        def done(w, future):
+            try:
+                return [future.result()]
+            except Exception as e:
+                if failed is None:
+                    raise
+                failed.append((w[0], w[1], e))
+                return []
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = collections.deque()
+            for w in windows:
+                if len(pending) == workers:
+                    for result in done(*pending.popleft()):
+                        yield result
+                pending.append((w, executor.submit(fetch, *w)))
+            while pending:
+                for result in done(*pending.popleft()):
+                    yield result
+
+    def all_windowed(self, from_date=None, to_date=None, window='daily',
+                     workers=REPORT_WINDOW_WORKERS, **kwargs):
+        """
+        Fetch a long date range as a number of smaller windows, requested
+        concurrently. Every window request is retried on its own by the
+        retry_policy of the client, without refetching the other windows.
+        Windows that still fail do not stop the others: once all windows
+        are done, ShopwaveWindowsFailed is raised with the baskets fetched
+        (result) and the failed windows, which can be requested again:
+
+        >>> try:
+        ...     baskets = sw.report_basket.all_windowed(start, end)
+        ... except ShopwaveWindowsFailed as e:
+        ...     baskets = e.result
+        ...     for from_date, to_date, error in e.failed:
+        ...         baskets.update(sw.report_basket.all_windowed(
+        ...             from_date, to_date))
+
+        For throughput to scale with *workers*, the transport pool size
+        (Shopwave(pool_maxsize=...)) should be at least *workers*.
+
+        Parameters
+        ----------
+        from_date, to_date : optional
+            As for all().
+        window : 'hourly', 'daily' or datetime.timedelta, optional
+        workers : int, optional
+            Maximum number of windows requested at the same time.
+        return_format : 'json', optional
+            Return basket dicts instead of models.
+
+        Returns
+        -------
+        dict of bId -> BasketReport (basket dict for return_format='json'),
+        ordered by window.
+        """
+        return_format = kwargs.get('return_format')
+        if return_format is not None and return_format.upper() != 'JSON':
+            raise ValueError("all_windowed supports return_format='json' "
+                             "only.")
+        raw = return_format is not None
+
+        def fetch(start, end):
+            return self.all(from_date=start, to_date=end, **kwargs)
+
+        result = dict()
+        failed = []
+        for window_result in self._fetch_windows(fetch, from_date, to_date,
+                                                 window, workers, failed):
+            # Baskets on a window boundary can be returned twice.
+            if raw:
+                for items in window_result.values():
+                    for bId, basket in items.items():
+                        result[int(basket.get('bId', bId))] = basket
+                continue
+            for basket in self._iter_models(window_result):
+                result[basket.bId] = basket
+        if failed:
+            raise ShopwaveWindowsFailed(result, failed) from failed[0][2]
+        return result
+
+    def sync_to(self, store=None, from_date=None, to_date=None,
+                window='daily', workers=REPORT_WINDOW_WORKERS,
+                overlap=timedelta(seconds=REPORT_SYNC_OVERLAP)):
+        """
+        Bring the baskets of a snapshot up to date. Requests from *overlap*
+        before the latest completion date in the snapshot (or from_date, for
+        an empty snapshot) in windows, as all_windowed, and upserts every
+        window as it arrives. Baskets returned again replace the stored ones.
+
+        Parameters
+        ----------
+        store : shopwave.snapshot.SnapshotStore, optional
+            Defaults to the snapshot of the client.
+        from_date : optional
+            Start of the first sync, if the snapshot holds no baskets yet.
+            Defaults to one day ago.
+        to_date : optional
+            Defaults to now.
+        window, workers : optional
+            See all_windowed.
+        overlap : datetime.timedelta, optional
+
+        Returns
+        -------
+        Number of baskets written.
+        """
+        store = self._snapshot_store(store)
+        last = store.last_completed()
+        if last is not None:
+            from_date = last - overlap
+        if to_date is None:
+            to_date = ShopwaveDatetime.now()
+
+        def fetch(start, end):
+            return self._fetch_data(self._all, from_date=start, to_date=end)
+
+        written = 0
+        for data in self._fetch_windows(fetch, from_date, to_date, window,
+                                        workers):
+            written += store.upsert(self.name, data)
+        return written
+
+    def export(self, from_date, to_date, path, format='csv', window='daily',
+               workers=REPORT_WINDOW_WORKERS):
+        """
+        Write the baskets of a date range to files in directory path: the
+        baskets, their product lines and their transactions, one file each
+        (see shopwave.export). The range is requested in windows, as by
+        all_windowed, and every window is written as soon as it arrives, so
+        memory use depends on the window size only.
+
+        Parameters
+        ----------
+        from_date, to_date :
+            As for all().
+        path : string
+            Directory, created if it does not exist.
+        format : {'csv', 'arrow', 'parquet'}, optional
+        window, workers : optional
+            See all_windowed.
+
+        Returns
+        -------
+        dict of table name ('baskets', 'baskets.p', 'baskets.tr') -> file
+        path.
+        """
+        from shopwave import export
+
+        def fetch(start, end):
+            return self._fetch_data(self._all, from_date=start, to_date=end)
+
+        with export.get_writer(format, path) as writer:
+            for data in self._fetch_windows(fetch, from_date, to_date, window,
+                                            workers):
+                writer.write_data(data)
+        return writer.paths
+
+    def sync(self, store=None, name='report_basket', from_date=None,
+             overlap=timedelta(seconds=REPORT_SYNC_OVERLAP), **kwargs):
+        """
+        Fetch only the baskets completed since the last sync.
+
+        The checkpoint holds the last seen completion date (BasketReport.c)
+        and bId, plus the ids of the baskets completed within *overlap* of
+        it. Every sync requests from *overlap* before the last completion
+        date, so late arriving baskets are picked up, and drops the baskets
+        that were returned before. Baskets without completion date are
+        returned once as well: the checkpoint keeps the ids of the last
+        REPORT_SYNC_UNDATED_MAX of them. Once completed, such a basket is
+        returned again, with its completion date.
+
+        Parameters
+        ----------
+        store : shopwave.checkpoint.CheckpointStore, optional
+            Defaults to the Redis instance of the credentials, or a local file
+            if Redis is not available.
+        name : string, optional
+            Checkpoint name, use different names for independent consumers.
+        from_date : optional
+            Start of the first sync, if no checkpoint exists yet. Defaults to
+            one day ago.
+        overlap : datetime.timedelta, optional
+        kwargs :
+            As for all(), except return_format: sync reads the completion
+            dates of models.
+
+        Returns
+        -------
+        list of BasketReport not returned by a previous sync, ordered by
+        completion date.
+        """
+        if kwargs.get('return_format') is not None:
+            raise ValueError('sync returns models, return_format is not '
+                             'supported.')
+        if store is None:
+            if self._checkpoint_store is None:
+                self._checkpoint_store = checkpoint.get_default_store(
+                    self.credentials)
+            store = self._checkpoint_store
+
+        state = store.load(name) or {}
+        to_date = ShopwaveDatetime.now()
+        if state.get('c'):
+            high_water_mark = ShopwaveDatetime(state['c'])
+            from_date = high_water_mark - overlap
+        else:
+            high_water_mark = None
+            from_date, to_date = self._date_range(from_date, to_date)
+        last_bId = state.get('bId')
+        seen = {int(bId): c for bId, c in state.get('seen', {}).items()}
+        undated_ids = state.get('undated', [])
+        known_undated = set(undated_ids)
+
+        result = self.all(from_date=from_date, to_date=to_date, **kwargs)
+        completed = []
+        undated = []
+        for basket in self._iter_models(result):
+            if isinstance(basket.c, ShopwaveDatetime):
+                if basket.bId not in seen:
+                    completed.append(basket)
+            elif basket.bId not in known_undated:
+                undated.append(basket)
+        if not completed and not undated:
+            return []
+        completed.sort(key=lambda b: b.c)
+
+        if completed and (high_water_mark is None or
+                          completed[-1].c >= high_water_mark):
+            high_water_mark, last_bId = completed[-1].c, completed[-1].bId
+        for basket in completed:
+            seen[basket.bId] = basket.c.to_str()
+        if high_water_mark is not None:
+            keep_from = high_water_mark - overlap
+            seen = {bId: c for bId, c in seen.items()
+                    if ShopwaveDatetime(c) >= keep_from}
+        undated_ids = undated_ids + [b.bId for b in undated]
+        store.save(name, {
+            'c':        high_water_mark and high_water_mark.to_str(),
+            'bId':      last_bId,
+            'seen':     {str(bId): c for bId, c in seen.items()},
+            'undated':  undated_ids[-REPORT_SYNC_UNDATED_MAX:],
+        })
+        return completed + undated
+
+    @staticmethod
+    def _iter_models(result):
+        for obj_list in result.values():
+            for obj in obj_list:
+                yield obj
@@ -0,0 +1,293 @@
+#! -*- coding: utf-8 -*-
+"""
+Per endpoint metrics of API calls.
+
+A Metrics instance passed to Shopwave(metrics=...) receives, for every call:
+
+    requests (status)               counter
+    connect_seconds                 DNS, TCP and TLS setup of new connections
+    ttfb_seconds                    request sent to response headers received
+    download_seconds                response body download
+    response_bytes
+    decode_seconds                  JSON decoding
+    hydrate_seconds                 building models (or columns)
+    retries (reason)                counter, reason is the HTTP status,
+                                    'unauthorized' or the exception name
+    cache (result)                  counter, 'hit', 'miss' or 'revalidated'
+
+and from Credentials, token_refreshes (grant_type, status) and
+token_request_seconds. All series are labelled with the endpoint, i.e. the
+OBJECT_LIST name ('token' for token requests).
+
+Metrics forwards them to one or more sinks: MemorySink (histograms kept in
+memory), LoggingSink and PrometheusSink (text exposition format). Without
+a Metrics instance nothing is measured.
+"""
+
+import bisect
+import collections
+import logging
+import threading
+
+from shopwave.settings import (METRICS_SAMPLES, METRICS_SECONDS_BUCKETS,
+                               METRICS_BYTES_BUCKETS)
+
+# Order of the transport timings in Transfer
+PHASES = ('connect', 'ttfb', 'download')
+
+
+def _labels(endpoint, labels):
+    labels['endpoint'] = endpoint
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metrics(object):
+    """
+    Parameters
+    ----------
+    sinks : Sink instances
+        Defaults to a single MemorySink.
+    """
+    def __init__(self, *sinks):
+        self.sinks = sinks or (MemorySink(),)
+
+    def observe(self, name, endpoint, value, **labels):
+        labels = _labels(endpoint, labels)
+        for sink in self.sinks:
+            sink.observe(name, labels, value)
+
+    def increment(self, name, endpoint, n=1, **labels):
+        labels = _labels(endpoint, labels)
+        for sink in self.sinks:
+            sink.increment(name, labels, n)
+
+    def record_response(self, endpoint, response):
+        """ Status, transport timings and size of a response. """
+        self.increment('requests', endpoint, status=response.status_code)
+        transfer = getattr(response, 'transfer', None)
+        if transfer is None:
+            return
+        for phase, value in zip(PHASES, transfer):
+            if value is not None:
+                self.observe(phase + '_seconds', endpoint, value)
+        if transfer.size is not None:
+            self.observe('response_bytes', endpoint, transfer.size)
+
+
+class Sink(object):
+    """
+    Receives observations and counter increments. labels is a sorted tuple
+    of (name, value) pairs.
+    """
+    def observe(self, name, labels, value):
+        raise NotImplementedError
+
+    def increment(self, name, labels, n):
+        raise NotImplementedError
+
+
+class Histogram(object):
+    """ Count, sum, min, max and the last *samples* values of a series. """
+    def __init__(self, samples=METRICS_SAMPLES):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.samples = collections.deque(maxlen=samples)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.samples.append(value)
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+        self.samples.extend(other.samples)
+
+    def percentile(self, p):
+        """ p-th percentile (0-100) of the kept samples, None if empty. """
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * p / 100.), len(ordered) - 1)]
+
+    def as_dict(self):
+        return {
+            'count': self.count, 'sum': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min, 'max': self.max,
+            'p50': self.percentile(50), 'p90': self.percentile(90),
+            'p99': self.percentile(99),
+        }
+
+
+class MemorySink(Sink):
+    """
+    Keeps a Histogram per observed series and a total per counter.
+
+    >>> memory = MemorySink()
+    >>> sw = Shopwave(cred, metrics=Metrics(memory))
+    >>> sw.product.all()
+    >>> memory.histogram('ttfb_seconds', endpoint='Product')['p50']
+    """
+    def __init__(self, samples=METRICS_SAMPLES):
+        self.samples = samples
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.samples)
+            histogram.add(value)
+
+    def increment(self, name, labels, n):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    @staticmethod
+    def _matches(labels, wanted):
+        labels = dict(labels)
+        return all(labels.get(k) == str(v) for k, v in wanted.items())
+
+    def histogram(self, name, **labels):
+        """
+        Statistics of observations of name, over all series matching labels
+        (e.g. endpoint='Product'), as a dict, or None if there are none.
+        """
+        merged = None
+        with self._lock:
+            for (series, series_labels), histogram in self.histograms.items():
+                if series == name and self._matches(series_labels, labels):
+                    if merged is None:
+                        merged = Histogram(self.samples)
+                    merged.merge(histogram)
+        return merged.as_dict() if merged is not None else None
+
+    def counter(self, name, **labels):
+        """ Sum of counter name over all series matching labels. """
+        with self._lock:
+            return sum(n for (series, series_labels), n
+                       in self.counters.items()
+                       if series == name and
+                       self._matches(series_labels, labels))
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+class LoggingSink(Sink):
+    """
+    Logs every observation and increment, by default to the
+    'shopwave.metrics' logger at DEBUG level.
+    """
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = level
+
+    def observe(self, name, labels, value):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, '%s%s %g', name,
+                            _format_labels(labels), value)
+
+    def increment(self, name, labels, n):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, '%s%s +%d', name,
+                            _format_labels(labels), n)
+
+
+class PrometheusSink(Sink):
+    """
+    Cumulative histograms and counters, rendered in the Prometheus text
+    exposition format by render(), e.g. from a /metrics handler of the
+    application. Series names are prefixed with *prefix*; observations
+    ending in _seconds use METRICS_SECONDS_BUCKETS, others (bytes)
+    METRICS_BYTES_BUCKETS.
+    """
+    def __init__(self, prefix='shopwave',
+                 seconds_buckets=METRICS_SECONDS_BUCKETS,
+                 bytes_buckets=METRICS_BYTES_BUCKETS):
+        self.prefix = prefix
+        self.seconds_buckets = tuple(seconds_buckets)
+        self.bytes_buckets = tuple(bytes_buckets)
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def _buckets(self, name):
+        if name.endswith('_seconds'):
+            return self.seconds_buckets
+        return self.bytes_buckets
+
+    def observe(self, name, labels, value):
+        buckets = self._buckets(name)
+        index = bisect.bisect_left(buckets, value)
+        key = (name, labels)
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                # Per bucket counts (last one is +Inf), sum
+                series = self._histograms[key] = [[0] * (len(buckets) + 1),
+                                                  0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def increment(self, name, labels, n):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def render(self):
+        """ All series in the Prometheus text format. """
+        lines = []
+        with self._lock:
+            histograms = sorted((k, ([c for c in v[0]], v[1]))
+                                for k, v in self._histograms.items())
+            counters = sorted(self._counters.items())
+        typed = set()
+        for (name, labels), n in counters:
+            metric = '%s_%s_total' % (self.prefix, name)
+            if metric not in typed:
+                typed.add(metric)
+                lines.append('# TYPE %s counter' % metric)
+            lines.append('%s%s %d' % (metric, _format_labels(labels), n))
+        for (name, labels), (counts, total) in histograms:
+            metric = '%s_%s' % (self.prefix, name)
+            if metric not in typed:
+                typed.add(metric)
+                lines.append('# TYPE %s histogram' % metric)
+            cumulative = 0
+            bounds = [repr(float(b)) for b in self._buckets(name)] + ['+Inf']
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                lines.append('%s_bucket%s %d' % (
+                    metric, _format_labels(labels + (('le', bound),)),
+                    cumulative))
+            lines.append('%s_sum%s %r' % (metric, _format_labels(labels),
+                                          total))
+            lines.append('%s_count%s %d' % (metric, _format_labels(labels),
+                                            cumulative))
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (k, v.replace('\\', '\\\\')
+                                         .replace('"', '\\"'))
+                             for k, v in labels)
@@ -39,7 +39,10 @@ class Product(Model):
     unit =      fields.CharField()
     vatPercentage = fields.FloatField()
 
-    # Attributes that may be added from ReportBasket -> Transaction
+    # Attributes that may be added from ReportBasket -> Transaction. Lines
+    # of the same product share one Product, see ModelBase.line_item.
+    LINE_FIELDS = frozenset(['bPIId', 'nt', 'pIId', 'pIP', 'pMP', 'pMTP',
+                             'q', 'vP'])
     bPIId =     fields.IntField(blank=True)
     nt =        fields.CharField(blank=True)
     pIId =     fields.IntField(blank=True)
@@ -70,3 +73,46 @@ class BasketReport(Model):
 
     tr =    fields.Reference(references=Transaction)
 
+
+
+# Response keys that can not be derived from the model name.
+RESPONSE_KEY_OVERRIDES = {
+    'baskets':  'BasketReport',
+    'basket':   'BasketReport',
+}
+
+def _response_keys(model_name):
+    """ Singular and plural response keys for model_name, e.g. 'category'
+    and 'categories' for Category.
+    """
+    name = model_name.lower()
+    if name.endswith('y'):  plural = name[:-1] + 'ies'
+    else:                   plural = name + 's'
+    return (name, plural)
+
+def build_registry(model_names=MODEL_LIST, overrides=RESPONSE_KEY_OVERRIDES):
+    """
+    Map lower case response keys to model classes.
+    """
+    registry = {}
+    for model_name in model_names:
+        for key in _response_keys(model_name):
+            registry[key] = globals()[model_name]
+    for key, model_name in overrides.items():
+        registry[key.lower()] = globals()[model_name]
+    return registry
+
+MODEL_REGISTRY = build_registry()
+
+def get_model_class(response_key):
+    """
+    Model class for a top level key of an API response, e.g. Product for
+    'products'.
+    """
+    try:
+        return MODEL_REGISTRY[response_key.lower()]
+    except KeyError:
+        raise ValueError(
+            "No model registered for response key '%s'. Known keys: %s. "
+            "Add it to shopwave.models.RESPONSE_KEY_OVERRIDES."
+            % (response_key, ", ".join(sorted(MODEL_REGISTRY))))
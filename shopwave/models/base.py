@@ -1,8 +1,9 @@
 #! -*- coding: utf-8 -*-
 
-import six
-import json
+import copy
+from shopwave import codec
 from shopwave import fields
+from shopwave import identity
 
 class ModelMetaData:
     """
@@ -13,6 +14,14 @@ class ModelMetaData:
         self._fields = {}
         self._alias = {}
         self._primary_field = None
+        self._field_names = None
+        self._name_attr = ''
+        self.hydrate = None
+        self.slots = False
+        self.lazy = False
+        self.compact_class = None
+        self.lazy_class = None
+        self.line_class = None
         self.model_name = model_name
         for f in fields:    
             self.add_field(f)
@@ -20,11 +29,13 @@ class ModelMetaData:
     def get_field_names(self):
         """ Get list of all field names and aliases
         """
-        names = set()
-        names.update(list(self._fields.keys())) 
-        names.update(list(self._alias.keys()))
-        names.update(['id'])
-        return names
+        if self._field_names is None:
+            names = set()
+            names.update(list(self._fields.keys())) 
+            names.update(list(self._alias.keys()))
+            names.update(['id'])
+            self._field_names = frozenset(names)
+        return self._field_names
 
     def get_fields(self):
         """ Get list of all fields.
@@ -60,37 +71,247 @@ class ModelMetaData:
             self._alias[alias_name] = field.attrname
 
         self._fields[field.attrname] = field
+        self._field_names = None
 
     def set_model(self, model):
+        """ Link metadata and all fields to model class.
+        """
         self.model = model
         for field in self.get_fields():
             field.set_model(model)
+        self._name_attr = self._find_name_attr()
+        self.hydrate = self.compile_hydrator()
+
+    def has_references(self):
+        return any(isinstance(f, fields.Reference) for f in self.get_fields())
+
+    def _find_name_attr(self):
+        """ Attribute used as representative value in Model.__repr__.
+        """
+        for name_attr in ['name', 'title', 'details']:
+            if name_attr in self._fields:
+                return name_attr
+            for field in self.get_fields():
+                if field.alt_name and field.alt_name.lower() == name_attr:
+                    return field.attrname
+        return ''
+
+    def compile_hydrator(self):
+        """
+        Build a function setting all values of a raw data dict on a model
+        instance in one pass. Field names and aliases are resolved to
+        (attrname, parser) pairs once here, instead of going through
+        Model.__setattr__ and get_field() for every value.
+        """
+        lookup = {}
+        for name in self.get_field_names():
+            field = self.get_field(name)
+            if field is not None:
+                lookup[name] = (field.attrname, field.get_parser())
+        fields = self._fields
+        model = self.model
+        set_slot = object.__setattr__
+
+        if self.lazy:
+            valid_keys = frozenset(lookup)
+            has_references = self.has_references()
+
+            def hydrate(instance, data):
+                if not valid_keys.issuperset(data):
+                    key = next(k for k in data if k not in valid_keys)
+                    raise TypeError(
+                        'Instantiating %s: %s is an invalid keyword argument '
+                        'for this function.' % (model, key))
+                values = instance.__dict__
+                values['_raw'] = data
+                if has_references:
+                    # References are parsed later, with the identity map
+                    # active now.
+                    values['_identity_map'] = identity.current()
+
+            return hydrate
+
+        if self.slots:
+            def hydrate(instance, data):
+                for key, value in data.items():
+                    try:
+                        attrname, parse = lookup[key]
+                    except KeyError:
+                        raise TypeError(
+                            'Instantiating %s: %s is an invalid keyword '
+                            'argument for this function.' % (model, key))
+                    if value is None:
+                        continue
+                    try:
+                        set_slot(instance, attrname, parse(value))
+                    except ValueError as e:
+                        raise ValueError('Error in parsing value for %r. %s'
+                                         % (fields[attrname], e))
+
+            return hydrate
+
+        def hydrate(instance, data):
+            values = instance.__dict__
+            for key, value in data.items():
+                try:
+                    attrname, parse = lookup[key]
+                except KeyError:
+                    raise TypeError(
+                        'Instantiating %s: %s is an invalid keyword argument '
+                        'for this function.' % (model, key))
+                if value is None:
+                    continue
+                try:
+                    values[attrname] = parse(value)
+                except ValueError as e:
+                    raise ValueError('Error in parsing value for %r. %s'
+                                     % (fields[attrname], e))
+
+        return hydrate
 
 
 class ModelBase(type):
     """
     Metaclass for Model.
+
+    Passing slots=True in the class definition creates a compact model:
+    fields are stored in __slots__ instead of an instance __dict__, and
+    default values are looked up in the fields instead of being class
+    attributes.
+
+        class Product(Model, slots=True):
+            ...
     """
-    def __new__(cls, name, bases, attrs):
+    def __new__(cls, name, bases, attrs, slots=False, lazy=False):
         meta = ModelMetaData(model_name=name)
+        meta.slots = slots
+        meta.lazy = lazy
         new_attrs = dict()
         for k, v in attrs.items():
             # Setting default values for all specified fields in model that are
             # not set to blank.
             if hasattr(v, '_is_basefield'): 
-                if not v.blank:     new_attrs[k] = v.default()
                 v.attrname = k
+                if lazy:
+                    new_attrs[k] = fields.LazyAttribute(v)
+                elif not v.blank and not slots:
+                    new_attrs[k] = v.default()
                 meta.add_field(v)
             else:
                 new_attrs[k] = v
+        if slots:
+            # Fields of slotted bases, e.g. of the compact model of a compact
+            # line item, keep the slots of the base.
+            inherited = set()
+            for base in bases:
+                for klass in base.__mro__:
+                    inherited.update(klass.__dict__.get('__slots__', ()))
+            new_attrs['__slots__'] = tuple(attrs.get('__slots__', ())) + \
+                tuple(k for k in meta._fields if k not in inherited)
         new_attrs['_meta'] = meta
-        return super().__new__(cls, name, bases, new_attrs)
+        new_class = super().__new__(cls, name, bases, new_attrs)
+        meta.set_model(new_class)
+        return new_class
 
     def _validate(self):
         return True
 
+    def compact(cls):
+        """
+        Slotted twin of a model class, with the same fields, aliases and
+        parsing. References of the twin resolve to compact models as well,
+        and CharField values are interned. Created once per model class.
+
+        Unlike the lazy twin, the compact twin derives from Model rather than
+        from cls, as instances of a subclass of a regular model would still
+        carry a __dict__: isinstance(obj, Product) is False for compact
+        products, use isinstance(obj, Product.compact()).
+        """
+        meta = cls._meta
+        if meta.slots:
+            return cls
+        if meta.compact_class is None:
+            attrs = {'__module__': cls.__module__,
+                     '__qualname__': 'Compact' + cls.__qualname__,
+                     'LINE_FIELDS': cls.LINE_FIELDS}
+            for field in meta.get_fields():
+                field = copy.copy(field)
+                field.alias = list(field.alias)
+                if isinstance(field, fields.Reference):
+                    field.compact = True
+                elif isinstance(field, fields.CharField):
+                    field.intern = True
+                attrs[field.attrname] = field
+            meta.compact_class = ModelBase('Compact' + cls.__name__,
+                                           (Model,), attrs, slots=True)
+        return meta.compact_class
+
+    def lazy(cls):
+        """
+        Subclass of a model class that keeps the raw data dict of an instance
+        and parses every field on first access only, memoizing the value in
+        the instance. References of the twin resolve to lazy models as well.
+        Created once per model class.
+        """
+        meta = cls._meta
+        if meta.lazy:
+            return cls
+        if meta.slots:
+            raise TypeError('Compact models can not be lazy.')
+        if meta.lazy_class is None:
+            attrs = {'__module__': cls.__module__,
+                     '__qualname__': 'Lazy' + cls.__qualname__}
+            for field in meta.get_fields():
+                field = copy.copy(field)
+                field.alias = list(field.alias)
+                if isinstance(field, fields.Reference):
+                    field.lazy = True
+                attrs[field.attrname] = field
+            meta.lazy_class = ModelBase('Lazy' + cls.__name__, (cls,), attrs,
+                                        lazy=True)
+        return meta.lazy_class
+
+    def line_item(cls):
+        """
+        Subclass of a model class for occurrences of a shared instance that
+        carry fields of their own, such as the product lines of baskets. The
+        id and the LINE_FIELDS are set on the line; every other field is
+        read from (and written to) the shared instance, its item attribute.
+        Line items of compact models are slotted as well. Created once per
+        model class.
+        """
+        meta = cls._meta
+        if meta.line_class is None:
+            attrs = {'__module__': cls.__module__,
+                     '__qualname__': cls.__qualname__ + 'Line'}
+            if meta.slots:
+                attrs['__slots__'] = ('item',)
+            for field in meta.get_fields():
+                field = copy.copy(field)
+                field.alias = list(field.alias)
+                attrs[field.attrname] = field
+            line_class = ModelBase(cls.__name__ + 'Line', (cls,), attrs,
+                                   slots=meta.slots)
+            for field in meta.get_fields():
+                if field.attrname not in cls.LINE_FIELDS and \
+                        not field._primary_key:
+                    setattr(line_class, field.attrname,
+                            _shared_attribute(field.attrname))
+            meta.line_class = line_class
+        return meta.line_class
+
+
+def _shared_attribute(attrname):
+    return property(lambda self: getattr(self.item, attrname),
+                    lambda self, value: setattr(self.item, attrname, value))
+
 
 class Model(metaclass=ModelBase):
+    __slots__ = ()
+    # Fields of an occurrence rather than of the referenced object, see
+    # ModelBase.line_item.
+    LINE_FIELDS = frozenset()
+
     def __init__(self, **kwargs):
         """
         If json and kwargs are specified, json value will take precedence.
@@ -107,50 +328,18 @@ class Model(metaclass=ModelBase):
         data : dict, optional 
             Same as json, but converted to python dict.
         """
-        super().__init__()
-        self._meta.set_model(self)
         if 'json' in kwargs:
             # Create instance from json.
-            construct_from_json = True
-            json_data = kwargs.pop('json')
-            kwargs.update(json.loads(json_data))
+            kwargs.update(codec.loads(kwargs.pop('json')))
 
         if 'data' in kwargs:
             data = kwargs.pop('data')
-            kwargs.update(data)
-
-        for name in self._meta.get_field_names():
-            value = kwargs.pop(name, None)
-            if value is not None:       setattr(self, name, value)
-
-        # >>>
-        """
-        for f in self._meta.get_fields():
-            attrname = f.attrname
-
-            value = kwargs.pop(attrname, None)
-            if value is not None:
-                setattr(self, attrname, value)
-        """
-         # <<<
-
-        if kwargs:
-            raise TypeError(
-                'Instantiating %s: %s is an invalid keyword argument for this function.' 
-                 % (self.__class__, list(kwargs)[0])
-            )
+            if kwargs:
+                kwargs.update(data)
+            else:
+                kwargs = data
 
-        # Check attribute names and fields alt_names for fields to use as
-        # representative values for each instance of Model.
-        self._meta._name_attr = ''
-        for name_attr in ['name', 'title', 'details']:
-            if hasattr(self, name_attr): 
-                self._meta._name_attr = name_attr
-                break
-            for field in self._meta.get_fields():
-                if field.alt_name and field.alt_name.lower() == name_attr:
-                    self._meta._name_attr = field.attrname
-                    break
+        self._meta.hydrate(self, kwargs)
 
     def __setattr__(self, k, v):
         field = self._meta.get_field(k)
@@ -158,17 +347,24 @@ class Model(metaclass=ModelBase):
         parsed_value = field.parse_value(v)
         super().__setattr__(attrname, parsed_value)
 
+    def __getattr__(self, k):
+        # Only called if normal lookup fails, i.e. for unset fields of compact
+        # models, which have no class level defaults.
+        field = self._meta._fields.get(k)
+        if field is not None and not field.blank:
+            return field.default()
+        raise AttributeError("'%s' object has no attribute '%s'"
+                             % (self.__class__.__name__, k))
+
     def __repr__(self):
         u = getattr(self, self._meta._name_attr, self.__class__.__name__)
         return str('<%s: %s>' % (self.__class__.__name__, u))
 
     def __str__(self):
-        if six.PY2 and hasattr(self, '__unicode__'):
-            return str(self).encode('utf-8')
         return str('%s object' % self.__class__.__name__)
 
     def _from_json(self, json_data):
-        data = json.loads(json_data) 
+        data = codec.loads(json_data)
         fields = self._meta.get_fields()
         for f in fields:
             data.pop(f.attrname, f.default())
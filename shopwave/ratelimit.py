@@ -0,0 +1,355 @@
+#! -*- coding: utf-8 -*-
+"""
+Client side request rate limiting.
+
+A RateLimiter combines, per OBJECT_LIST name, a token bucket bounding the
+request rate with an optional AdaptiveConcurrency controller bounding the
+number of requests in flight. Buckets are kept in memory and shared by all
+threads of a process, or in Redis to be shared by all processes using the
+same Redis store.
+"""
+
+import collections
+import threading
+import time
+
+from shopwave.settings import (CLIENT_ID, RATE_LIMITS, RATE_LIMIT_DEFAULT,
+                               ADAPTIVE_CONCURRENCY_MIN,
+                               ADAPTIVE_CONCURRENCY_MAX,
+                               ADAPTIVE_CONCURRENCY_INITIAL,
+                               ADAPTIVE_LATENCY_TOLERANCE)
+
+# Responses telling the client to slow down.
+THROTTLE_STATUSES = frozenset((429, 503))
+
+
+class TokenBucket(object):
+    """
+    Thread safe token bucket.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens (requests) added per second.
+    capacity : float, optional
+        Maximum number of tokens, i.e. the largest burst. Defaults to rate,
+        but at least 1.
+    """
+    def __init__(self, rate, capacity=None):
+        if capacity is None:
+            capacity = max(rate, 1)
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token, going into debt if the bucket is empty.
+
+        Returns
+        -------
+        Seconds to wait before the request may be sent.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens +
+                               (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """ Block until a token is available.
+        """
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+    def __repr__(self):
+        return str('<TokenBucket: %g/s, burst %g>' % (self.rate, self.capacity))
+
+
+# Same algorithm as TokenBucket.reserve, evaluated atomically by Redis using
+# the clock of the Redis server. Lua numbers are truncated to integers when
+# returned, hence the string result.
+_REDIS_RESERVE = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - updated, 0) * rate) - 1
+redis.call('HMSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+if tokens >= 0 then
+    return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+
+class RedisTokenBucket(TokenBucket):
+    """
+    Token bucket stored in Redis, shared by every process using the same key.
+
+    Parameters
+    ----------
+    db : redis.StrictRedis
+    key : string
+    rate, capacity : see TokenBucket
+    """
+    def __init__(self, db, key, rate, capacity=None):
+        super(RedisTokenBucket, self).__init__(rate, capacity)
+        self.db = db
+        self.key = key
+        self._script = db.register_script(_REDIS_RESERVE)
+
+    def reserve(self):
+        delay = self._script(keys=[self.key],
+                             args=[repr(self.rate), repr(self.capacity)])
+        return float(delay)
+
+
+class AdaptiveConcurrency(object):
+    """
+    Limits the number of requests in flight, adjusting the limit by additive
+    increase / multiplicative decrease: the limit grows by about one per
+    round trip while latency stays within tolerance of the baseline, and is
+    halved when the server throttles (429, 503) or latency rises above it.
+
+    Works for threads and asyncio tasks alike; acquire blocks the calling
+    thread, acquire_async suspends the calling task.
+
+    Parameters
+    ----------
+    initial, minimum, maximum : int, optional
+        Initial limit and its bounds.
+    tolerance : float, optional
+        Latency is considered rising when its moving average exceeds
+        tolerance times the baseline latency, a slowly adapting minimum of
+        that average.
+    """
+    def __init__(self, initial=ADAPTIVE_CONCURRENCY_INITIAL,
+                 minimum=ADAPTIVE_CONCURRENCY_MIN,
+                 maximum=ADAPTIVE_CONCURRENCY_MAX,
+                 tolerance=ADAPTIVE_LATENCY_TOLERANCE):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self._limit = float(min(max(initial, minimum), maximum))
+        self._in_flight = 0
+        self._baseline = None
+        self._latency = None
+        self._last_decrease = time.monotonic()
+        self._waiters = collections.deque()
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def acquire(self):
+        """ Block until a request may be sent.
+        """
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return
+            event = threading.Event()
+            self._waiters.append(event.set)
+        event.wait()
+
+    async def acquire_async(self):
+        """ asyncio version of acquire.
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return
+            future = loop.create_future()
+            waiter = lambda: loop.call_soon_threadsafe(_set_result, future)
+            self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    # The slot was handed over already, pass it on.
+                    self._in_flight -= 1
+                    self._wake()
+            raise
+
+    def release(self, started, status=None):
+        """
+        Parameters
+        ----------
+        started : float
+            time.monotonic() when the request was sent.
+        status : int, optional
+            HTTP status of the response, None if the request failed.
+        """
+        now = time.monotonic()
+        latency = now - started
+        with self._lock:
+            self._in_flight -= 1
+            if status in THROTTLE_STATUSES:
+                self._decrease(started, now)
+            elif status is not None:
+                if self._baseline is None:
+                    self._baseline = self._latency = latency
+                self._latency += (latency - self._latency) * 0.1
+                if self._latency < self._baseline:
+                    self._baseline = self._latency
+                else:
+                    self._baseline += (self._latency - self._baseline) * 0.01
+                if self._latency > self._baseline * self.tolerance:
+                    self._decrease(started, now)
+                elif self._in_flight + 1 >= self.limit:
+                    # Only grow if the current limit is actually used.
+                    self._limit = min(self.maximum,
+                                      self._limit + 1.0 / self._limit)
+            self._wake()
+
+    def _decrease(self, started, now):
+        # Responses to requests sent before the last decrease reflect the old
+        # limit and must not shrink it again.
+        if started < self._last_decrease:
+            return
+        self._limit = max(self.minimum, self._limit / 2)
+        self._last_decrease = now
+
+    def _wake(self):
+        while self._waiters and self._in_flight < self.limit:
+            self._in_flight += 1
+            self._waiters.popleft()()
+
+    def __repr__(self):
+        return str('<AdaptiveConcurrency: %d/%d in flight>'
+                   % (self._in_flight, self.limit))
+
+
+def _set_result(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class RateLimiter(object):
+    """
+    Per endpoint request limits, usually shared by all managers of a
+    Shopwave or AsyncShopwave instance.
+
+    Parameters
+    ----------
+    limits : dict, optional
+        OBJECT_LIST name -> (requests per second, burst), or None for no rate
+        limit on that endpoint. Defaults to RATE_LIMITS.
+    default : (float, float) or None, optional
+        Limit of endpoints not in limits, defaults to RATE_LIMIT_DEFAULT.
+    db : redis.StrictRedis, optional
+        Keep the token buckets in Redis, to limit the rate of all processes
+        together.
+    concurrency : AdaptiveConcurrency or True, optional
+        Bound requests in flight (over all endpoints). True creates an
+        AdaptiveConcurrency with the ADAPTIVE_CONCURRENCY_* settings.
+    """
+    def __init__(self, limits=None, default=RATE_LIMIT_DEFAULT, db=None,
+                 concurrency=None):
+        if limits is None:
+            limits = RATE_LIMITS
+        self.limits = dict(limits)
+        self.default = default
+        self.db = db
+        if concurrency is True:
+            concurrency = AdaptiveConcurrency()
+        self.concurrency = concurrency
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, name):
+        """
+        Returns
+        -------
+        TokenBucket for the OBJECT_LIST name, or None if it is not limited.
+        """
+        try:
+            return self._buckets[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._buckets:
+                limit = self.limits.get(name, self.default)
+                if limit is None:
+                    bucket = None
+                elif self.db is not None:
+                    bucket = RedisTokenBucket(
+                        self.db, CLIENT_ID + ':ratelimit:' + name, *limit)
+                else:
+                    bucket = TokenBucket(*limit)
+                self._buckets[name] = bucket
+            return self._buckets[name]
+
+    def acquire(self, name):
+        """
+        Block until a request to endpoint name may be sent.
+
+        Returns
+        -------
+        float, start time to pass to release.
+        """
+        bucket = self.bucket(name)
+        if bucket is not None:
+            bucket.acquire()
+        if self.concurrency is not None:
+            self.concurrency.acquire()
+        return time.monotonic()
+
+    async def acquire_async(self, name):
+        """ asyncio version of acquire.
+        """
+        import asyncio
+        bucket = self.bucket(name)
+        if bucket is not None:
+            delay = bucket.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+        if self.concurrency is not None:
+            await self.concurrency.acquire_async()
+        return time.monotonic()
+
+    def release(self, name, started, status=None):
+        """
+        Parameters
+        ----------
+        name : string
+        started : float
+            Returned by acquire.
+        status : int, optional
+            HTTP status of the response, None if the request failed.
+        """
+        if self.concurrency is not None:
+            self.concurrency.release(started, status)
+
+
+def get_default_limiter():
+    """
+    Returns
+    -------
+    RateLimiter for the RATE_LIMITS settings, or None if none are set.
+    """
+    if RATE_LIMITS or RATE_LIMIT_DEFAULT is not None:
+        return RateLimiter()
+    return None
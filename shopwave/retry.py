@@ -0,0 +1,142 @@
+#! -*- coding: utf-8 -*-
+
+import random
+import time
+from datetime import datetime, timezone
+
+from shopwave.settings import (RETRY_MAX_ATTEMPTS, RETRY_BACKOFF,
+                               RETRY_BACKOFF_MAX, RETRY_STATUSES,
+                               REQUEST_DEADLINE)
+
+_retry_exceptions = None
+
+
+def retry_exceptions():
+    """
+    Transport errors after which a request is sent again. A function rather
+    than a constant, so importing shopwave does not import requests; except
+    clauses only evaluate it when an exception is raised.
+    """
+    global _retry_exceptions
+    if _retry_exceptions is None:
+        from requests.exceptions import ConnectionError, Timeout
+        _retry_exceptions = (ConnectionError, Timeout)
+    return _retry_exceptions
+
+# Returned by RetryState.after_response if the access token has to be
+# refreshed before the request is sent again.
+REFRESH = 'refresh'
+
+
+class RetryPolicy(object):
+    """
+    Parameters
+    ----------
+    max_attempts : int, optional
+        Maximum number of times a request is sent, not counting the replay
+        after an access token refresh.
+    backoff : float, optional
+        Base delay in seconds. The delay before retry n is drawn uniformly
+        from 0 to min(backoff_max, backoff * 2**n) ("full jitter").
+    backoff_max : float, optional
+    statuses : iterable of int, optional
+        HTTP status codes that are retried. A Retry-After header in the
+        response sets the minimum delay.
+    deadline : float or None, optional
+        Seconds after which no more attempts are started for a call. Request
+        timeouts are capped to the time left.
+    """
+    def __init__(self, max_attempts=RETRY_MAX_ATTEMPTS, backoff=RETRY_BACKOFF,
+                 backoff_max=RETRY_BACKOFF_MAX, statuses=RETRY_STATUSES,
+                 deadline=REQUEST_DEADLINE):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.statuses = frozenset(statuses)
+        self.deadline = deadline
+
+    def delay(self, attempt):
+        return random.uniform(0, min(self.backoff_max,
+                                     self.backoff * 2 ** attempt))
+
+
+class RetryState(object):
+    """
+    Retry bookkeeping for a single call, shared by the synchronous and the
+    asyncio request loops.
+    """
+    def __init__(self, policy):
+        self.policy = policy
+        self.attempt = 0
+        self.refreshed = False
+        if policy.deadline:
+            self.deadline = time.monotonic() + policy.deadline
+        else:
+            self.deadline = None
+
+    def timeout(self, timeout):
+        """ Request timeout, capped to the time left until the deadline.
+        """
+        if self.deadline is None:
+            return timeout
+        remaining = max(self.deadline - time.monotonic(), 0.001)
+        if timeout is None:
+            return remaining
+        return min(timeout, remaining)
+
+    def after_response(self, response):
+        """
+        Returns
+        -------
+        None to return the response to the caller, REFRESH to refresh the
+        access token and replay the request, or the number of seconds to wait
+        before sending the request again.
+        """
+        if response.status_code == 401 and not self.refreshed:
+            self.refreshed = True
+            return REFRESH
+        if response.status_code in self.policy.statuses:
+            return self._backoff(_retry_after(response))
+        return None
+
+    def after_error(self, error):
+        """
+        Returns
+        -------
+        Number of seconds to wait before sending the request again, or None if
+        the error should be raised.
+        """
+        return self._backoff()
+
+    def _backoff(self, minimum=None):
+        if self.attempt + 1 >= self.policy.max_attempts:
+            return None
+        delay = self.policy.delay(self.attempt)
+        if minimum is not None:
+            delay = max(delay, minimum)
+        if self.deadline is not None and \
+                time.monotonic() + delay >= self.deadline:
+            return None
+        self.attempt += 1
+        return delay
+
+
+def _retry_after(response):
+    """ Seconds in the Retry-After header of response, or None.
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    import email.utils
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        # '-0000' zones parse to naive datetimes, and mean UTC.
+        date = date.replace(tzinfo=timezone.utc)
+    return max((date - datetime.now(timezone.utc)).total_seconds(), 0)
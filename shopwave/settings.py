@@ -38,6 +38,8 @@ AVAILABLE_SCOPES = [
 # See https://docs.python.org/3/library/datetime.html#strftime-and-strptime-behavior
 DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
 DATE_FORMAT = '%Y-%m-%d'
+# Number of recently parsed datetime strings cached by ShopwaveDatetime.
+DATETIME_CACHE_SIZE = 4096
 
 OBJECT_LIST = (
     'Category',
@@ -47,7 +49,6 @@ OBJECT_LIST = (
     'Store',
     'Status',
     'Application',
-    'Category',
     'Employee',
     'Invoice',
     'Log',
@@ -58,3 +59,122 @@ OBJECT_LIST = (
     'Uploader',
     'User',
 )
+
+# HTTP connection pooling, see shopwave.transport.Transport
+HTTP_POOL_CONNECTIONS = 10
+HTTP_POOL_MAXSIZE = 10
+HTTP_POOL_BLOCK = False
+
+# Default number of concurrent requests for shopwave.utils.aio.gather
+ASYNC_CONCURRENCY = 20
+
+# Report_BasketManager.all_windowed defaults
+REPORT_WINDOW_WORKERS = 4
+
+# Report_BasketManager.sync: re-request this many seconds before the last
+# seen basket completion, to pick up late arriving baskets.
+REPORT_SYNC_OVERLAP = 300
+# Ids of baskets without completion date kept in a sync checkpoint.
+REPORT_SYNC_UNDATED_MAX = 10000
+# Used to store sync checkpoints if Redis is not available.
+CHECKPOINT_FILE = '.shopwave_checkpoints.json'
+
+# Local snapshot of API data, see shopwave.snapshot.SnapshotStore. Bytes of
+# the SQLite file read through a memory map.
+SNAPSHOT_FILE = '.shopwave_snapshot.db'
+SNAPSHOT_MMAP_SIZE = 256 * 1024 * 1024
+
+# Conversion of report baskets to Xero, see shopwave.xero.XeroConverter.
+# Xero accepts up to 50 invoices per request.
+XERO_BATCH_SIZE = 50
+XERO_CONTACT_NAME = 'Shopwave Sales'
+XERO_CURRENCY_CODE = 'GBP'
+XERO_INVOICE_TYPE = 'ACCREC'            # sales invoice
+XERO_INVOICE_STATUS = 'DRAFT'
+XERO_LINE_AMOUNT_TYPES = 'Inclusive'    # basket prices include VAT
+XERO_SALES_ACCOUNT_CODE = '200'
+# Transaction amounts (tA) are in minor currency units.
+XERO_AMOUNT_SCALE = 100
+XERO_INVOICE_NUMBER = 'SW-{bId}'
+
+# Compression of Parquet exports, see shopwave.export.ParquetWriter.
+EXPORT_PARQUET_COMPRESSION = 'snappy'
+
+# Bytes read at a time by GenericManager.iter
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# JSON decoder, see shopwave.codec. 'auto', 'orjson', 'ujson', 'simdjson' or
+# 'json' (standard library).
+JSON_BACKEND = 'auto'
+
+# Refresh the access token this many seconds before it expires.
+TOKEN_REFRESH_MARGIN = 60
+# Seconds a process may hold, or wait for, the token refresh lock.
+TOKEN_LOCK_TIMEOUT = 30
+# Seconds to wait for the token endpoint, (connect, read).
+TOKEN_REQUEST_TIMEOUT = (5, 30)
+# Where Credentials keep their tokens: 'redis' (REDIS_STORE), 'memory' or
+# 'file' (TOKEN_FILE), see shopwave.tokenstore.
+TOKEN_STORE = 'redis'
+TOKEN_FILE = '.shopwave_tokens.json'
+
+# Retries of server and connection errors, see shopwave.retry.RetryPolicy
+RETRY_MAX_ATTEMPTS = 4
+RETRY_BACKOFF = 0.5             # seconds
+RETRY_BACKOFF_MAX = 30          # seconds
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+REQUEST_DEADLINE = 120          # seconds per call, None for no deadline
+
+# Client side rate limits, see shopwave.ratelimit.RateLimiter.
+# OBJECT_LIST name -> (requests per second, burst), e.g. {'Product': (5, 10)}
+RATE_LIMITS = {}
+# Limit of endpoints not in RATE_LIMITS, None for no limit.
+RATE_LIMIT_DEFAULT = None
+# Bounds of shopwave.ratelimit.AdaptiveConcurrency
+ADAPTIVE_CONCURRENCY_INITIAL = 4
+ADAPTIVE_CONCURRENCY_MIN = 1
+ADAPTIVE_CONCURRENCY_MAX = 64
+# Latency above this multiple of the baseline latency halves the concurrency.
+ADAPTIVE_LATENCY_TOLERANCE = 2.0
+
+# GenericManager.get_many: ids per request, and the maximum length of the
+# comma separated ids header (servers commonly reject headers over 8 KB).
+GET_MANY_BATCH_SIZE = 200
+GET_MANY_MAX_HEADER_LENGTH = 4000
+GET_MANY_WORKERS = 4
+
+# Response cache, see shopwave.cache.ResponseCache. Seconds GET responses of
+# an endpoint are used without asking the API again; endpoints not listed use
+# CACHE_DEFAULT_TTL (None: not cached).
+CACHE_TTLS = {
+    'Category': 3600,
+    'Product':  900,
+    'Store':    3600,
+    'Employee': 3600,
+}
+CACHE_DEFAULT_TTL = None
+CACHE_MAX_ENTRIES = 512
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Expired responses with an ETag or Last-Modified header are kept this long
+# to be revalidated with a conditional request.
+CACHE_STALE_TTL = 24 * 3600
+# Saving objects of an endpoint also invalidates these endpoints, whose
+# responses embed them.
+CACHE_INVALIDATES = {
+    'Product':  ('Category',),
+    'Category': ('Product',),
+}
+
+# Instances with differing data kept per referenced object, and referenced
+# objects kept in all (least recently used are dropped first), see
+# shopwave.identity.IdentityMap.
+IDENTITY_MAP_VARIANTS = 4
+IDENTITY_MAP_MAX_OBJECTS = 100000
+
+# shopwave.metrics: values kept per series by MemorySink for percentiles, and
+# the histogram buckets of PrometheusSink.
+METRICS_SAMPLES = 1024
+METRICS_SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                           0.5, 1, 2.5, 5, 10, 30)
+METRICS_BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304,
+                         16777216, 67108864)
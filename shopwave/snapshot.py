@@ -0,0 +1,305 @@
+#! -*- coding: utf-8 -*-
+"""
+Local snapshot of API data in an SQLite file.
+
+Objects are stored as the JSON the API returned for them, so reading from
+the snapshot goes through the same parsing (models, compact, lazy, json or
+columnar) as a response. Report baskets are stored with their bId, store id
+(sId), completion date (c) and the ids of their products as indexed
+columns:
+
+>>> store = SnapshotStore('shopwave.db')
+>>> sw = Shopwave(credentials, snapshot=store)
+>>> sw.product.sync_to(store)
+>>> sw.report_basket.sync_to(store, from_date='2017-01-01')
+>>> sw.product.all(source='local')
+>>> sw.report_basket.all(from_date='2017-02-01', source='local', sId=3)
+
+A client created with a snapshot also writes every object it receives from
+the API through to it.
+"""
+
+import os
+import threading
+
+from shopwave.settings import SNAPSHOT_FILE, SNAPSHOT_MMAP_SIZE
+from shopwave.utils import ShopwaveDatetime
+from shopwave import codec
+
+# Endpoint kept in the indexed baskets table, and its response key.
+BASKET_ENDPOINT = 'Report_Basket'
+BASKET_KEY = 'baskets'
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS objects (
+        endpoint TEXT NOT NULL,
+        id TEXT NOT NULL,
+        key TEXT NOT NULL,
+        data TEXT NOT NULL,
+        PRIMARY KEY (endpoint, id)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS baskets (
+        bId INTEGER PRIMARY KEY,
+        sId INTEGER,
+        c TEXT,
+        data TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS baskets_c ON baskets (c)",
+    "CREATE INDEX IF NOT EXISTS baskets_sId ON baskets (sId, c)",
+    """CREATE TABLE IF NOT EXISTS basket_products (
+        productId INTEGER NOT NULL,
+        bId INTEGER NOT NULL,
+        PRIMARY KEY (productId, bId)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS basket_products_bId ON basket_products (bId)",
+)
+
+# Maximum number of bound parameters per statement in older SQLite versions.
+_MAX_VARIABLES = 999
+
+
+class SnapshotStore(object):
+    """
+    Parameters
+    ----------
+    path : string, optional
+        SQLite database file, created if it does not exist. ':memory:' keeps
+        the snapshot in memory, for one thread only.
+    mmap_size : int, optional
+        Bytes of the file SQLite reads through a memory map.
+
+    Every thread uses its own connection. The database is in WAL mode, so
+    reads in other threads or processes are not blocked by a sync.
+    """
+    def __init__(self, path=SNAPSHOT_FILE, mmap_size=SNAPSHOT_MMAP_SIZE):
+        self.path = path
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self._connect()
+
+    @property
+    def db(self):
+        """ sqlite3 connection of the calling thread. """
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._connect()
+        return db
+
+    def _connect(self):
+        # Imported on first use, like the other optional backends.
+        import sqlite3
+        db = sqlite3.connect(self.path, timeout=30)
+        if self.path != ':memory:':
+            db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute('PRAGMA mmap_size=%d' % int(self.mmap_size))
+        with db:
+            for statement in SCHEMA:
+                db.execute(statement)
+        self._local.db = db
+        return db
+
+    def close(self):
+        """ Close the connection of the calling thread. """
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    # Writing
+
+    def upsert(self, endpoint, data):
+        """
+        Insert or replace objects.
+
+        Parameters
+        ----------
+        endpoint : string
+            OBJECT_LIST name, e.g. 'Product'.
+        data : dict
+            Response data: response key -> {id: object}.
+
+        Returns
+        -------
+        Number of objects written.
+        """
+        with self.db as db:
+            return self._upsert(db, endpoint, data)
+
+    def replace(self, endpoint, data):
+        """
+        Like upsert, but also delete the objects of endpoint not in data,
+        i.e. make the snapshot of endpoint a copy of data. Not supported
+        for report baskets, which are synced incrementally.
+        """
+        if endpoint == BASKET_ENDPOINT:
+            raise ValueError('Baskets can only be upserted.')
+        ids = [str(item_id) for items in data.values() for item_id in items]
+        with self.db as db:
+            db.execute('CREATE TEMP TABLE IF NOT EXISTS keep '
+                       '(id TEXT PRIMARY KEY)')
+            db.execute('DELETE FROM keep')
+            db.executemany('INSERT OR IGNORE INTO keep VALUES (?)',
+                           [(i,) for i in ids])
+            db.execute('DELETE FROM objects WHERE endpoint = ? AND id NOT IN '
+                       '(SELECT id FROM keep)', (endpoint,))
+            db.execute('DELETE FROM keep')
+            return self._upsert(db, endpoint, data)
+
+    def _upsert(self, db, endpoint, data):
+        if endpoint == BASKET_ENDPOINT:
+            return self._upsert_baskets(db, data)
+        rows = [(endpoint, str(item_id), key, codec.dumps(item))
+                for key, items in data.items()
+                for item_id, item in items.items()]
+        db.executemany('INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?)',
+                       rows)
+        return len(rows)
+
+    @staticmethod
+    def _upsert_baskets(db, data):
+        baskets = []
+        lines = []
+        for items in data.values():
+            for item_id, basket in items.items():
+                bId = int(basket.get('bId', item_id))
+                c = basket.get('c')
+                if c:
+                    c = ShopwaveDatetime(c).to_str()
+                baskets.append((bId, basket.get('sId'), c,
+                                codec.dumps(basket)))
+                products = basket.get('p') or {}
+                for productId in {line['id'] for line in products.values()
+                                  if line.get('id') is not None}:
+                    lines.append((int(productId), bId))
+        db.executemany('DELETE FROM basket_products WHERE bId = ?',
+                       [(b[0],) for b in baskets])
+        db.executemany('INSERT OR REPLACE INTO baskets VALUES (?, ?, ?, ?)',
+                       baskets)
+        db.executemany('INSERT OR IGNORE INTO basket_products VALUES (?, ?)',
+                       lines)
+        return len(baskets)
+
+    def delete(self, endpoint=None):
+        """ Remove the objects of endpoint, or everything. """
+        with self.db as db:
+            if endpoint is None or endpoint == BASKET_ENDPOINT:
+                db.execute('DELETE FROM baskets')
+                db.execute('DELETE FROM basket_products')
+            if endpoint is None:
+                db.execute('DELETE FROM objects')
+            elif endpoint != BASKET_ENDPOINT:
+                db.execute('DELETE FROM objects WHERE endpoint = ?',
+                           (endpoint,))
+
+    # Reading
+
+    def load(self, endpoint, ids=None):
+        """
+        Objects of endpoint as response data (response key -> {id: object}),
+        all of them or those with the given ids.
+
+        Parameters
+        ----------
+        endpoint : string
+        ids : iterable of ids, optional
+        """
+        if endpoint == BASKET_ENDPOINT:
+            return self.baskets(bIds=ids)
+        if ids is None:
+            rows = self.db.execute(
+                'SELECT key, id, data FROM objects WHERE endpoint = ? '
+                'ORDER BY key, id', (endpoint,))
+            return _response_data(rows)
+        rows = []
+        for chunk in _chunks([str(i) for i in ids]):
+            rows.extend(self.db.execute(
+                'SELECT key, id, data FROM objects WHERE endpoint = ? AND '
+                'id IN (%s)' % ','.join('?' * len(chunk)),
+                [endpoint] + chunk))
+        return _response_data(rows)
+
+    def baskets(self, from_date=None, to_date=None, sId=None,
+                productId=None, bIds=None):
+        """
+        Baskets as response data ({'baskets': {bId: basket}}), ordered by
+        completion date.
+
+        Parameters
+        ----------
+        from_date, to_date : ShopwaveDatetime or string, optional
+            Baskets completed in [from_date, to_date).
+        sId : int, optional
+            Only baskets of this store.
+        productId : int, optional
+            Only baskets with a line of this product.
+        bIds : iterable of ints, optional
+            Only these baskets.
+        """
+        where = []
+        params = []
+        if from_date is not None:
+            where.append('c >= ?')
+            params.append(ShopwaveDatetime(from_date).to_str())
+        if to_date is not None:
+            where.append('c < ?')
+            params.append(ShopwaveDatetime(to_date).to_str())
+        if sId is not None:
+            where.append('sId = ?')
+            params.append(int(sId))
+        if productId is not None:
+            where.append('bId IN (SELECT bId FROM basket_products '
+                         'WHERE productId = ?)')
+            params.append(int(productId))
+        query = 'SELECT ?, bId, data FROM baskets'
+        if bIds is None:
+            if where:
+                query += ' WHERE ' + ' AND '.join(where)
+            rows = self.db.execute(query + ' ORDER BY c, bId',
+                                   [BASKET_KEY] + params)
+            return _response_data(rows, BASKET_KEY)
+        rows = []
+        for chunk in _chunks([int(i) for i in bIds]):
+            clauses = where + ['bId IN (%s)' % ','.join('?' * len(chunk))]
+            rows.extend(self.db.execute(
+                query + ' WHERE ' + ' AND '.join(clauses) + ' ORDER BY c, bId',
+                [BASKET_KEY] + params + chunk))
+        return _response_data(rows, BASKET_KEY)
+
+    def last_completed(self):
+        """ Latest basket completion date in the snapshot, or None. """
+        c = self.db.execute('SELECT MAX(c) FROM baskets').fetchone()[0]
+        return ShopwaveDatetime(c) if c else None
+
+    def count(self, endpoint):
+        if endpoint == BASKET_ENDPOINT:
+            query, params = 'SELECT COUNT(*) FROM baskets', ()
+        else:
+            query = 'SELECT COUNT(*) FROM objects WHERE endpoint = ?'
+            params = (endpoint,)
+        return self.db.execute(query, params).fetchone()[0]
+
+    def __repr__(self):
+        return str('<SnapshotStore: %s>' % os.path.basename(self.path))
+
+
+def _chunks(values, size=_MAX_VARIABLES - 8):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _response_data(rows, key=None):
+    """
+    Response data from (key, id, JSON) rows. The stored objects are joined
+    into one JSON document and decoded at once, which is much faster than
+    decoding them one by one.
+    """
+    parts = {}
+    for row_key, item_id, data in rows:
+        parts.setdefault(row_key, []).append(
+            '%s:%s' % (codec.dumps(str(item_id)), data))
+    if not parts:
+        return {key: {}} if key is not None else {}
+    return codec.loads('{%s}' % ','.join(
+        '%s:{%s}' % (codec.dumps(k), ','.join(items))
+        for k, items in parts.items()))
@@ -0,0 +1,327 @@
+#! -*- coding: utf-8 -*-
+"""
+Storage of OAuth tokens for Credentials.
+
+A TokenStore holds the access token (with its expiry), token type, refresh
+token and authorization code of CLIENT_ID, and provides the lock that keeps
+concurrent refreshes from requesting more than one new token. Reading or
+writing the tokens is a single round trip in every backend.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+from shopwave.settings import (CLIENT_ID, REDIS_STORE, TOKEN_STORE,
+                               TOKEN_FILE)
+
+# Fields returned by TokenStore.load
+TOKEN_KEYS = ('access_token', 'token_type', 'refresh_token')
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_redis(**connection_kwargs):
+    """
+    redis.StrictRedis using a connection pool shared by all callers in the
+    process with the same connection arguments. Defaults to REDIS_STORE.
+    """
+    import redis
+    kwargs = dict(REDIS_STORE, **connection_kwargs)
+    key = tuple(sorted(kwargs.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = redis.ConnectionPool(**kwargs)
+    return redis.StrictRedis(connection_pool=pool)
+
+
+class TokenStore(object):
+    """
+    Base class of token stores. Subclasses implement load, save, get_auth_code,
+    set_auth_code, delete and lock.
+    """
+    def load(self):
+        """
+        Returns
+        -------
+        dict with the TOKEN_KEYS (None if not stored) and 'expires_in', the
+        seconds the access token remains valid, or None if unknown. Expired
+        access tokens are not returned.
+        """
+        raise NotImplementedError
+
+    def save(self, access_token=None, token_type=None, expires_in=None,
+             refresh_token=None):
+        """
+        Store the access token and token type (both only if expires_in is
+        given, as they expire with it) and the refresh token, if not None.
+        """
+        raise NotImplementedError
+
+    def get_auth_code(self):
+        raise NotImplementedError
+
+    def set_auth_code(self, authorization_code):
+        raise NotImplementedError
+
+    def delete(self):
+        """ Remove access token, token type and refresh token.
+        """
+        raise NotImplementedError
+
+    def lock(self, timeout):
+        """
+        Context manager holding the token refresh lock, waiting at most
+        *timeout* seconds for it. Yields whether the lock was acquired;
+        callers proceed either way.
+        """
+        raise NotImplementedError
+
+
+class RedisTokenStore(TokenStore):
+    """
+    Tokens in Redis, shared by all processes using the same Redis instance.
+    Access token and token type are stored with the token's expiry time.
+    """
+    def __init__(self, db=None, prefix=None):
+        """
+        Parameters
+        ----------
+        db : redis.StrictRedis, optional
+            Defaults to a connection from the process wide pool for
+            REDIS_STORE, see get_redis.
+        prefix : string, optional
+            Key prefix, defaults to '<CLIENT_ID>:'.
+        """
+        self.db = db if db is not None else get_redis()
+        if prefix is None:
+            prefix = CLIENT_ID + ':'
+        self.prefix = prefix
+
+    def _key(self, name):
+        return self.prefix + name
+
+    def load(self):
+        pipe = self.db.pipeline(transaction=False)
+        pipe.mget([self._key(k) for k in TOKEN_KEYS])
+        pipe.ttl(self._key('access_token'))
+        values, ttl = pipe.execute()
+        tokens = {k: v.decode() if v else None
+                  for k, v in zip(TOKEN_KEYS, values)}
+        tokens['expires_in'] = None
+        if tokens['access_token'] and ttl is not None and ttl > 0:
+            tokens['expires_in'] = ttl
+        return tokens
+
+    def save(self, access_token=None, token_type=None, expires_in=None,
+             refresh_token=None):
+        pipe = self.db.pipeline(transaction=False)
+        if access_token and token_type and expires_in:
+            pipe.setex(self._key('access_token'), expires_in, access_token)
+            pipe.setex(self._key('token_type'), expires_in, token_type)
+        if refresh_token:
+            pipe.set(self._key('refresh_token'), refresh_token)
+        pipe.execute()
+
+    def get_auth_code(self):
+        value = self.db.get(self._key('auth_code'))
+        return value.decode() if value else None
+
+    def set_auth_code(self, authorization_code):
+        self.db.set(self._key('auth_code'), authorization_code)
+
+    def delete(self):
+        self.db.delete(*[self._key(k) for k in TOKEN_KEYS])
+
+    @contextlib.contextmanager
+    def lock(self, timeout):
+        from redis.exceptions import LockError
+        lock = self.db.lock(self._key('token_lock'), timeout=timeout,
+                            blocking_timeout=timeout)
+        acquired = lock.acquire()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    lock.release()
+                except LockError:
+                    # Lock timed out and may be held by another process.
+                    pass
+
+
+class MemoryTokenStore(TokenStore):
+    """
+    Tokens in process memory, e.g. for scripts and tests without Redis.
+    Share one instance between Credentials to share the tokens.
+    """
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            return _unexpired(self._data)
+
+    def save(self, access_token=None, token_type=None, expires_in=None,
+             refresh_token=None):
+        with self._lock:
+            _update(self._data, access_token, token_type, expires_in,
+                    refresh_token)
+
+    def get_auth_code(self):
+        with self._lock:
+            return self._data.get('auth_code')
+
+    def set_auth_code(self, authorization_code):
+        with self._lock:
+            self._data['auth_code'] = authorization_code
+
+    def delete(self):
+        with self._lock:
+            _delete(self._data)
+
+    @contextlib.contextmanager
+    def lock(self, timeout):
+        # Refreshes within the process are serialised by Credentials.
+        yield True
+
+
+class FileTokenStore(TokenStore):
+    """
+    Tokens in a JSON file, shared by the processes of one host. The file is
+    written atomically; on POSIX systems refreshes are serialised between
+    processes by an flock on '<path>.lock'.
+    """
+    def __init__(self, path=TOKEN_FILE):
+        """
+        Parameters
+        ----------
+        path : string, optional
+            JSON file holding the tokens.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, data):
+        # Per process, as several processes may write the file.
+        tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+        # Readable by the owner only, the file holds the tokens.
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        with self._lock:
+            return _unexpired(self._read())
+
+    def save(self, access_token=None, token_type=None, expires_in=None,
+             refresh_token=None):
+        with self._lock:
+            data = self._read()
+            _update(data, access_token, token_type, expires_in,
+                    refresh_token)
+            self._write(data)
+
+    def get_auth_code(self):
+        with self._lock:
+            return self._read().get('auth_code')
+
+    def set_auth_code(self, authorization_code):
+        with self._lock:
+            data = self._read()
+            data['auth_code'] = authorization_code
+            self._write(data)
+
+    def delete(self):
+        with self._lock:
+            data = self._read()
+            _delete(data)
+            self._write(data)
+
+    @contextlib.contextmanager
+    def lock(self, timeout):
+        try:
+            import fcntl
+        except ImportError:
+            yield True
+            return
+        with open(self.path + '.lock', 'a') as f:
+            acquired = _flock(fcntl, f, timeout)
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _update(data, access_token, token_type, expires_in, refresh_token):
+    """ TokenStore.save for the dict of MemoryTokenStore and FileTokenStore.
+    """
+    if access_token and token_type and expires_in:
+        data['access_token'] = access_token
+        data['token_type'] = token_type
+        data['expires_at'] = time.time() + int(expires_in)
+    if refresh_token:
+        data['refresh_token'] = refresh_token
+
+
+def _delete(data):
+    for k in TOKEN_KEYS + ('expires_at',):
+        data.pop(k, None)
+
+
+def _unexpired(data):
+    """ TokenStore.load for the dict of MemoryTokenStore and FileTokenStore.
+    """
+    tokens = {k: data.get(k) for k in TOKEN_KEYS}
+    tokens['expires_in'] = None
+    expires_at = data.get('expires_at')
+    if expires_at is not None:
+        expires_in = int(expires_at - time.time())
+        if expires_in > 0:
+            tokens['expires_in'] = expires_in
+        else:
+            tokens['access_token'] = tokens['token_type'] = None
+    return tokens
+
+
+def _flock(fcntl, f, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+
+def get_default_store(name=TOKEN_STORE):
+    """
+    Parameters
+    ----------
+    name : {'redis', 'memory', 'file'}, optional
+        Defaults to the TOKEN_STORE setting.
+    """
+    if name == 'redis':
+        return RedisTokenStore()
+    elif name == 'memory':
+        return MemoryTokenStore()
+    elif name == 'file':
+        return FileTokenStore()
+    raise ValueError("Unknown token store %r, expected 'redis', 'memory' "
+                     "or 'file'." % (name,))
@@ -0,0 +1,271 @@
+#! -*- coding: utf-8 -*-
+
+import collections
+import threading
+import time
+from datetime import timedelta
+
+from shopwave.settings import (HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE,
+                               HTTP_POOL_BLOCK, USER_AGENT)
+
+from shopwave import codec
+
+
+DEFAULT_HEADERS = {
+    'User-Agent': USER_AGENT,
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+
+# Timings (seconds) and size of a response, set as response.transfer.
+# connect is the time spent opening connections for the request (0 for a
+# reused connection, None if unknown), ttfb the time from sending the request
+# to receiving the headers, download the time reading the body (None while a
+# streamed body has not been read). size is None if unknown.
+Transfer = collections.namedtuple('Transfer', 'connect ttfb download size')
+
+# Seconds spent in connect() by the current thread since the last request.
+_connect_time = threading.local()
+
+
+def _timed_pool_classes():
+    """
+    urllib3 connection pool classes whose connections add the time spent in
+    connect() (DNS, TCP and TLS) to _connect_time.
+    """
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    def timed(Connection):
+        class TimedConnection(Connection):
+            def connect(self):
+                start = time.perf_counter()
+                try:
+                    super(TimedConnection, self).connect()
+                finally:
+                    elapsed = time.perf_counter() - start
+                    previous = getattr(_connect_time, 'value', 0.0)
+                    _connect_time.value = previous + elapsed
+        return TimedConnection
+
+    return {
+        'http': type('TimedHTTPConnectionPool', (HTTPConnectionPool,),
+                     {'ConnectionCls': timed(HTTPConnection)}),
+        'https': type('TimedHTTPSConnectionPool', (HTTPSConnectionPool,),
+                      {'ConnectionCls': timed(HTTPSConnection)}),
+    }
+
+
+class TransportStats(object):
+    """
+    Counters for requests sent through a Transport. Shared between threads, so
+    all updates go through a lock.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.total_time = 0.0
+            self.server_time = 0.0
+            self.bytes_received = 0
+
+    def record(self, total_time, server_time, size):
+        with self._lock:
+            self.requests += 1
+            self.total_time += total_time
+            self.server_time += server_time
+            self.bytes_received += size
+
+    def as_dict(self):
+        with self._lock:
+            n = self.requests
+            return {
+                'requests': n,
+                'total_time': self.total_time,
+                'server_time': self.server_time,
+                'bytes_received': self.bytes_received,
+                'mean_time': self.total_time / n if n else 0.0,
+                # Time spent in the client per request, i.e. everything that
+                # is not waiting for the response headers.
+                'mean_overhead': (self.total_time - self.server_time) / n
+                                 if n else 0.0,
+            }
+
+
+class Transport(object):
+    """
+    Pooled keep-alive HTTP transport shared by all managers of a Shopwave
+    client.
+
+    Parameters
+    ----------
+    pool_connections : int, optional
+        Number of per-host connection pools to cache.
+    pool_maxsize : int, optional
+        Maximum number of connections kept alive per host. Should be at least
+        the number of threads issuing requests concurrently.
+    pool_block : bool, optional
+        If True, block when all connections of a pool are in use instead of
+        opening (and discarding) extra connections.
+
+    The requests session is created on first use, so constructing a client
+    does not pay for importing requests.
+    """
+    def __init__(self, pool_connections=HTTP_POOL_CONNECTIONS,
+                 pool_maxsize=HTTP_POOL_MAXSIZE, pool_block=HTTP_POOL_BLOCK):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self._session = None
+        self._lock = threading.Lock()
+        self.stats = TransportStats()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              pool_block=self.pool_block)
+        adapter.poolmanager.pool_classes_by_scheme = _timed_pool_classes()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update(DEFAULT_HEADERS)
+        return session
+
+    def request(self, method, uri, **kwargs):
+        _connect_time.value = 0.0
+        start = time.perf_counter()
+        response = self.session.request(method.upper(), uri, **kwargs)
+        total_time = time.perf_counter() - start
+        # elapsed: until the headers were received, including connecting.
+        elapsed = response.elapsed.total_seconds()
+        connect = _connect_time.value
+        if kwargs.get('stream'):
+            # Body not read yet, count the announced size.
+            size = int(response.headers.get('content-length', 0))
+            download = None
+        else:
+            size = len(response.content)
+            download = max(total_time - elapsed, 0.0)
+        response.transfer = Transfer(connect, max(elapsed - connect, 0.0),
+                                     download, size)
+        self.stats.record(total_time, elapsed, size)
+        return response
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class BufferedResponse(object):
+    """
+    Fully read HTTP response exposing the parts of the requests.Response
+    interface used by managers and ShopwaveException.
+    """
+    def __init__(self, status_code, headers, content, encoding=None,
+                 elapsed=0.0):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding or 'utf-8'
+        self.elapsed = timedelta(seconds=elapsed)
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+    def json(self):
+        return codec.loads(self.content)
+
+
+class AsyncTransport(object):
+    """
+    asyncio counterpart of Transport, backed by an aiohttp session with a
+    keep-alive connection pool. The session is created on first use, as it
+    has to be bound to the running event loop.
+
+    Parameters
+    ----------
+    pool_connections : int, optional
+        Total number of connections over all hosts.
+    pool_maxsize : int, optional
+        Maximum number of connections per host.
+    """
+    def __init__(self, pool_connections=HTTP_POOL_CONNECTIONS,
+                 pool_maxsize=HTTP_POOL_MAXSIZE):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.session = None
+        self.stats = TransportStats()
+
+    def _get_session(self):
+        if self.session is None:
+            import aiohttp
+            connector = aiohttp.TCPConnector(
+                limit=max(self.pool_connections, self.pool_maxsize),
+                limit_per_host=self.pool_maxsize)
+            self.session = aiohttp.ClientSession(connector=connector,
+                                                 headers=DEFAULT_HEADERS)
+        return self.session
+
+    async def request(self, method, uri, data=None, headers=None, params=None,
+                      timeout=None):
+        """
+        Raises requests' ConnectionError and Timeout for aiohttp connection
+        errors and timeouts, so both transports can be retried alike.
+        """
+        import asyncio
+        import aiohttp
+        from requests.exceptions import ConnectionError, Timeout
+        session = self._get_session()
+        if timeout is not None:
+            timeout = aiohttp.ClientTimeout(total=timeout)
+        start = time.perf_counter()
+        try:
+            async with session.request(method.upper(), uri, data=data,
+                                       headers=headers, params=params or None,
+                                       timeout=timeout) as resp:
+                server_time = time.perf_counter() - start
+                content = await resp.read()
+                response = BufferedResponse(resp.status, resp.headers, content,
+                                            encoding=resp.charset,
+                                            elapsed=server_time)
+        except asyncio.TimeoutError as e:
+            raise Timeout(e)
+        except aiohttp.ClientConnectionError as e:
+            raise ConnectionError(e)
+        total_time = time.perf_counter() - start
+        response.transfer = Transfer(None, server_time,
+                                     total_time - server_time, len(content))
+        self.stats.record(total_time, server_time, len(content))
+        return response
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
@@ -1,5 +1,7 @@
 
 
-from .datetime import ShopwaveDatetime, ONE_DAY, ONE_MINUTE
+from .datetime import (ShopwaveDatetime, ONE_DAY, ONE_HOUR, ONE_MINUTE,
+                       date_windows, parse_datetime)
+from .aio import gather
 #from shopwave import manager
 
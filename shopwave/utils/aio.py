@@ -0,0 +1,28 @@
+#! -*- coding: utf-8 -*-
+
+from shopwave.settings import ASYNC_CONCURRENCY
+
+
+async def gather(*aws, limit=ASYNC_CONCURRENCY, return_exceptions=False):
+    """
+    Like asyncio.gather, but runs at most *limit* of the awaitables at once.
+    Results are returned in the order of *aws*.
+
+    Parameters
+    ----------
+    aws : awaitables
+        e.g. coroutines returned by async manager methods.
+    limit : int, optional
+        Maximum number of awaitables running concurrently.
+    return_exceptions : bool, optional
+        See asyncio.gather.
+    """
+    import asyncio
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws),
+                                return_exceptions=return_exceptions)
@@ -1,30 +1,77 @@
 #! -*- coding: utf-8 -*-
 
+import functools
+import re
 from datetime import datetime, timedelta
-from settings import DATE_FORMAT, DATETIME_FORMAT
+from shopwave.settings import DATE_FORMAT, DATETIME_FORMAT, DATETIME_CACHE_SIZE
 
 ONE_DAY = timedelta(days=1)
+ONE_HOUR = timedelta(hours=1)
 ONE_MINUTE = timedelta(minutes=1)
 
+# 'YYYY-MM-DD?HH:MM:SS' after normalize_datetime_string, parsed by
+# datetime.fromisoformat instead of strptime. A space separator takes this
+# fast path only if DATETIME_FORMAT is the default; otherwise such strings
+# go through strptime with DATETIME_FORMAT.
+if DATETIME_FORMAT == '%Y-%m-%d %H:%M:%S':
+    FIXED_LAYOUT = re.compile(r'\d{4}-\d\d-\d\d[T ]\d\d:\d\d:\d\d\Z', re.ASCII)
+else:
+    FIXED_LAYOUT = re.compile(r'\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\Z', re.ASCII)
+
+
+def normalize_datetime_string(d):
+    """ Strip d, complete dates with midnight and cut off fractions of
+    seconds and time zones.
+    """
+    d = d.strip()
+    if len(d) == 10: 
+        d += ' 00:00:00'
+    elif len(d) > 19:
+        d = d[:19]
+    return d
+
+
+def _parse_datetime_string(d):
+    """
+    Returns
+    -------
+    (year, month, day, hour, minute, second)
+    """
+    d = normalize_datetime_string(d)
+    if FIXED_LAYOUT.match(d):
+        try:
+            d = datetime.fromisoformat(d)
+            return (d.year, d.month, d.day, d.hour, d.minute, d.second)
+        except ValueError:
+            # Out of range, let strptime raise its error.
+            pass
+    try:
+        d = datetime.strptime(d,  '%Y-%m-%dT%H:%M:%S')
+    except ValueError:
+        d = datetime.strptime(d, DATETIME_FORMAT)
+    return (d.year, d.month, d.day, d.hour, d.minute, d.second)
+
+# API responses repeat timestamps (e.g. the completion time of all lines of
+# a basket), so recently parsed strings are cached.
+_parse_cached = functools.lru_cache(maxsize=DATETIME_CACHE_SIZE)(
+    _parse_datetime_string)
+
+
 class ShopwaveDatetime(datetime):
-    def __new__(cls, d=None):
+    def __new__(cls, d=None, *args):
         """
         d : string or datetime.datetime instance
         """
+        if args:
+            # Called as datetime(year, month, day, ...), e.g. by datetime
+            # arithmetic on instances of this class.
+            return datetime.__new__(cls, d, *args)
         if d is None:
             d = datetime.now()
+        if isinstance(d, str):
+            return datetime.__new__(cls, *_parse_cached(d))
         if not (hasattr(d,'year') and hasattr(d,'month') and hasattr(d,'day')):
-            d = d.strip()
-            if len(d) == 10: 
-                d += ' 00:00:00'
-            elif len(d) > 19:
-                d = d[:19]
-            try:
-                d = datetime.strptime(d,  '%Y-%m-%dT%H:%M:%S')
-            except ValueError:
-                d = datetime.strptime(d, DATETIME_FORMAT)
-            except ValueError as e:
-                raise e
+            return datetime.__new__(cls, *_parse_datetime_string(d))
 
         day = d.day
         month = d.month
@@ -46,6 +93,41 @@ class ShopwaveDatetime(datetime):
     def __str__(self):
         return self.to_str()
 
+# Instances are immutable, so DateTimeField values parsed from equal strings
+# share one instance, skipping ShopwaveDatetime.__new__ for repeated strings.
+_datetime_cached = functools.lru_cache(maxsize=DATETIME_CACHE_SIZE)(
+    ShopwaveDatetime)
+
+
+def parse_datetime(d):
+    """ ShopwaveDatetime(d), returning the same instance for recently parsed
+    strings.
+    """
+    if d.__class__ is str:
+        return _datetime_cached(d)
+    return ShopwaveDatetime(d)
+
+
+def date_windows(from_date, to_date, window):
+    """
+    Split the range from_date - to_date into consecutive (start, end) pairs
+    of at most *window* length. The last window ends at to_date.
+
+    Parameters
+    ----------
+    from_date, to_date : ShopwaveDatetime
+    window : datetime.timedelta
+    """
+    if window <= timedelta(0):
+        raise ValueError('window must be a positive timedelta.')
+    windows = []
+    start = from_date
+    while start < to_date:
+        end = min(start + window, to_date)
+        windows.append((start, end))
+        start = end
+    return windows
+
             
 
 
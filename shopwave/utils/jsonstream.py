@@ -0,0 +1,108 @@
+#! -*- coding: utf-8 -*-
+
+import codecs
+import json
+import re
+
+from shopwave import codec
+
+_STRUCTURE = re.compile(r'[{}\[\]"]')
+_STRING_END = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)
+
+
+class ObjectStream(object):
+    """
+    Incremental parser for API responses of the form
+
+        {"api": {...}, "baskets": {"123": {...}, "124": {...}}}
+
+    Text is fed in arbitrary chunks; every member of a top level object (or
+    element of a top level array) is decoded as soon as it is complete. Only
+    the member currently being received is kept in memory.
+
+    Parameters
+    ----------
+    skip : iterable of strings, optional
+        Top level keys whose members are not returned.
+    """
+    def __init__(self, skip=('api',)):
+        self.skip = set(skip)
+        self._buffer = ''
+        self._pos = 0
+        self._depth = 0
+        # Last string seen at depth 1 and 2, i.e. the key of the next object.
+        self._keys = {1: None, 2: None}
+        self._top_key = None
+        self._top_is_array = False
+        self._start = None
+
+    def feed(self, text):
+        """
+        Returns
+        -------
+        list of (top level key, member key, decoded member value) completed
+        by text. Member key is None for elements of top level arrays.
+        """
+        self._buffer += text
+        buf = self._buffer
+        pos = self._pos
+        result = []
+        while True:
+            match = _STRUCTURE.search(buf, pos)
+            if match is None:
+                pos = len(buf)
+                break
+            pos = match.start()
+            char = buf[pos]
+            if char == '"':
+                end = _STRING_END.match(buf, pos + 1)
+                if end is None:
+                    # String continues in the next chunk.
+                    break
+                if self._depth in self._keys:
+                    self._keys[self._depth] = json.loads(buf[pos:end.end()])
+                pos = end.end()
+                continue
+
+            if char in '{[':
+                if self._depth == 1:
+                    self._top_key = self._keys[1]
+                    self._top_is_array = char == '['
+                elif self._depth == 2 and self._top_key not in self.skip:
+                    self._start = pos
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 2 and self._start is not None:
+                    value = codec.loads(buf[self._start:pos + 1])
+                    if self._top_is_array:  key = None
+                    else:                   key = self._keys[2]
+                    result.append((self._top_key, key, value))
+                    self._start = None
+            pos += 1
+
+        # Drop everything that is not needed any more.
+        keep = self._start if self._start is not None else pos
+        self._buffer = buf[keep:]
+        self._pos = pos - keep
+        if self._start is not None:
+            self._start = 0
+        return result
+
+
+def iter_objects(chunks, encoding='utf-8', skip=('api',)):
+    """
+    Decode members of the top level objects of a JSON document received as
+    chunks of bytes, see ObjectStream.
+
+    Yields
+    ------
+    (top level key, member key, decoded member value)
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    stream = ObjectStream(skip=skip)
+    for chunk in chunks:
+        for item in stream.feed(decoder.decode(chunk)):
+            yield item
+    for item in stream.feed(decoder.decode(b'', final=True)):
+        yield item
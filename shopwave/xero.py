@@ -0,0 +1,320 @@
+#! -*- coding: utf-8 -*-
+"""
+Conversion of report baskets to Xero Invoices, Items and Linked Transactions,
+in batches ready for bulk submission.
+
+Every basket becomes one invoice (see the mapping in the README): the amount
+of its transactions (tA) is the invoice Total and AmountDue, the completion
+date (c) its Date and DueDate, and every product line a line item. The
+products sold become Xero Items, each emitted once:
+
+>>> converter = XeroConverter()
+>>> baskets = sw.report_basket.iter(from_date=day, return_format='json')
+>>> for batch in converter.convert(baskets):
+...     xero.post(batch.endpoint, batch.to_json())
+
+A batch of Items always comes before the first batch of Invoices using them.
+Baskets are converted from the dicts returned with return_format='json'
+(by all, all_windowed, iter or from a snapshot), which skips building
+models and keeps the product id of every line: BasketReport lines carry the
+id of the line instead.
+"""
+
+import collections
+import collections.abc
+import os
+
+from shopwave.settings import (XERO_BATCH_SIZE, XERO_CONTACT_NAME,
+                               XERO_CURRENCY_CODE, XERO_INVOICE_TYPE,
+                               XERO_INVOICE_STATUS, XERO_LINE_AMOUNT_TYPES,
+                               XERO_SALES_ACCOUNT_CODE, XERO_AMOUNT_SCALE,
+                               XERO_INVOICE_NUMBER)
+from shopwave.utils import ShopwaveDatetime
+from shopwave import codec
+
+# Maximum lengths of Xero Item fields
+ITEM_CODE_LENGTH = 30
+ITEM_NAME_LENGTH = 50
+
+
+class XeroBatch(collections.namedtuple('XeroBatch', 'endpoint payload')):
+    """
+    Attributes
+    ----------
+    endpoint : string
+        Xero endpoint, 'Items', 'Invoices' or 'LinkedTransactions'.
+    payload : dict
+        Request body, e.g. {'Invoices': [...]}.
+    """
+    __slots__ = ()
+
+    def __len__(self):
+        return len(self.payload[self.endpoint])
+
+    def to_json(self):
+        return codec.dumps(self.payload)
+
+
+def iter_baskets(result):
+    """
+    Baskets of report_basket output with return_format='json': the dict
+    returned by all(), the bId -> basket dict of all_windowed(), or an
+    iterable of baskets such as iter().
+    """
+    if isinstance(result, collections.abc.Mapping):
+        if 'baskets' in result:
+            result = result['baskets']
+        if isinstance(result, collections.abc.Mapping):
+            result = result.values()
+    return iter(result)
+
+
+def _amount(value):
+    return round(float(value), 2)
+
+
+class XeroConverter(object):
+    """
+    Parameters
+    ----------
+    batch_size : int, optional
+        Maximum number of objects per batch.
+    contact : dict, optional
+        Xero Contact of all invoices, defaults to {'Name': XERO_CONTACT_NAME}.
+    currency_code, invoice_type, status, line_amount_types, account_code :
+    optional
+        Invoice fields, default to the XERO_* settings.
+    known_items : iterable of item codes, optional
+        Items that exist in Xero already and are not emitted.
+
+    Attributes
+    ----------
+    items : set
+        Codes of the items emitted (or known) so far. Kept across convert
+        calls, so items are emitted once per converter.
+    """
+    def __init__(self, batch_size=XERO_BATCH_SIZE, contact=None,
+                 currency_code=XERO_CURRENCY_CODE,
+                 invoice_type=XERO_INVOICE_TYPE, status=XERO_INVOICE_STATUS,
+                 line_amount_types=XERO_LINE_AMOUNT_TYPES,
+                 account_code=XERO_SALES_ACCOUNT_CODE, known_items=()):
+        self.batch_size = batch_size
+        if contact is None:
+            contact = {'Name': XERO_CONTACT_NAME}
+        self.contact = contact
+        self.account_code = account_code
+        # Fields shared by all invoices
+        self._invoice_fields = {
+            'Type':             invoice_type,
+            'Status':           status,
+            'CurrencyCode':     currency_code,
+            'LineAmountTypes':  line_amount_types,
+        }
+        self.items = set(str(code) for code in known_items)
+
+    def convert(self, baskets):
+        """
+        Convert baskets, in batches of batch_size invoices.
+
+        Parameters
+        ----------
+        baskets :
+            report_basket output, see iter_baskets.
+
+        Yields
+        ------
+        XeroBatch of 'Items' (new items of the following invoices, if any)
+        and 'Invoices'.
+        """
+        invoices = []
+        items = []
+        for basket in iter_baskets(baskets):
+            invoice, new_items = self.convert_basket(basket)
+            invoices.append(invoice)
+            items.extend(new_items)
+            if len(invoices) == self.batch_size:
+                for batch in self._flush(invoices, items):
+                    yield batch
+                invoices = []
+                items = []
+        for batch in self._flush(invoices, items):
+            yield batch
+
+    def _flush(self, invoices, items):
+        for start in range(0, len(items), self.batch_size):
+            yield XeroBatch('Items',
+                            {'Items': items[start:start + self.batch_size]})
+        if invoices:
+            yield XeroBatch('Invoices', {'Invoices': invoices})
+
+    def convert_basket(self, basket):
+        """
+        Parameters
+        ----------
+        basket : dict
+            Basket as returned by the API.
+
+        Returns
+        -------
+        Xero Invoice, list of Xero Items not emitted before.
+
+        Raises
+        ------
+        ValueError if a product line has no product id, which would make
+        its item code 'None'.
+        """
+        if not isinstance(basket, collections.abc.Mapping):
+            raise TypeError("Expected a basket dict, not %s. Request baskets "
+                            "with return_format='json'."
+                            % type(basket).__name__)
+        bId, name, completed, lines, amount = _basket_fields(basket)
+
+        line_items = []
+        new_items = []
+        seen = self.items
+        account_code = self.account_code
+        for product_id, product_name, quantity, unit_amount, unit_price \
+                in lines:
+            code = str(product_id)[:ITEM_CODE_LENGTH]
+            if code not in seen:
+                seen.add(code)
+                new_items.append(self._item(code, product_name, unit_price,
+                                            True))
+            line_items.append({
+                'ItemCode':     code,
+                'Description':  product_name,
+                'Quantity':     quantity,
+                'UnitAmount':   unit_amount,
+                'AccountCode':  account_code,
+            })
+
+        invoice = dict(self._invoice_fields)
+        total = _amount(amount / XERO_AMOUNT_SCALE)
+        invoice.update({
+            'InvoiceNumber':    XERO_INVOICE_NUMBER.format(bId=bId),
+            'Reference':        name,
+            'Contact':          self.contact,
+            'Date':             completed,
+            'DueDate':          completed,
+            'Total':            total,
+            'AmountDue':        total,
+            'LineItems':        line_items,
+        })
+        return invoice, new_items
+
+    def _item(self, code, name, unit_price, is_sold):
+        item = {
+            'Code':     code,
+            'Name':     (name or code)[:ITEM_NAME_LENGTH],
+            'IsSold':   is_sold,
+        }
+        if unit_price is not None:
+            item['SalesDetails'] = {'UnitPrice': unit_price,
+                                    'AccountCode': self.account_code}
+        return item
+
+    def convert_products(self, products):
+        """
+        Xero Items of catalogue products not emitted before, in batches.
+        Products are sold from their activeDate on.
+
+        Parameters
+        ----------
+        products : iterable of Product or product dicts, or the result of
+            product.all()
+        """
+        if isinstance(products, collections.abc.Mapping):
+            products = products.get('products', products)
+            if isinstance(products, collections.abc.Mapping):
+                products = products.values()
+        now = ShopwaveDatetime.now()
+        items = []
+        for product in products:
+            if isinstance(product, collections.abc.Mapping):
+                product_id = product.get('id')
+                name = product.get('n', product.get('name'))
+                price = product.get('price')
+                active = product.get('activeDate')
+            else:
+                product_id, name = product.id, product.name
+                price, active = product.price, product.activeDate
+            code = str(product_id)[:ITEM_CODE_LENGTH]
+            if code in self.items:
+                continue
+            self.items.add(code)
+            is_sold = bool(active) and ShopwaveDatetime(active) <= now
+            items.append(self._item(code, name, None if price is None
+                                    else _amount(price), is_sold))
+        for start in range(0, len(items), self.batch_size):
+            yield XeroBatch('Items',
+                            {'Items': items[start:start + self.batch_size]})
+
+    def linked_transactions(self, invoices, contact_id):
+        """
+        Xero Linked Transactions for the line items of invoices created in
+        Xero, in batches.
+
+        Parameters
+        ----------
+        invoices : list of dict
+            Invoices as returned by Xero, with InvoiceID and the LineItemID
+            of every line item.
+        contact_id : string
+            ContactID the transactions are linked to.
+        """
+        links = [{
+            'SourceTransactionID':  invoice['InvoiceID'],
+            'SourceLineItemID':     line['LineItemID'],
+            'ContactID':            contact_id,
+        } for invoice in invoices for line in invoice.get('LineItems', ())]
+        for start in range(0, len(links), self.batch_size):
+            yield XeroBatch('LinkedTransactions', {
+                'LinkedTransactions': links[start:start + self.batch_size]})
+
+
+def _basket_fields(basket):
+    """
+    Returns
+    -------
+    bId, name, completion date (ISO 8601), lines as (product id, name,
+    quantity, unit amount, unit price), amount in minor units.
+    """
+    lines = []
+    for line_id, line in (basket.get('p') or {}).items():
+        if line.get('id') is None:
+            raise ValueError('Line %s of basket %s has no product id.'
+                             % (line_id, basket.get('bId')))
+        unit_amount = line.get('pMP', line.get('price'))
+        unit_price = line.get('pIP', line.get('price'))
+        quantity = line.get('q')
+        if quantity is None:
+            quantity = 1
+        lines.append((line['id'], line.get('n'), quantity,
+                      None if unit_amount is None else _amount(unit_amount),
+                      None if unit_price is None else _amount(unit_price)))
+    amount = sum(transaction.get('tA') or 0
+                 for transaction in (basket.get('tr') or {}).values())
+    completed = basket.get('c')
+    if completed:
+        completed = ShopwaveDatetime(completed).isoformat()
+    return basket.get('bId'), basket.get('bN'), completed, lines, amount
+
+
+def write_json(batches, directory):
+    """
+    Write every batch to '<directory>/<number>-<endpoint>.json', numbered in
+    submission order.
+
+    Returns
+    -------
+    list of file paths.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for number, batch in enumerate(batches, 1):
+        path = os.path.join(directory, '%05d-%s.json'
+                            % (number, batch.endpoint.lower()))
+        with open(path, 'w') as f:
+            f.write(batch.to_json())
+        paths.append(path)
+    return paths
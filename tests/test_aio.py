@@ -0,0 +1,102 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from shopwave import AsyncShopwave
+from shopwave.exceptions import ShopwaveNotFound
+from shopwave.fakeserver import FakeShopwave
+from shopwave.utils import aio
+
+
+@pytest.fixture(scope='module')
+def server():
+    with FakeShopwave(n_products=30, baskets_per_hour=6) as server:
+        yield server
+
+
+def run(server, test):
+    async def main():
+        async with AsyncShopwave(server.credentials(),
+                                 base_url=server.url) as sw:
+            return await test(sw)
+    return asyncio.run(main())
+
+
+def test_all_and_get(server):
+    async def test(sw):
+        products = await sw.product.all()
+        some = await sw.product.get('2,3')
+        baskets = await sw.report_basket.all(
+            from_date='2017-02-01 00:00:00', to_date='2017-02-01 02:00:00',
+            return_format='json')
+        return products, some, baskets
+
+    products, some, baskets = run(server, test)
+    assert len(products['products']) == 30
+    assert sorted(p.id for p in some['products']) == [2, 3]
+    assert len(baskets['baskets']) == 12
+
+
+def test_gather(server):
+    async def test(sw):
+        results = await sw.gather(*[sw.product.get(str(i))
+                                    for i in range(1, 11)], limit=3)
+        return results, sw.stats()
+
+    results, stats = run(server, test)
+    assert [r['products'][0].id for r in results] == list(range(1, 11))
+    assert stats['requests'] == 10
+
+
+def test_errors(server):
+    async def test(sw):
+        sw.product.base_url = server.url + 'missing/'
+        with pytest.raises(ShopwaveNotFound):
+            await sw.product.all()
+        with pytest.raises(TypeError):
+            sw.product.iter()
+
+    run(server, test)
+
+
+def test_token_request_does_not_block_the_loop(server):
+    credentials = server.credentials()
+    get_access_token = credentials.get_access_token
+    threads = []
+
+    def record():
+        threads.append(threading.current_thread())
+        return get_access_token()
+
+    credentials.get_access_token = record
+
+    async def main():
+        async with AsyncShopwave(credentials, base_url=server.url) as sw:
+            await sw.gather(*[sw.product.get(str(i)) for i in range(1, 4)])
+
+    asyncio.run(main())
+    # The first calls request the token in the executor, later calls read
+    # the fresh token in the loop.
+    assert threads[0] is not threading.main_thread()
+    assert credentials._token_is_fresh()
+
+
+def test_gather_limit():
+    running = []
+    peak = []
+
+    async def task(i):
+        running.append(i)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(i)
+        return i
+
+    async def main():
+        return await aio.gather(*[task(i) for i in range(10)], limit=4)
+
+    assert asyncio.run(main()) == list(range(10))
+    assert max(peak) == 4
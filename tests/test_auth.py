@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+from shopwave.auth import Credentials
+from shopwave.fakeserver import FakeShopwave
+from shopwave.settings import TOKEN_REFRESH_MARGIN
+from shopwave.tokenstore import MemoryTokenStore
+
+
+# Token requests are the only requests in these tests, so the 200s of the
+# fake server count them.
+
+
+@pytest.fixture
+def server():
+    with FakeShopwave() as server:
+        yield server
+
+
+def in_threads(func, n=8):
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def run(i):
+        barrier.wait()
+        results[i] = func()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_refreshes_make_one_request(server):
+    credentials = server.credentials()
+    tokens = in_threads(credentials.get_access_token)
+    assert len(set(tokens)) == 1
+    assert server.stats == {200: 1}
+
+    stale = tokens[0]
+    tokens = in_threads(lambda: credentials.refresh(stale))
+    assert len(set(tokens)) == 1
+    assert tokens[0] != stale
+    assert server.stats == {200: 2}
+
+
+def test_refresh_within_margin(server):
+    credentials = server.credentials()
+    token = credentials.get_access_token()
+    assert credentials.get_access_token() == token
+    assert server.stats == {200: 1}
+
+    # Expires within TOKEN_REFRESH_MARGIN.
+    credentials.store.save(token, credentials.token_type,
+                           TOKEN_REFRESH_MARGIN - 1)
+    credentials._load_token()
+    new_token = credentials.get_access_token()
+    assert new_token != token
+    assert credentials._token_is_fresh()
+    assert server.stats == {200: 2}
+
+
+def test_token_of_another_process(server):
+    store = MemoryTokenStore()
+    first = Credentials(store=store, token_uri=server.url + 'oauth/token')
+    second = Credentials(store=store, token_uri=server.url + 'oauth/token')
+    stale = first.get_access_token()
+    assert second.get_access_token() == stale
+
+    token = first.refresh(stale)
+    assert server.stats == {200: 2}
+    # second still holds the stale token, e.g. rejected by the API.
+    assert second.access_token == stale
+    assert second.refresh(stale) == token
+    assert server.stats == {200: 2}
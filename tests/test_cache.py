@@ -0,0 +1,161 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from shopwave import cache as cache_module
+from shopwave.cache import ResponseCache
+from shopwave.fakeserver import FakeShopwave
+from shopwave.transport import BufferedResponse
+
+
+class Clock(object):
+    """ Stands in for the time module in shopwave.cache. """
+    now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def redis_db():
+    fakeredis = pytest.importorskip('fakeredis')
+    return fakeredis.FakeStrictRedis()
+
+
+def response(content=b'{}', etag=None):
+    # Lower case, as in the case insensitive headers of real responses.
+    headers = {'content-type': 'application/json'}
+    if etag:
+        headers['etag'] = etag
+    return BufferedResponse(200, headers, content)
+
+
+def request(params=None, **headers):
+    return {'method': 'get', 'uri': 'https://api.example/product',
+            'params': params, 'headers': headers, 'data': None,
+            'timeout': None}
+
+
+def test_key():
+    cache = ResponseCache()
+    key = cache.key('Product', request({'a': 1, 'b': 2},
+                                       Authorization='Bearer 1', accept='x'))
+    assert key.startswith('Product:')
+    assert key == cache.key('Product', request(
+        {'b': '2', 'a': '1'}, Accept='x', authorization='Bearer 2'))
+    assert key != cache.key('Product', request({'a': 1}, Accept='x'))
+    assert key != cache.key('Product', request({'a': 1, 'b': 2}, Accept='y'))
+    assert key != cache.key('Category', request({'a': 1, 'b': 2}, Accept='x'))
+    assert key == ResponseCache().key('Product', request(
+        {'a': 1, 'b': 2}, accept='x'))
+
+
+def test_lru_by_entries(clock):
+    cache = ResponseCache(max_entries=2)
+    cache.set('Product:a', response(), 60)
+    cache.set('Product:b', response(), 60)
+    assert cache.get('Product:a') is not None
+    cache.set('Product:c', response(), 60)
+    assert cache.get('Product:b') is None
+    assert cache.get('Product:a') is not None
+    assert cache.get('Product:c') is not None
+    assert len(cache) == 2
+
+
+def test_lru_by_bytes(clock):
+    cache = ResponseCache(max_bytes=10)
+    cache.set('Product:a', response(b'x' * 6), 60)
+    cache.set('Product:b', response(b'y' * 4), 60)
+    assert len(cache) == 2
+    cache.set('Product:c', response(b'z' * 3), 60)
+    assert cache.get('Product:a') is None
+    assert cache._size == 7
+    # Replacing an entry does not count its old size.
+    cache.set('Product:c', response(b'z' * 6), 60)
+    assert (len(cache), cache._size) == (2, 10)
+    cache.set('Product:d', response(b'w' * 11), 60)
+    assert len(cache) == 0
+
+
+def test_ttl_and_stale_ttl(clock):
+    cache = ResponseCache(stale_ttl=100)
+    cache.set('Product:plain', response(), 10)
+    cache.set('Product:etag', response(etag='"1"'), 10)
+    assert cache.get('Product:plain').fresh
+    clock.now += 11
+    # Without validators an expired response is of no use.
+    assert cache.get('Product:plain') is None
+    entry = cache.get('Product:etag')
+    assert not entry.fresh
+    assert entry.validators == {'If-None-Match': '"1"'}
+    cache.renew('Product:etag', entry, 10)
+    assert cache.get('Product:etag').fresh
+    clock.now += 10 + 101
+    assert cache.get('Product:etag') is None
+    assert len(cache) == 0
+
+
+def test_redis_tier(redis_db):
+    first = ResponseCache(db=redis_db, prefix='test:', stale_ttl=100)
+    entry = first.set('Product:a', response(b'[1]', etag='"1"'), 10)
+    assert 0 < redis_db.ttl('test:Product:a') <= 111
+
+    second = ResponseCache(db=redis_db, prefix='test:')
+    shared = second.get('Product:a')
+    assert shared.content == b'[1]'
+    assert shared.headers['etag'] == '"1"'
+    assert shared.expires == entry.expires
+
+    first.renew('Product:a', entry, 1000)
+    assert ResponseCache(db=redis_db, prefix='test:').get(
+        'Product:a').expires == entry.expires
+    assert redis_db.ttl('test:Product:a') > 1000
+
+    first.set('Category:a', response(), 10)
+    first.invalidate('Store')
+    assert redis_db.exists('test:Product:a', 'test:Category:a') == 2
+    first.invalidate('Category')
+    assert redis_db.keys('test:*') == []
+    assert ResponseCache(db=redis_db, prefix='test:').get('Product:a') is None
+
+
+def test_invalidate_follows_dependencies(clock):
+    cache = ResponseCache()
+    invalidated = []
+    cache.add_invalidate_hook(invalidated.append)
+    for key in ('Product:a', 'Category:a', 'Store:a'):
+        cache.set(key, response(), 60)
+    cache.invalidate('Product')
+    assert invalidated == [{'Product', 'Category'}]
+    assert cache.get('Product:a') is None
+    assert cache.get('Category:a') is None
+    assert cache.get('Store:a') is not None
+
+
+def test_etag_revalidation():
+    cache = ResponseCache(ttls={'Product': 0}, default_ttl=None)
+    with FakeShopwave(n_products=250) as server:
+        sw = server.client(cache=cache)
+        first = sw.product.all(return_format='json')
+        second = sw.product.all(return_format='json')
+        assert first == second
+        assert len(second['products']) == 250
+        # One token request, then the full response and a 304.
+        assert server.stats == {200: 1 + 1, 304: 1}
+
+
+def test_import_does_not_load_requests():
+    code = ('import sys, shopwave.cache; '
+            'sys.exit("requests" in sys.modules)')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert subprocess.run([sys.executable, '-c', code],
+                          cwd=root).returncode == 0
@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+
+from shopwave import Shopwave, manager
+from shopwave.fakeserver import FakeShopwave
+from shopwave.settings import OBJECT_LIST
+
+
+@pytest.fixture
+def server():
+    with FakeShopwave(n_products=250) as server:
+        yield server
+
+
+class CountingLimiter(object):
+    in_flight = 0
+
+    def acquire(self, name):
+        self.in_flight += 1
+        return 0.0
+
+    def release(self, name, started, status=None):
+        self.in_flight -= 1
+
+
+def test_iter_holds_limiter_until_body_is_read(server):
+    limiter = CountingLimiter()
+    sw = server.client(rate_limiter=limiter)
+    products = sw.product.iter()
+    next(products)
+    assert limiter.in_flight == 1
+    assert len(list(products)) == 249
+    assert limiter.in_flight == 0
+
+
+def test_object_list_has_no_duplicates():
+    names = [name.lower() for name in OBJECT_LIST]
+    assert len(set(names)) == len(names)
+    assert Shopwave(None).OBJECT_LIST == tuple(OBJECT_LIST)
+
+
+def test_managers_are_built_on_first_access(server, monkeypatch):
+    built = []
+
+    def manager_class(name):
+        built.append(name)
+        return manager.get_manager_class(name)
+
+    monkeypatch.setattr(Shopwave, '_manager_class',
+                        staticmethod(manager_class))
+    sw = server.client()
+    assert built == []
+    assert not set(vars(sw)) & {name.lower() for name in OBJECT_LIST}
+    assert 'report_basket' in dir(sw)
+
+    barrier = threading.Barrier(8)
+    managers = []
+
+    def access():
+        barrier.wait()
+        managers.append(sw.product)
+
+    threads = [threading.Thread(target=access) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert built == ['Product']
+    assert all(m is sw.product for m in managers)
+    assert sw.product.transport is sw.transport
+    assert 'category' not in vars(sw)
+    sw.category
+    assert built == ['Product', 'Category']
+    with pytest.raises(AttributeError):
+        sw.no_such_endpoint
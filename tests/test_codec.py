@@ -0,0 +1,59 @@
+import json
+import sys
+
+import pytest
+
+from shopwave import codec
+
+DOCUMENT = {'products': {'1': {'id': 1, 'n': 'Café', 'price': 1.5,
+                               'p': [], 'deleteDate': None, 'v': True}}}
+RAW = json.dumps(DOCUMENT)
+
+
+@pytest.fixture(params=codec.AUTO_ORDER)
+def backend(request):
+    pytest.importorskip(request.param)
+    return codec.load_backend(request.param)
+
+
+def test_backends_agree(backend):
+    assert backend.loads(RAW.encode('utf-8')) == DOCUMENT
+    assert backend.loads(RAW) == DOCUMENT
+    encoded = backend.dumps(DOCUMENT)
+    assert isinstance(encoded, str)
+    assert json.loads(encoded) == DOCUMENT
+
+
+def test_auto_falls_back(monkeypatch):
+    installed = [name for name in codec.AUTO_ORDER
+                 if name == 'json' or _installed(name)]
+    assert codec.load_backend('auto').name == installed[0]
+    for name in installed[:-1]:
+        monkeypatch.setitem(sys.modules, name, None)
+    assert codec.load_backend('auto').name == 'json'
+
+
+def test_missing_and_unknown_backends(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'orjson', None)
+    with pytest.raises(ImportError):
+        codec.load_backend('orjson')
+    with pytest.raises(ValueError):
+        codec.load_backend('marshal')
+
+
+def test_set_backend():
+    previous = codec.get_backend()
+    try:
+        assert codec.set_backend('json') is codec.get_backend()
+        assert codec.loads(b'{"a": [1]}') == {'a': [1]}
+        assert codec.dumps({'a': 1}) == '{"a": 1}'
+    finally:
+        codec._backend = previous
+
+
+def _installed(name):
+    try:
+        __import__(name)
+    except ImportError:
+        return False
+    return True
@@ -0,0 +1,109 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from shopwave.columnar import build_column_store, parse_datetimes
+from shopwave.fakeserver import FakeShopwave
+
+PRODUCTS = {
+    '1': {'id': 1, 'n': 'Tea', 'price': '1.50', 'bC': '123',
+          'activeDate': '2017-01-09T16:49:58.000Z',
+          'categories': {'2': 'Drinks'}},
+    '2': {'id': 2, 'n': ''.join(['T', 'ea'])},
+}
+
+BASKETS = {
+    '7': {'bId': 7, 'c': '2017-01-10 12:00:00',
+          'p': {'71': {'id': 5, 'n': 'Tea', 'q': 2},
+                '72': {'id': 6, 'n': 'Cake', 'q': '1'}},
+          'tr': {'9': {'tId': 9, 'tA': 750, 'tTy': 'Card'}}},
+    '8': {'bId': 8, 'c': None},
+    '9': {'bId': 9, 'c': '2017-01-10 13:00:00',
+          'p': {'91': {'id': 5, 'n': 'Tea', 'q': 1}}},
+}
+
+
+def test_typed_columns():
+    products = build_column_store({'products': PRODUCTS})['products']
+    assert len(products) == 2
+
+    assert isinstance(products['id'], np.ma.MaskedArray)
+    assert products['id'].dtype == np.int64
+    assert products['id'].tolist() == [1, 2]
+    # Missing ints are masked.
+    barcode = products['barcode']
+    assert barcode.dtype == np.int64
+    assert barcode.mask.tolist() == [False, True]
+    assert barcode[0] == 123
+
+    price = products['price']
+    assert price.dtype == np.float64
+    assert price[0] == 1.5 and np.isnan(price[1])
+
+    active = products['activeDate']
+    assert active.dtype == np.dtype('datetime64[s]')
+    assert active[0] == np.datetime64('2017-01-09T16:49:58')
+    assert np.isnat(active[1])
+
+    name = products['name']
+    assert name.dtype == object
+    assert name[0] is name[1]
+    assert products['details'].tolist() == [None, None]
+    assert 'categories' not in products
+
+
+def test_child_tables():
+    store = build_column_store({'baskets': BASKETS})
+    assert sorted(store) == ['baskets', 'baskets.p', 'baskets.tr']
+    baskets = store['baskets']
+    assert baskets['bId'].tolist() == [7, 8, 9]
+    assert np.isnat(baskets['c'][1])
+
+    lines = store['baskets.p']
+    # The id of a line is its key, the product id is kept in productId.
+    assert lines['id'].tolist() == [71, 72, 91]
+    assert lines['productId'].tolist() == [5, 6, 5]
+    assert lines['parent_id'].tolist() == [7, 7, 9]
+    assert lines['parent_row'].tolist() == [0, 0, 2]
+    assert lines['q'].tolist() == [2, 1, 1]
+    assert baskets['bId'][lines['parent_row']].tolist() == \
+        lines['parent_id'].tolist()
+
+    transactions = store['baskets.tr']
+    assert transactions['parent_id'].tolist() == [7]
+    assert transactions['tId'].tolist() == [9]
+    assert transactions['bId'].mask.tolist() == [True]
+    assert 'productId' not in transactions
+
+
+def test_reference_by_attribute():
+    store = build_column_store({'products': PRODUCTS})
+    categories = store['products.categories']
+    assert categories['id'].tolist() == [2]
+    assert categories['title'].tolist() == ['Drinks']
+    assert categories['parent_id'].tolist() == [1]
+    assert categories['parent_row'].tolist() == [0]
+
+
+def test_invalid_values():
+    with pytest.raises(TypeError):
+        build_column_store({'products': {'1': {'id': 1, 'unknown': 2}}})
+    with pytest.raises(ValueError):
+        build_column_store({'products': {'1': {'id': 'x'}}})
+    with pytest.raises(ValueError):
+        parse_datetimes(['2017-13-01 00:00:00'])
+
+
+def test_client_columnar_matches_models():
+    with FakeShopwave(n_products=50, baskets_per_hour=6) as server:
+        sw = server.client()
+        store = sw.report_basket.all('2017-02-01', '2017-02-02',
+                                     return_format='columnar')
+        report = sw.report_basket.all('2017-02-01', '2017-02-02')
+    baskets = [b for obj_list in report.values() for b in obj_list]
+    assert store['baskets']['bId'].tolist() == [b.bId for b in baskets]
+    assert store['baskets']['c'].tolist() == [b.c.replace(tzinfo=None)
+                                              for b in baskets]
+    lines = store['baskets.p']
+    assert len(lines) == sum(len(b.p) for b in baskets)
+    assert lines['id'].tolist() == [line.id for b in baskets for line in b.p]
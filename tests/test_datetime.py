@@ -0,0 +1,97 @@
+from datetime import date, datetime
+
+import pytest
+
+from shopwave.settings import DATETIME_FORMAT
+from shopwave.utils import ShopwaveDatetime, parse_datetime
+
+VALID = [
+    '2017-01-09T16:49:58',
+    '2017-01-09 16:49:58',
+    '2017-01-09',
+    ' 2017-01-09 ',
+    '2017-01-09T16:49:58.000Z',
+    '2017-01-09 16:49:58.123456',
+    '2017-01-09T16:49:58+01:00',
+    '2016-02-29 23:59:59',
+    '2017-1-9 1:2:3',
+    '0001-01-01 00:00:00',
+]
+
+INVALID = [
+    '2017-13-01 00:00:00',
+    '2017-02-30',
+    '2017-01-09 24:00:00',
+    '2017-01-09T16:60:00',
+    '0000-01-01 00:00:00',
+    '2017-01-09 16:49',
+    '09/01/2017',
+    '',
+]
+
+
+def strptime_datetime(d):
+    """ ShopwaveDatetime(d) of the root commit, before the fast path. """
+    d = d.strip()
+    if len(d) == 10:
+        d += ' 00:00:00'
+    elif len(d) > 19:
+        d = d[:19]
+    try:
+        return datetime.strptime(d, '%Y-%m-%dT%H:%M:%S')
+    except ValueError:
+        return datetime.strptime(d, DATETIME_FORMAT)
+
+
+def strptime_error(d):
+    with pytest.raises(ValueError) as e:
+        strptime_datetime(d)
+    return str(e.value)
+
+
+@pytest.mark.parametrize('value', VALID)
+def test_parse_like_strptime(value):
+    expected = strptime_datetime(value)
+    for parse in (ShopwaveDatetime, parse_datetime):
+        parsed = parse(value)
+        assert isinstance(parsed, ShopwaveDatetime)
+        assert parsed == expected
+
+
+@pytest.mark.parametrize('value', INVALID)
+def test_invalid_like_strptime(value):
+    message = strptime_error(value)
+    for parse in (ShopwaveDatetime, parse_datetime):
+        with pytest.raises(ValueError) as e:
+            parse(value)
+        assert str(e.value) == message
+
+
+def test_parse_datetime():
+    value = '2017-01-09 16:49:58'
+    assert parse_datetime(value) is parse_datetime(value)
+    assert parse_datetime(datetime(2017, 1, 9, 16, 49, 58, 5)) == \
+        ShopwaveDatetime(value)
+    assert parse_datetime(date(2017, 1, 9)) == ShopwaveDatetime('2017-01-09')
+
+
+def test_parse_datetimes_like_strptime():
+    np = pytest.importorskip('numpy')
+    from shopwave.columnar import parse_datetimes
+
+    values = VALID + [None, datetime(2017, 1, 9, 16, 49, 58)]
+    parsed = parse_datetimes(values)
+    assert parsed.dtype == np.dtype('datetime64[s]')
+    for value, result in zip(values, parsed.tolist()):
+        if value is None:
+            assert result is None
+        elif isinstance(value, datetime):
+            assert result == value
+        else:
+            assert result == strptime_datetime(value)
+
+    for value in INVALID:
+        message = strptime_error(value)
+        with pytest.raises(ValueError) as e:
+            parse_datetimes(['2017-01-09 16:49:58', value])
+        assert str(e.value) == message
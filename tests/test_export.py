@@ -0,0 +1,75 @@
+import csv
+import os
+
+import pytest
+
+from shopwave.fakeserver import FakeShopwave
+
+
+@pytest.fixture(scope='module')
+def sw():
+    with FakeShopwave(baskets_per_hour=6) as server:
+        yield server.client()
+
+
+def _export(sw, tmp_path, format):
+    # Three daily windows, each written as its own chunk.
+    return sw.report_basket.export('2017-02-01', '2017-02-04',
+                                   str(tmp_path), format=format,
+                                   window='daily')
+
+
+def _check(tables):
+    baskets = tables['baskets']
+    assert baskets.num_rows == 3 * 24 * 6
+    assert len(set(baskets.column('bId').to_pylist())) == baskets.num_rows
+    lines = tables['baskets.p']
+    assert lines.num_rows == 3 * baskets.num_rows
+    assert 'productId' in lines.schema.names
+    assert lines.column('productId').null_count == 0
+    assert tables['baskets.tr'].num_rows == baskets.num_rows
+
+
+def test_arrow_round_trip(sw, tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    paths = _export(sw, tmp_path, 'arrow')
+    tables = {}
+    for name, path in paths.items():
+        with pa.ipc.open_file(path) as reader:
+            assert reader.num_record_batches == 3
+            batches = [reader.get_batch(i) for i in range(3)]
+            assert all(b.schema.equals(reader.schema) for b in batches)
+            tables[name] = reader.read_all()
+    _check(tables)
+
+
+def test_parquet_round_trip(sw, tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    paths = _export(sw, tmp_path, 'parquet')
+    tables = {}
+    for name, path in paths.items():
+        f = pq.ParquetFile(path)
+        assert f.num_row_groups == 3
+        for i in range(3):
+            assert f.read_row_group(i).schema.equals(f.schema_arrow)
+        tables[name] = f.read()
+    _check(tables)
+
+
+def test_csv_export(sw, tmp_path):
+    pytest.importorskip('numpy')
+    paths = sw.report_basket.export('2017-02-01', '2017-02-03',
+                                    str(tmp_path), format='csv')
+    assert sorted(paths) == ['baskets', 'baskets.p', 'baskets.tr']
+    with open(paths['baskets'], newline='') as f:
+        rows = list(csv.reader(f))
+    assert len(rows) == 1 + 2 * 24 * 6
+    header = rows[0]
+    assert 'parent_row' not in header
+    bIds = [int(row[header.index('bId')]) for row in rows[1:]]
+    assert len(set(bIds)) == len(bIds)
+    with open(paths['baskets.p'], newline='') as f:
+        lines = list(csv.DictReader(f))
+    assert len(lines) == 3 * len(bIds)
+    assert all(line['productId'] for line in lines)
+    assert os.path.dirname(paths['baskets.p']) == str(tmp_path)
@@ -0,0 +1,30 @@
+import pytest
+
+from shopwave.fakeserver import FakeShopwave
+
+
+# The stats of the fake server count token requests too: every client
+# requests a token before its first call.
+
+
+@pytest.fixture
+def server():
+    with FakeShopwave(n_products=250) as server:
+        yield server
+
+
+def test_get_many(server):
+    sw = server.client()
+    ids = list(range(1, 251)) + [9999, 1]
+    result = sw.product.get_many(ids, batch_size=100)
+    assert list(result) == list(range(1, 251))
+    assert result[7].id == 7
+    assert result.missing == [9999]
+    assert server.stats == {200: 1 + 3}
+
+
+def test_get_many_rejects_return_format_before_requests(server):
+    sw = server.client()
+    with pytest.raises(ValueError):
+        sw.product.get_many([1, 2], return_format='columnar')
+    assert server.stats == {}
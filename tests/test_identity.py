@@ -0,0 +1,85 @@
+from shopwave.identity import IdentityMap
+
+
+class Model(object):
+    pass
+
+
+def test_shared_instances():
+    identity_map = IdentityMap()
+    first = identity_map.resolve(Model, 1, {'n': 'a'}, Model)
+    assert identity_map.resolve(Model, '1', {'n': 'a'}, Model) is first
+    assert identity_map.resolve(Model, 1, {'n': 'b'}, Model) is not first
+    assert (identity_map.hits, identity_map.misses) == (1, 2)
+
+
+def test_least_recently_used_are_dropped():
+    identity_map = IdentityMap(max_objects=2)
+    one = identity_map.resolve(Model, 1, {}, Model)
+    identity_map.resolve(Model, 2, {}, Model)
+    assert identity_map.resolve(Model, 1, {}, Model) is one
+    identity_map.resolve(Model, 3, {}, Model)
+    assert len(identity_map) == 2
+    assert identity_map.resolve(Model, 1, {}, Model) is one
+    assert identity_map.misses == 3
+    identity_map.resolve(Model, 2, {}, Model)
+    assert identity_map.misses == 4
+
+
+def _basket(bId, line_id, quantity):
+    line = {'id': 5, 'n': 'Tea', 'price': '1.50', 'bPIId': line_id,
+            'q': quantity, 'pMP': '1.50'}
+    return {'bId': bId, 'p': {str(line_id): line}}
+
+
+def test_basket_lines_share_the_product():
+    from shopwave import identity
+    from shopwave.models import BasketReport, Product
+
+    with identity.use(IdentityMap()):
+        first = BasketReport(data=_basket(1, 11, 1))
+        second = BasketReport(data=_basket(2, 21, 3))
+    a, b = first.p[0], second.p[0]
+    assert a.item is b.item
+    assert isinstance(a, Product) and a.item.id == 5
+    assert (a.id, a.q, a.name, a.price) == (11, 1, 'Tea', 1.5)
+    assert (b.id, b.q, b.name) == (21, 3, 'Tea')
+
+    with identity.use(None):
+        line = BasketReport(data=_basket(1, 11, 1)).p[0]
+    assert (line.id, line.q, line.name) == (11, 1, 'Tea')
+
+
+def test_compact_basket_lines_share_the_product():
+    from shopwave import identity
+    from shopwave.models import BasketReport, Product
+
+    CompactReport = BasketReport.compact()
+    with identity.use(IdentityMap()):
+        first = CompactReport(data=_basket(1, 11, 1))
+        second = CompactReport(data=_basket(2, 21, 3))
+    a, b = first.p[0], second.p[0]
+    assert a.item is b.item
+    assert isinstance(a, Product.compact()) and not hasattr(a, '__dict__')
+    assert (a.id, a.q, a.name, a.price) == (11, 1, 'Tea', 1.5)
+    assert (b.id, b.q, b.name) == (21, 3, 'Tea')
+    b.name = 'Green tea'
+    assert a.name == 'Green tea'
+
+
+def test_without_line_items():
+    from shopwave import identity
+    from shopwave.models import BasketReport, Category
+
+    products = {'5': {'id': 5, 'n': 'Tea'}, '6': {'id': 6, 'n': 'Cake'}}
+    with identity.use(IdentityMap(line_items=False)):
+        first = BasketReport(data=_basket(1, 11, 1))
+        second = BasketReport(data=_basket(2, 21, 3))
+        drinks = Category(data={'id': 1, 'p': products})
+        food = Category(data={'id': 2, 'p': products})
+    a, b = first.p[0], second.p[0]
+    assert not hasattr(a, 'item') and a is not b
+    assert (a.id, a.q, a.name) == (11, 1, 'Tea')
+    assert (b.id, b.q, b.name) == (21, 3, 'Tea')
+    # Occurrences without line fields are still shared.
+    assert drinks.p[0] is food.p[0]
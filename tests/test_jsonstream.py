@@ -0,0 +1,46 @@
+import json
+
+from shopwave.utils.jsonstream import ObjectStream, iter_objects
+
+DOCUMENT = {
+    'api': {'message': {}},
+    'baskets': {
+        '1': {'bId': 1, 'bN': 'Basket {1}', 'p': {'3': {'id': 3, 'q': 2}}},
+        '2': {'bId': 2, 'bN': 'Quote " and \\ [2]', 'tr': {}},
+    },
+    'products': [{'id': 5, 'n': 'Café'}, {'id': 6, 'n': ''}],
+}
+
+
+def _expected(document):
+    result = []
+    for key, value in document.items():
+        if key == 'api':
+            continue
+        if isinstance(value, dict):
+            result.extend((key, k, v) for k, v in value.items())
+        else:
+            result.extend((key, None, v) for v in value)
+    return result
+
+
+def test_any_chunk_size():
+    text = json.dumps(DOCUMENT, ensure_ascii=False)
+    for size in range(1, len(text) + 1):
+        stream = ObjectStream()
+        result = []
+        for start in range(0, len(text), size):
+            result.extend(stream.feed(text[start:start + size]))
+        assert result == _expected(DOCUMENT), size
+
+
+def test_multibyte_characters_split_between_chunks():
+    data = json.dumps(DOCUMENT, ensure_ascii=False).encode('utf-8')
+    chunks = [data[i:i + 1] for i in range(len(data))]
+    assert list(iter_objects(chunks)) == _expected(DOCUMENT)
+
+
+def test_skip():
+    text = json.dumps(DOCUMENT)
+    result = ObjectStream(skip=('api', 'products')).feed(text)
+    assert [key for key, _, _ in result] == ['baskets', 'baskets']
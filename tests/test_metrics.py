@@ -0,0 +1,139 @@
+import logging
+
+from shopwave.cache import ResponseCache
+from shopwave.fakeserver import FakeShopwave
+from shopwave.metrics import (Histogram, LoggingSink, MemorySink, Metrics,
+                              PrometheusSink)
+from shopwave.transport import Transfer
+
+
+class Response(object):
+    def __init__(self, status_code, transfer=None):
+        self.status_code = status_code
+        self.transfer = transfer
+
+
+def test_record_response():
+    memory = MemorySink()
+    metrics = Metrics(memory)
+    metrics.record_response('Product', Response(
+        200, Transfer(0.01, 0.02, None, 2048)))
+    metrics.record_response('Product', Response(404))
+    assert memory.counter('requests', endpoint='Product') == 2
+    assert memory.counter('requests', status=404) == 1
+    assert memory.histogram('connect_seconds')['sum'] == 0.01
+    assert memory.histogram('ttfb_seconds')['count'] == 1
+    assert memory.histogram('download_seconds') is None
+    assert memory.histogram('response_bytes', endpoint='Product')['max'] == \
+        2048
+
+
+def test_histogram():
+    histogram = Histogram(samples=100)
+    for value in range(1, 101):
+        histogram.add(value)
+    stats = histogram.as_dict()
+    assert (stats['count'], stats['sum'], stats['mean']) == (100, 5050, 50.5)
+    assert (stats['min'], stats['max']) == (1, 100)
+    assert (stats['p50'], stats['p90'], stats['p99']) == (51, 91, 100)
+    assert Histogram().percentile(50) is None
+
+    other = Histogram(samples=100)
+    other.add(500)
+    other.merge(Histogram())
+    histogram.merge(other)
+    assert (histogram.count, histogram.min, histogram.max) == (101, 1, 500)
+    # Only the last samples are kept.
+    assert len(histogram.samples) == 100
+    assert histogram.percentile(100) == 500
+
+
+def test_memory_sink_label_matching():
+    memory = MemorySink()
+    metrics = Metrics(memory)
+    metrics.observe('ttfb_seconds', 'Product', 0.1)
+    metrics.observe('ttfb_seconds', 'Category', 0.3)
+    metrics.increment('retries', 'Product', reason=429)
+    metrics.increment('retries', 'Product', 2, reason='unauthorized')
+    assert memory.histogram('ttfb_seconds')['count'] == 2
+    assert memory.histogram('ttfb_seconds', endpoint='Category')['max'] == 0.3
+    assert memory.histogram('ttfb_seconds', endpoint='Basket') is None
+    assert memory.counter('retries') == 3
+    assert memory.counter('retries', reason=429) == 1
+    assert memory.counter('retries', endpoint='Category') == 0
+    memory.reset()
+    assert memory.counter('retries') == 0
+
+
+def test_prometheus_render():
+    sink = PrometheusSink(prefix='sw', seconds_buckets=(0.1, 1.0),
+                          bytes_buckets=(100,))
+    metrics = Metrics(sink)
+    for value in (0.05, 0.1, 0.5, 2.0):
+        metrics.observe('ttfb_seconds', 'Product', value)
+    metrics.observe('response_bytes', 'Product', 1000)
+    metrics.increment('retries', 'Product', reason='Timeout "read"\\')
+    assert sink.render().splitlines() == [
+        '# TYPE sw_retries_total counter',
+        r'sw_retries_total{endpoint="Product",reason="Timeout \"read\"\\"} 1',
+        '# TYPE sw_response_bytes histogram',
+        'sw_response_bytes_bucket{endpoint="Product",le="100.0"} 0',
+        'sw_response_bytes_bucket{endpoint="Product",le="+Inf"} 1',
+        'sw_response_bytes_sum{endpoint="Product"} 1000.0',
+        'sw_response_bytes_count{endpoint="Product"} 1',
+        '# TYPE sw_ttfb_seconds histogram',
+        'sw_ttfb_seconds_bucket{endpoint="Product",le="0.1"} 2',
+        'sw_ttfb_seconds_bucket{endpoint="Product",le="1.0"} 3',
+        'sw_ttfb_seconds_bucket{endpoint="Product",le="+Inf"} 4',
+        'sw_ttfb_seconds_sum{endpoint="Product"} 2.65',
+        'sw_ttfb_seconds_count{endpoint="Product"} 4',
+    ]
+
+
+def test_logging_sink(caplog):
+    metrics = Metrics(LoggingSink())
+    with caplog.at_level(logging.DEBUG, logger='shopwave.metrics'):
+        metrics.observe('ttfb_seconds', 'Product', 0.25)
+        metrics.increment('requests', 'Product', status=200)
+    assert caplog.messages == [
+        'ttfb_seconds{endpoint="Product"} 0.25',
+        'requests{endpoint="Product",status="200"} +1',
+    ]
+
+
+def test_client_metrics():
+    memory = MemorySink()
+    prometheus = PrometheusSink()
+    with FakeShopwave(n_products=20) as server:
+        sw = server.client(metrics=Metrics(memory, prometheus),
+                           cache=ResponseCache())
+        sw.product.all()
+        sw.product.all()
+        server.expire_tokens()
+        sw.category.all()
+
+    assert memory.counter('requests', endpoint='Product') == 1
+    assert memory.counter('requests', endpoint='Category', status=401) == 1
+    assert memory.counter('requests', endpoint='Category', status=200) == 1
+    assert memory.counter('retries', reason='unauthorized') == 1
+    assert memory.counter('cache', endpoint='Product', result='miss') == 1
+    assert memory.counter('cache', endpoint='Product', result='hit') == 1
+    assert memory.counter('token_refreshes', endpoint='token',
+                          grant_type='authorization_code') == 1
+    assert memory.counter('token_refreshes', grant_type='refresh_token',
+                          status=200) == 1
+    assert memory.histogram('token_request_seconds')['count'] == 2
+    for name in ('ttfb_seconds', 'download_seconds', 'response_bytes'):
+        assert memory.histogram(name, endpoint='Product')['count'] == 1, name
+    # The cached response is decoded and hydrated again.
+    for name in ('decode_seconds', 'hydrate_seconds'):
+        assert memory.histogram(name, endpoint='Product')['count'] == 2, name
+
+    text = prometheus.render()
+    assert 'shopwave_requests_total{endpoint="Category",status="401"} 1\n' \
+        in text
+    assert 'shopwave_cache_total{endpoint="Product",result="hit"} 1\n' in text
+    assert '# TYPE shopwave_ttfb_seconds histogram\n' in text
+    assert 'shopwave_ttfb_seconds_count{endpoint="Category"} 2\n' in text
+    assert 'shopwave_hydrate_seconds_bucket{endpoint="Product",le="+Inf"} 2' \
+        in text
@@ -0,0 +1,159 @@
+import pytest
+
+from shopwave import identity
+from shopwave.identity import IdentityMap
+from shopwave.models import (BasketReport, Category, Model, Product,
+                             Transaction, build_registry, get_model_class)
+
+PRODUCT = {'id': '1', 'n': 'Tea', 'price': '1.50', 'bC': '123',
+           'activeDate': '2017-01-09T16:49:58.000Z',
+           'categories': {'2': 'Drinks'}}
+
+
+def setattr_values(cls, data):
+    """ Values as set by the per-field Model.__setattr__ of the root commit.
+    """
+    meta = cls._meta
+    unknown = set(data) - meta.get_field_names()
+    if unknown:
+        raise TypeError('Instantiating %s: %s is an invalid keyword argument '
+                        'for this function.' % (cls, unknown.pop()))
+    values = {}
+    for key, value in data.items():
+        if value is not None:
+            field = meta.get_field(key)
+            values[field.attrname] = field.parse_value(value)
+    return values
+
+
+@pytest.mark.parametrize('cls', [Product, Product.compact()])
+def test_hydrator_matches_setattr(cls):
+    data = dict(PRODUCT, productInstanceId=7, size=None, q='2',
+                productTimestamp='2017-01-10 12:00:00')
+    model = cls(data=data)
+    for attrname, value in setattr_values(cls, data).items():
+        if attrname == 'categories':
+            assert [(c.id, c.title) for c in model.categories] == \
+                [(c.id, c.title) for c in value]
+        else:
+            assert getattr(model, attrname) == value, attrname
+    assert (model.id, model.name, model.barcode) == (1, 'Tea', 123)
+    assert model.size == Product.size
+
+    for bad in ({'price': 'free'}, {'id': 'x'}, {'bC': '12a'}):
+        with pytest.raises(ValueError) as expected:
+            setattr_values(cls, bad)
+        with pytest.raises(ValueError) as raised:
+            cls(data=bad)
+        assert str(raised.value) == str(expected.value)
+
+    for unknown in ({'unknown': 1}, {'unknown': None}):
+        with pytest.raises(TypeError):
+            setattr_values(cls, unknown)
+        with pytest.raises(TypeError, match='unknown is an invalid keyword'):
+            cls(data=unknown)
+
+
+def test_compact_twin():
+    CompactProduct = Product.compact()
+    assert Product.compact() is CompactProduct
+    assert CompactProduct.compact() is CompactProduct
+    assert CompactProduct.__name__ == 'CompactProduct'
+    # Not a subclass, see ModelBase.compact.
+    assert issubclass(CompactProduct, Model)
+    assert not issubclass(CompactProduct, Product)
+
+    regular = Product(data=dict(PRODUCT))
+    compact = CompactProduct(data=dict(PRODUCT))
+    assert isinstance(compact, CompactProduct)
+    assert not hasattr(compact, '__dict__')
+    for name in ('id', 'name', 'price', 'barcode', 'activeDate'):
+        assert getattr(compact, name) == getattr(regular, name), name
+    assert compact.details == regular.details
+    assert not hasattr(compact, 'q') and not hasattr(regular, 'q')
+
+    category, = compact.categories
+    assert isinstance(category, Category.compact())
+    assert category.title == 'Drinks'
+    other = CompactProduct(data=dict(PRODUCT, n=''.join(['T', 'ea'])))
+    assert other.name is compact.name
+
+
+def test_compact_rejects_unknown_keys():
+    with pytest.raises(TypeError):
+        Product.compact()(data={'id': 1, 'unknown': 2})
+    with pytest.raises(ValueError):
+        Product.compact()(data={'id': 1, 'price': 'free'})
+
+
+def test_lazy_twin_parses_on_first_access():
+    LazyProduct = Product.lazy()
+    assert Product.lazy() is LazyProduct
+    assert issubclass(LazyProduct, Product)
+    data = dict(PRODUCT)
+    product = LazyProduct(data=data)
+    assert isinstance(product, Product)
+    assert product._raw is data
+    assert 'price' not in product.__dict__
+    assert product.price == 1.5
+    assert product.__dict__['price'] == 1.5
+    # Aliases and the id
+    assert (product.id, product.name, product.barcode) == (1, 'Tea', 123)
+    assert product.details == Product().details
+    category, = product.categories
+    assert isinstance(category, Category.lazy())
+    assert category.title == 'Drinks'
+
+
+def test_lazy_missing_blank_field():
+    # Unset blank fields raise AttributeError on regular models too.
+    assert not hasattr(Product(data=dict(PRODUCT)), 'q')
+    product = Product.lazy()(data=dict(PRODUCT))
+    assert not hasattr(product, 'q')
+    with pytest.raises(AttributeError):
+        product.q
+    assert Product.lazy()(data=dict(PRODUCT, q='0')).q == 0
+
+
+def test_lazy_errors():
+    with pytest.raises(TypeError):
+        Product.lazy()(data={'id': 1, 'unknown': 2})
+    # Values are parsed, and rejected, on access only.
+    product = Product.lazy()(data={'id': 1, 'price': 'free'})
+    with pytest.raises(ValueError):
+        product.price
+    with pytest.raises(TypeError):
+        Product.compact().lazy()
+
+
+def test_lazy_references_use_the_identity_map_of_construction():
+    identity_map = IdentityMap()
+    with identity.use(identity_map):
+        first = Product.lazy()(data=dict(PRODUCT))
+        second = Product.lazy()(data=dict(PRODUCT, id=2))
+    outside = Product.lazy()(data=dict(PRODUCT, id=3))
+    assert len(identity_map) == 0
+    # Accessed after the with block.
+    assert first.categories[0] is second.categories[0]
+    assert len(identity_map) == 1
+    assert outside.categories[0] is not first.categories[0]
+
+
+def test_registry():
+    registry = build_registry()
+    assert registry['categories'] is registry['category'] is Category
+    assert registry['products'] is Product
+    assert registry['transactions'] is Transaction
+    assert registry['baskets'] is registry['basket'] is BasketReport
+    assert get_model_class('Products') is Product
+    assert get_model_class('BASKETS') is BasketReport
+
+    registry = build_registry(['Product'], {'Items': 'Product'})
+    assert sorted(registry) == ['items', 'product', 'products']
+
+
+def test_unknown_response_key():
+    with pytest.raises(ValueError) as e:
+        get_model_class('stores')
+    assert 'stores' in str(e.value)
+    assert 'RESPONSE_KEY_OVERRIDES' in str(e.value)
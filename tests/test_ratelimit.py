@@ -0,0 +1,186 @@
+import asyncio
+
+import pytest
+
+from shopwave import ratelimit
+from shopwave.ratelimit import (AdaptiveConcurrency, RateLimiter,
+                                RedisTokenBucket, TokenBucket)
+
+
+class Clock(object):
+    """ Stands in for the time module in shopwave.ratelimit. """
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def redis_db():
+    fakeredis = pytest.importorskip('fakeredis')
+    # The shared bucket is a Lua script.
+    pytest.importorskip('lupa')
+    return fakeredis.FakeStrictRedis()
+
+
+def test_token_bucket(clock):
+    bucket = TokenBucket(2, capacity=2)
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+    clock.now += 1.5
+    # 3 tokens added to -2, capped at the capacity.
+    assert bucket.reserve() == 0.0
+    bucket.acquire()
+    assert clock.sleeps == [0.5]
+    clock.now += 10
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.5]
+
+
+def test_redis_token_bucket_is_shared(redis_db):
+    first = RedisTokenBucket(redis_db, 'test:bucket', 0.01, capacity=2)
+    second = RedisTokenBucket(redis_db, 'test:bucket', 0.01, capacity=2)
+    assert first.reserve() == 0.0
+    assert second.reserve() == 0.0
+    assert 99 < first.reserve() <= 100
+    assert 199 < second.reserve() <= 200
+    assert 0 < redis_db.ttl('test:bucket') <= 201
+    other = RedisTokenBucket(redis_db, 'test:other', 0.01, capacity=2)
+    assert other.reserve() == 0.0
+
+
+def test_grows_while_limit_is_used(clock):
+    concurrency = AdaptiveConcurrency(initial=2, minimum=1, maximum=3)
+    for _ in range(20):
+        started = clock.now
+        concurrency.acquire()
+        concurrency.acquire()
+        clock.now += 0.1
+        concurrency.release(started, 200)
+        concurrency.release(started, 200)
+    assert concurrency.limit == 3
+    assert concurrency.in_flight == 0
+
+
+def test_does_not_grow_unused_limit(clock):
+    concurrency = AdaptiveConcurrency(initial=4, minimum=1, maximum=8)
+    for _ in range(20):
+        started = clock.now
+        concurrency.acquire()
+        clock.now += 0.1
+        concurrency.release(started, 200)
+    assert concurrency.limit == 4
+
+
+@pytest.mark.parametrize('status', [429, 503])
+def test_backs_off_when_throttled(clock, status):
+    concurrency = AdaptiveConcurrency(initial=8, minimum=3, maximum=8)
+    started = clock.now
+    for _ in range(3):
+        concurrency.acquire()
+    clock.now += 0.1
+    concurrency.release(started, status)
+    assert concurrency.limit == 4
+    # Sent before the decrease: reflects the old limit.
+    concurrency.release(started, status)
+    assert concurrency.limit == 4
+    # Failed requests do not change the limit.
+    concurrency.release(clock.now, None)
+    assert concurrency.limit == 4
+
+    clock.now += 0.1
+    started = clock.now
+    concurrency.acquire()
+    concurrency.release(started, status)
+    assert concurrency.limit == 3
+
+
+def test_backs_off_when_latency_rises(clock):
+    concurrency = AdaptiveConcurrency(initial=8, minimum=1, maximum=8,
+                                      tolerance=2.0)
+    for _ in range(5):
+        started = clock.now
+        concurrency.acquire()
+        clock.now += 0.1
+        concurrency.release(started, 200)
+    assert concurrency.limit == 8
+    for _ in range(10):
+        started = clock.now
+        concurrency.acquire()
+        clock.now += 1.0
+        concurrency.release(started, 200)
+    assert concurrency.limit < 8
+
+
+def test_cancelled_waiter_passes_its_slot_on():
+    concurrency = AdaptiveConcurrency(initial=1, minimum=1, maximum=1)
+
+    async def main():
+        concurrency.acquire()
+        first = asyncio.ensure_future(concurrency.acquire_async())
+        second = asyncio.ensure_future(concurrency.acquire_async())
+        await asyncio.sleep(0)
+        assert len(concurrency._waiters) == 2
+
+        # The slot is handed to the first waiter, which is cancelled before
+        # it runs.
+        concurrency.release(0.0, None)
+        first.cancel()
+        await asyncio.wait_for(second, 1)
+        assert first.cancelled()
+        assert concurrency.in_flight == 1
+        assert not concurrency._waiters
+
+        # A waiter cancelled while waiting just leaves the queue.
+        third = asyncio.ensure_future(concurrency.acquire_async())
+        await asyncio.sleep(0)
+        third.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await third
+        assert concurrency.in_flight == 1
+        assert not concurrency._waiters
+
+    asyncio.run(main())
+
+
+def test_rate_limiter(clock):
+    limiter = RateLimiter(limits={'product': (1, 1)}, default=None,
+                          concurrency=True)
+    assert limiter.bucket('category') is None
+    assert limiter.bucket('product') is limiter.bucket('product')
+    started = limiter.acquire('product')
+    assert limiter.concurrency.in_flight == 1
+    limiter.release('product', started, 200)
+    limiter.release('category', limiter.acquire('category'), 200)
+    limiter.acquire('product')
+    assert clock.sleeps == [1.0]
+    assert limiter.concurrency.in_flight == 1
+
+
+def test_rate_limiter_default():
+    limiter = RateLimiter(limits={}, default=(5, 10))
+    bucket = limiter.bucket('category')
+    assert (bucket.rate, bucket.capacity) == (5.0, 10.0)
+    assert limiter.concurrency is None
+
+
+def test_rate_limiter_in_redis(redis_db):
+    limiter = RateLimiter(limits={'product': (0.01, 1)}, db=redis_db)
+    bucket = limiter.bucket('product')
+    assert isinstance(bucket, RedisTokenBucket)
+    assert bucket.key.endswith(':ratelimit:product')
+    asyncio.run(limiter.acquire_async('product'))
+    # A second limiter, e.g. of another process, shares the bucket.
+    other = RateLimiter(limits={'product': (0.01, 1)}, db=redis_db)
+    assert other.bucket('product').reserve() > 0
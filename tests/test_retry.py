@@ -0,0 +1,67 @@
+import email.utils
+import time
+
+import pytest
+
+from shopwave.fakeserver import FakeShopwave
+from shopwave.retry import RetryPolicy, RetryState, REFRESH, _retry_after
+
+
+class Response(object):
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+@pytest.mark.parametrize('usegmt', [True, False])
+def test_retry_after_http_date(usegmt):
+    # 'GMT', or '-0000', which parses to a naive datetime.
+    value = email.utils.formatdate(time.time() + 30, usegmt=usegmt)
+    assert 25 < _retry_after(Response(429, {'Retry-After': value})) <= 30
+
+
+def test_retry_after_seconds_and_invalid():
+    assert _retry_after(Response(429, {'Retry-After': '2'})) == 2
+    assert _retry_after(Response(429, {'Retry-After': 'soon'})) is None
+    assert _retry_after(Response(429)) is None
+
+
+def test_retry_state():
+    state = RetryState(RetryPolicy(max_attempts=3, backoff=0.01,
+                                   statuses=(503,), deadline=None))
+    assert state.after_response(Response(401)) == REFRESH
+    assert state.after_response(Response(401)) is None
+    assert state.after_response(Response(200)) is None
+    assert state.after_response(Response(503, {'Retry-After': '1'})) >= 1
+    assert state.after_error(ConnectionError()) is not None
+    assert state.after_response(Response(503)) is None
+
+
+# The stats of the fake server count token requests too: every client
+# requests a token before its first call.
+
+
+def test_refresh_after_401():
+    with FakeShopwave() as server:
+        sw = server.client()
+        assert len(sw.product.get('1,2')['products']) == 2
+        server.expire_tokens()
+        assert len(sw.product.get('3')['products']) == 1
+        assert server.stats == {200: 4, 401: 1}
+
+
+class ThrottleEveryOther(FakeShopwave):
+    """ Answers every other API request with HTTP 429, whatever the time. """
+    calls = 0
+
+    def _throttled(self):
+        self.calls += 1
+        return self.calls % 2 == 1
+
+
+def test_retry_after_429():
+    with ThrottleEveryOther(n_products=250) as server:
+        sw = server.client(retry_policy=RetryPolicy(backoff=0.01))
+        for _ in range(2):
+            assert len(sw.product.get('1')['products']) == 1
+        assert server.stats == {200: 1 + 2, 429: 2}
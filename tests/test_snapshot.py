@@ -0,0 +1,37 @@
+import pytest
+
+from shopwave.fakeserver import FakeShopwave
+from shopwave.snapshot import SnapshotStore
+from shopwave.utils import ShopwaveDatetime
+
+
+@pytest.fixture
+def server():
+    with FakeShopwave(n_products=250, baskets_per_hour=6) as server:
+        yield server
+
+
+def test_snapshot_round_trip(server, tmp_path):
+    store = SnapshotStore(str(tmp_path / 'snapshot.db'))
+    sw = server.client(snapshot=store)
+    assert sw.product.sync_to() == 250
+    local = sw.product.all(source='local', return_format='json')
+    assert local == sw.product.all(return_format='json')
+
+    assert sw.report_basket.sync_to(from_date='2017-02-01 00:00:00',
+                                    to_date='2017-02-03 00:00:00') == 2 * 24 * 6
+    requests = sum(server.stats.values())
+    baskets = sw.report_basket.all(from_date='2017-02-02 00:00:00',
+                                   to_date='2017-02-03 00:00:00',
+                                   source='local', return_format='json')
+    assert baskets == server.baskets(ShopwaveDatetime('2017-02-02 00:00:00'),
+                                     ShopwaveDatetime('2017-02-03 00:00:00'))
+
+    products = list(sw.product.iter(source='local'))
+    assert sorted(p.id for p in products) == list(range(1, 251))
+    lines = [line for basket in sw.report_basket.iter(
+                 from_date='2017-02-02 00:00:00',
+                 to_date='2017-02-03 00:00:00', source='local')
+             for line in basket.p]
+    assert len(lines) == 3 * len(baskets['baskets'])
+    assert sum(server.stats.values()) == requests
@@ -0,0 +1,159 @@
+import sys
+from datetime import timedelta
+
+import pytest
+
+from shopwave import checkpoint
+from shopwave.auth import Credentials
+from shopwave.checkpoint import FileCheckpointStore, RedisCheckpointStore
+from shopwave.fakeserver import FakeShopwave
+from shopwave.tokenstore import MemoryTokenStore, RedisTokenStore
+from shopwave.utils import ShopwaveDatetime
+
+
+class UndatedBaskets(FakeShopwave):
+    """ Baskets with an even bId (or all of them) have no completion date.
+    """
+    all_undated = False
+
+    def _basket(self, bId, completed):
+        basket = super(UndatedBaskets, self)._basket(bId, completed)
+        if self.all_undated or bId % 2 == 0:
+            basket['c'] = None
+        return basket
+
+
+def dated(basket):
+    return isinstance(basket.c, ShopwaveDatetime)
+
+
+@pytest.fixture
+def server():
+    with UndatedBaskets(baskets_per_hour=4) as server:
+        yield server
+
+
+def test_sync_returns_every_basket_once(server, tmp_path):
+    store = FileCheckpointStore(str(tmp_path / 'checkpoints.json'))
+    sw = server.client()
+    overlap = timedelta(hours=3)
+    first = sw.report_basket.sync(store=store, overlap=overlap)
+    assert len(first) in (24 * 4, 24 * 4 + 1)
+    undated = [b.bId for b in first if not dated(b)]
+    assert undated and len(undated) < len(first)
+    completed = [b.c for b in first if dated(b)]
+    assert completed == sorted(completed)
+
+    checkpoint = store.load('report_basket')
+    assert checkpoint['undated'] == undated
+    assert checkpoint['c'] == completed[-1].to_str()
+
+    # The overlap requests the last three hours, dated and undated, again.
+    second = sw.report_basket.sync(store=store, overlap=overlap)
+    assert not {b.bId for b in second} & {b.bId for b in first}
+
+
+def test_sync_without_completed_baskets_saves_checkpoint(server, tmp_path):
+    server.all_undated = True
+    store = FileCheckpointStore(str(tmp_path / 'checkpoints.json'))
+    sw = server.client()
+    first = sw.report_basket.sync(store=store)
+    assert first and not any(dated(b) for b in first)
+    checkpoint = store.load('report_basket')
+    assert checkpoint['c'] is None
+    assert sorted(checkpoint['undated']) == sorted(b.bId for b in first)
+    assert sw.report_basket.sync(store=store) == []
+
+
+@pytest.fixture(params=['file', 'redis'])
+def checkpoint_store(request, tmp_path):
+    if request.param == 'file':
+        return FileCheckpointStore(str(tmp_path / 'checkpoints.json'))
+    fakeredis = pytest.importorskip('fakeredis')
+    return RedisCheckpointStore(fakeredis.FakeStrictRedis())
+
+
+def test_sync_rejects_return_format(server, tmp_path):
+    store = FileCheckpointStore(str(tmp_path / 'checkpoints.json'))
+    sw = server.client()
+    for return_format in ('json', 'columnar'):
+        with pytest.raises(ValueError):
+            sw.report_basket.sync(store=store, return_format=return_format)
+    assert server.stats == {}
+    assert store.load('report_basket') is None
+    assert sw.report_basket.sync(store=store, compact=True)
+
+
+def test_checkpoint_store_round_trip(checkpoint_store):
+    assert checkpoint_store.load('a') is None
+    checkpoint_store.save('a', {'c': '2017-02-01 00:00:00', 'bId': 1})
+    checkpoint_store.save('b', {'c': None})
+    assert checkpoint_store.load('a') == {'c': '2017-02-01 00:00:00',
+                                          'bId': 1}
+    checkpoint_store.delete('a')
+    assert checkpoint_store.load('a') is None
+    assert checkpoint_store.load('b') == {'c': None}
+
+
+def test_default_checkpoint_store_without_redis(monkeypatch):
+    # Not installed: the default token store of Credentials can not be set
+    # up.
+    monkeypatch.setitem(sys.modules, 'redis', None)
+    assert isinstance(checkpoint.get_default_store(Credentials()),
+                      FileCheckpointStore)
+    credentials = Credentials(store=MemoryTokenStore())
+    assert isinstance(checkpoint.get_default_store(credentials),
+                      FileCheckpointStore)
+
+
+def test_default_checkpoint_store_with_redis():
+    fakeredis = pytest.importorskip('fakeredis')
+    server = fakeredis.FakeServer()
+    server.connected = False
+    unreachable = Credentials(store=RedisTokenStore(
+        fakeredis.FakeStrictRedis(server=server)))
+    assert isinstance(checkpoint.get_default_store(unreachable),
+                      FileCheckpointStore)
+
+    credentials = Credentials(store=RedisTokenStore(
+        fakeredis.FakeStrictRedis()))
+    store = checkpoint.get_default_store(credentials)
+    assert isinstance(store, RedisCheckpointStore)
+    assert store.db is credentials.db
+
+
+class LateBasket(FakeShopwave):
+    """ Holds back one basket until late is set. """
+    late = None
+    released = False
+
+    def baskets(self, from_date, to_date):
+        data = super(LateBasket, self).baskets(from_date, to_date)
+        if not self.released:
+            data['baskets'].pop(str(self.late), None)
+        return data
+
+
+def test_late_basket_within_overlap_is_returned(checkpoint_store):
+    with LateBasket(baskets_per_hour=60) as server:
+        sw = server.client()
+        start = ShopwaveDatetime.now() - timedelta(hours=2)
+        first = sw.report_basket.sync(store=checkpoint_store,
+                                      name='late', from_date=start)
+        bIds = [b.bId for b in first]
+        # Completed two minutes before the last basket of the first sync.
+        server.late = bIds[-3]
+        checkpoint_store.delete('late')
+        first = sw.report_basket.sync(store=checkpoint_store,
+                                      name='late', from_date=start)
+        first = [b.bId for b in first]
+        assert server.late not in first
+
+        server.released = True
+        second = [b.bId for b in sw.report_basket.sync(
+            store=checkpoint_store, name='late')]
+        assert server.late in second
+        assert not set(second) & set(first)
+        third = [b.bId for b in sw.report_basket.sync(
+            store=checkpoint_store, name='late')]
+        assert not set(third) & set(second + first)
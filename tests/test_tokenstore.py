@@ -0,0 +1,113 @@
+import os
+import stat
+
+import pytest
+
+from shopwave import tokenstore
+from shopwave.tokenstore import (FileTokenStore, MemoryTokenStore,
+                                 RedisTokenStore)
+
+
+class Clock(object):
+    now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture(params=['memory', 'file', 'redis'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryTokenStore()
+    elif request.param == 'file':
+        return FileTokenStore(str(tmp_path / 'tokens.json'))
+    fakeredis = pytest.importorskip('fakeredis')
+    return RedisTokenStore(fakeredis.FakeStrictRedis(), prefix='test:')
+
+
+def test_save_load_delete(store):
+    assert store.load() == {'access_token': None, 'token_type': None,
+                            'refresh_token': None, 'expires_in': None}
+    store.save('access', 'Bearer', 3600, 'refresh')
+    tokens = store.load()
+    assert tokens['access_token'] == 'access'
+    assert tokens['token_type'] == 'Bearer'
+    assert tokens['refresh_token'] == 'refresh'
+    assert 3590 < tokens['expires_in'] <= 3600
+
+    # Access token and token type are only stored with their expiry.
+    store.save('other', 'Bearer', None, 'refresh2')
+    tokens = store.load()
+    assert (tokens['access_token'], tokens['refresh_token']) == \
+        ('access', 'refresh2')
+
+    store.set_auth_code('code')
+    store.delete()
+    assert store.load() == {'access_token': None, 'token_type': None,
+                            'refresh_token': None, 'expires_in': None}
+    assert store.get_auth_code() == 'code'
+
+
+def test_lock(store):
+    if isinstance(store, RedisTokenStore):
+        # Redis locks are released by a Lua script.
+        pytest.importorskip('lupa')
+    with store.lock(1) as acquired:
+        assert acquired
+
+
+@pytest.mark.parametrize('store', ['memory', 'file'], indirect=True)
+def test_expired_access_token_is_not_returned(store, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(tokenstore, 'time', clock)
+    store.save('access', 'Bearer', 60, 'refresh')
+    clock.now += 59
+    tokens = store.load()
+    assert (tokens['access_token'], tokens['expires_in']) == ('access', 1)
+    clock.now += 1
+    assert store.load() == {'access_token': None, 'token_type': None,
+                            'refresh_token': 'refresh', 'expires_in': None}
+
+
+def test_unexpired_without_expiry():
+    tokens = tokenstore._unexpired({'access_token': 'access',
+                                    'token_type': 'Bearer'})
+    assert tokens['access_token'] == 'access'
+    assert tokens['expires_in'] is None
+
+
+def test_file_is_private(tmp_path):
+    path = str(tmp_path / 'tokens.json')
+    store = FileTokenStore(path)
+    store.save('access', 'Bearer', 3600, 'refresh')
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    store.set_auth_code('code')
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert os.listdir(str(tmp_path)) == ['tokens.json']
+
+
+def test_redis_round_trips():
+    fakeredis = pytest.importorskip('fakeredis')
+
+    class CountingRedis(fakeredis.FakeStrictRedis):
+        commands = pipelines = 0
+
+        def execute_command(self, *args, **options):
+            self.commands += 1
+            return super(CountingRedis, self).execute_command(*args,
+                                                              **options)
+
+        def pipeline(self, *args, **kwargs):
+            self.pipelines += 1
+            return super(CountingRedis, self).pipeline(*args, **kwargs)
+
+    db = CountingRedis()
+    store = RedisTokenStore(db, prefix='test:')
+    store.save('access', 'Bearer', 3600, 'refresh')
+    assert store.load()['access_token'] == 'access'
+    assert (db.pipelines, db.commands) == (2, 0)
+
+    # Expired keys are gone from Redis.
+    db.delete('test:access_token', 'test:token_type')
+    tokens = store.load()
+    assert tokens['access_token'] is None and tokens['expires_in'] is None
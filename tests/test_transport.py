@@ -0,0 +1,47 @@
+import pytest
+
+from shopwave.fakeserver import FakeShopwave
+from shopwave.transport import Transport
+
+
+@pytest.fixture(scope='module')
+def server():
+    with FakeShopwave(n_products=20) as server:
+        yield server
+
+
+def test_connections_are_reused(server):
+    with Transport() as transport:
+        first = transport.request('get', server.url + '_fake/stats')
+        second = transport.request('get', server.url + '_fake/stats')
+    assert first.status_code == second.status_code == 200
+    assert first.transfer.connect > 0
+    assert second.transfer.connect == 0
+    assert second.transfer.size == len(second.content)
+
+
+def test_managers_share_the_client_transport(server):
+    sw = server.client()
+    assert sw.product.transport is sw.transport
+    assert sw.category.transport is sw.transport
+    for _ in range(3):
+        sw.product.get('1')
+        sw.category.get('1')
+    stats = sw.stats()
+    # The token request does not go through the transport.
+    assert stats['requests'] == 6
+    assert stats['bytes_received'] > 0
+    assert stats['total_time'] >= stats['server_time'] > 0
+    assert stats['mean_time'] == pytest.approx(stats['total_time'] / 6)
+
+    sw.transport.stats.reset()
+    assert sw.stats()['requests'] == 0
+    sw.close()
+
+
+def test_pool_settings():
+    transport = Transport(pool_maxsize=3, pool_block=True)
+    adapter = transport.session.get_adapter('https://api.example.com/')
+    assert adapter._pool_maxsize == 3
+    assert adapter._pool_block is True
+    transport.close()
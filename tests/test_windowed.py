@@ -0,0 +1,63 @@
+import pytest
+
+from shopwave.exceptions import ShopwaveWindowsFailed
+from shopwave.fakeserver import FakeShopwave
+from shopwave.retry import RetryPolicy
+
+
+class FailingDay(FakeShopwave):
+    """ Answers HTTP 500 for windows starting on failing_day. """
+    failing_day = None
+
+    def handle(self, method, path, headers, body):
+        if path == 'report/basket' and self.failing_day and \
+                headers.get('from', '').startswith(self.failing_day):
+            return 500, {'api': {'message': {'error': 'Injected'}}}, {}
+        return super(FailingDay, self).handle(method, path, headers, body)
+
+
+@pytest.fixture
+def server():
+    with FailingDay(baskets_per_hour=2) as server:
+        yield server
+
+
+def test_all_windowed(server):
+    sw = server.client()
+    baskets = sw.report_basket.all_windowed('2017-02-01 00:00:00',
+                                            '2017-02-04 00:00:00')
+    assert len(baskets) == 3 * 24 * 2
+    assert list(baskets) == sorted(baskets)
+    raw = sw.report_basket.all_windowed('2017-02-01 00:00:00',
+                                        '2017-02-04 00:00:00',
+                                        return_format='json')
+    assert sorted(raw) == sorted(baskets)
+    assert raw[baskets[next(iter(baskets))].bId]['bN']
+
+
+def test_unsupported_return_format_is_rejected_before_requests(server):
+    sw = server.client()
+    with pytest.raises(ValueError):
+        sw.report_basket.all_windowed('2017-02-01 00:00:00',
+                                      '2017-02-04 00:00:00',
+                                      return_format='columnar')
+    assert server.stats == {}
+
+
+def test_failed_window_keeps_the_others(server):
+    server.failing_day = '2017-02-02'
+    sw = server.client(retry_policy=RetryPolicy(max_attempts=2,
+                                                backoff=0.01))
+    with pytest.raises(ShopwaveWindowsFailed) as info:
+        sw.report_basket.all_windowed('2017-02-01 00:00:00',
+                                      '2017-02-04 00:00:00')
+    error = info.value
+    assert len(error.result) == 2 * 24 * 2
+    assert server.stats[500] == 2
+    [(from_date, to_date, cause)] = error.failed
+    assert from_date.to_str() == '2017-02-02 00:00:00'
+
+    server.failing_day = None
+    baskets = error.result
+    baskets.update(sw.report_basket.all_windowed(from_date, to_date))
+    assert len(baskets) == 3 * 24 * 2
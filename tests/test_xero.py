@@ -0,0 +1,123 @@
+import json
+import os
+
+import pytest
+
+from shopwave.xero import XeroConverter, write_json
+
+BASKET = {
+    'bId': 7, 'bN': 'Basket 7', 'c': '2017-02-01 10:00:00',
+    'p': {'21': {'id': 3, 'n': 'Tea', 'q': 2, 'pMP': '1.50', 'pIP': '1.50'}},
+    'tr': {'7': {'tId': 7, 'tA': 300}},
+}
+
+
+def test_convert_basket():
+    invoice, items = XeroConverter().convert_basket(BASKET)
+    assert invoice['InvoiceNumber'] == 'SW-7'
+    assert invoice['Total'] == 3.0
+    assert [line['ItemCode'] for line in invoice['LineItems']] == ['3']
+    assert [item['Code'] for item in items] == ['3']
+
+
+def test_line_without_product_id():
+    basket = dict(BASKET, p={'21': {'n': 'Tea', 'q': 2}})
+    with pytest.raises(ValueError):
+        XeroConverter().convert_basket(basket)
+
+
+def basket(bId, *product_ids):
+    return {
+        'bId': bId, 'bN': 'Basket %d' % bId, 'c': '2017-02-01 10:00:00',
+        'p': {str(bId * 10 + i): {'id': product_id, 'n': 'P%d' % product_id,
+                                  'q': 1, 'price': '2.00'}
+              for i, product_id in enumerate(product_ids)},
+        'tr': {str(bId): {'tId': bId, 'tA': 200 * len(product_ids)}},
+    }
+
+
+def test_convert_batches():
+    converter = XeroConverter(batch_size=2, known_items=[9])
+    baskets = [basket(1, 1, 2), basket(2, 2, 3, 9), basket(3, 4), basket(4),
+               basket(5, 1)]
+    batches = list(converter.convert({'baskets': {str(b['bId']): b
+                                                  for b in baskets}}))
+    assert [(b.endpoint, len(b)) for b in batches] == [
+        ('Items', 2), ('Items', 1), ('Invoices', 2),
+        ('Items', 1), ('Invoices', 2),
+        ('Invoices', 1)]
+    # Every item is emitted once, before the first invoice using it.
+    emitted = set(['9'])
+    for batch in batches:
+        if batch.endpoint == 'Items':
+            codes = [item['Code'] for item in batch.payload['Items']]
+            assert emitted.isdisjoint(codes)
+            emitted.update(codes)
+        else:
+            for invoice in batch.payload['Invoices']:
+                for line in invoice['LineItems']:
+                    assert line['ItemCode'] in emitted
+    assert [invoice['InvoiceNumber'] for batch in batches
+            if batch.endpoint == 'Invoices'
+            for invoice in batch.payload['Invoices']] == \
+        ['SW-%d' % i for i in range(1, 6)]
+
+    # Items are remembered across convert calls.
+    batches = list(converter.convert([basket(6, 1, 5)]))
+    assert [(b.endpoint, len(b)) for b in batches] == [('Items', 1),
+                                                       ('Invoices', 1)]
+    assert batches[0].payload['Items'][0]['Code'] == '5'
+    assert converter.items == set(['1', '2', '3', '4', '5', '9'])
+
+
+def test_quantity():
+    lines = {'1': {'id': 3, 'q': 0, 'price': '1.00'},
+             '2': {'id': 4, 'price': '1.00'}}
+    invoice, items = XeroConverter().convert_basket(dict(BASKET, p=lines))
+    assert [line['Quantity'] for line in invoice['LineItems']] == [0, 1]
+
+
+def test_convert_products():
+    from shopwave.models import Product
+    products = {'products': {
+        '1': {'id': 1, 'n': 'Tea', 'price': '1.5',
+              'activeDate': '2017-01-01T00:00:00.000Z'},
+        '2': {'id': 2, 'n': 'Cake', 'activeDate': '2999-01-01 00:00:00'},
+    }}
+    converter = XeroConverter(batch_size=1, known_items=['3'])
+    batches = list(converter.convert_products(products))
+    assert [b.payload['Items'] for b in batches] == [
+        [{'Code': '1', 'Name': 'Tea', 'IsSold': True,
+          'SalesDetails': {'UnitPrice': 1.5, 'AccountCode': '200'}}],
+        [{'Code': '2', 'Name': 'Cake', 'IsSold': False}],
+    ]
+
+    models = [Product(id=1, name='Tea'), Product(id=3, name='Coffee'),
+              Product(id=4, name='Scone', price=2,
+                      activeDate='2017-01-01 00:00:00')]
+    batches = list(converter.convert_products(models))
+    assert [b.payload['Items'] for b in batches] == [
+        [{'Code': '4', 'Name': 'Scone', 'IsSold': True,
+          'SalesDetails': {'UnitPrice': 2.0, 'AccountCode': '200'}}]]
+
+
+def test_linked_transactions():
+    invoices = [{'InvoiceID': 'a', 'LineItems': [{'LineItemID': 'a1'},
+                                                 {'LineItemID': 'a2'}]},
+                {'InvoiceID': 'b', 'LineItems': [{'LineItemID': 'b1'}]},
+                {'InvoiceID': 'c'}]
+    batches = list(XeroConverter(batch_size=2).linked_transactions(
+        invoices, 'contact'))
+    assert [len(b) for b in batches] == [2, 1]
+    assert batches[1].payload == {'LinkedTransactions': [{
+        'SourceTransactionID': 'b', 'SourceLineItemID': 'b1',
+        'ContactID': 'contact'}]}
+
+
+def test_write_json(tmp_path):
+    batches = XeroConverter().convert([BASKET])
+    paths = write_json(batches, str(tmp_path / 'xero'))
+    assert [os.path.basename(p) for p in paths] == ['00001-items.json',
+                                                    '00002-invoices.json']
+    with open(paths[1]) as f:
+        assert json.load(f)['Invoices'][0]['InvoiceNumber'] == 'SW-7'